@@ -0,0 +1,74 @@
+"""Database profiles, picked with the ``STADIUM_DB_PROFILE`` environment variable.
+
+``sqlite`` (default)
+    SQLite tuned for several workers: WAL, so readers are never blocked by
+    the writer, ``synchronous=NORMAL`` (durable at checkpoints, safe with
+    WAL), a busy timeout instead of immediate "database is locked" errors,
+    memory-mapped reads and a bigger page cache. Connections are persistent.
+``sqlite-plain``
+    The untuned rollback-journal setup, for comparison.
+``postgres``
+    PostgreSQL from the ``POSTGRES_*`` environment variables. Needs a
+    PostgreSQL driver (``pip install psycopg``), which requirements.txt leaves
+    out. Each thread keeps a persistent connection for ``CONN_MAX_AGE``; put
+    PgBouncer in front for real pooling across workers.
+
+The PRAGMAs are applied to every new connection by ``configure_connection``,
+hooked to ``connection_created`` in ``StadiumConfig.ready``.
+"""
+import os
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms
+    'mmap_size': 256 * 2**20,
+    'cache_size': -20000,  # KiB, per connection
+    'temp_store': 'MEMORY',
+}
+
+PLAIN_SQLITE_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+
+def database_profile(name, base_dir):
+    if name == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': base_dir / 'db.sqlite3',
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'PRAGMAS': SQLITE_PRAGMAS,
+            # A file, not the in-memory default, so threaded tests lock like production.
+            'TEST': {'NAME': base_dir / 'test_db.sqlite3'},
+        }
+    if name == 'sqlite-plain':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': base_dir / 'db.sqlite3',
+            'PRAGMAS': PLAIN_SQLITE_PRAGMAS,
+        }
+    if name == 'postgres':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'stadium'),
+            'USER': os.environ.get('POSTGRES_USER', 'stadium'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    raise ValueError(f'Unknown STADIUM_DB_PROFILE {name!r}, use sqlite, sqlite-plain or postgres.')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """``connection_created`` receiver applying the database's ``PRAGMAS``."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,40 @@
+"""Logging handlers that keep I/O off the request thread."""
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueuedFileHandler(QueueHandler):
+    """Hand records to a background thread that writes them to ``filename``.
+
+    Emitting is a non-blocking ``put`` on an unbounded queue; the file is
+    written by a ``QueueListener`` thread, flushed on interpreter exit.
+    """
+
+    def __init__(self, filename, encoding=None, delay=True):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.FileHandler(filename, encoding=encoding, delay=delay)
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread.
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Only resolve the message here; the target handler formats it.
+        record.message = record.getMessage()
+        record.msg, record.args, record.exc_text = record.message, None, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+        super().close()
@@ -0,0 +1,188 @@
+"""Serving uploaded media.
+
+``HashedFileSystemStorage`` (the default storage) stores every file as
+``<stem>.<hash><ext>``, where ``hash`` is the start of the content's
+sha256. A name therefore never changes content, and ``serve_media``
+can send hashed files with far-future ``immutable`` cache headers and
+the hash as a strong ETag. Files saved before hashing, whose names
+don't match, get ``STADIUM_MEDIA_MAX_AGE`` and an ETag built from
+mtime and size. All files answer conditional requests
+(``If-None-Match``, ``If-Modified-Since``) with 304.
+
+``STADIUM_MEDIA_OFFLOAD`` controls who sends the bytes:
+
+``None`` (default)
+    Django sends the file. A ``FileResponse`` lets the WSGI server use
+    ``wsgi.file_wrapper`` (``sendfile()`` under gunicorn). Single
+    ``Range`` requests are answered with 206 and stream only the
+    requested slice.
+``'x-accel'``
+    nginx sends the file. The response is headers only, plus
+    ``X-Accel-Redirect: STADIUM_MEDIA_ACCEL_PREFIX + path``, which
+    needs an ``internal`` location::
+
+        location /protected-media/ { internal; alias /srv/stadium/uploads/; }
+
+    nginx handles Range itself.
+``'x-sendfile'``
+    Apache (mod_xsendfile) or lighttpd sends the file. The response
+    carries ``X-Sendfile`` with the absolute path.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+HASH_LENGTH = 12
+HASHED_NAME = re.compile(r'\.([0-9a-f]{%d})(\.[^./]*)?$' % HASH_LENGTH)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """``FileSystemStorage`` naming files after their content.
+
+    The hash is always computed from the content: a hash-like part in the
+    given name (which may come from the client) is replaced, never trusted.
+    Saving content that is already stored returns the existing name
+    instead of writing a copy.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory, filename = os.path.split(name)
+        claimed = HASHED_NAME.search(filename)
+        if claimed:
+            stem, ext = filename[:claimed.start()], claimed.group(2) or ''
+        else:
+            stem, ext = os.path.splitext(filename)
+        suffix = f'.{content_hash(content)}{ext}'
+        if max_length is not None:
+            # Shorten the stem here: get_available_name would cut into the hash.
+            stem = stem[:max(max_length - len(os.path.join(directory, suffix)), 1)]
+        name = os.path.join(directory, (stem or 'file') + suffix)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def _range(header, size):
+    """``(start, end)`` (inclusive) of a single-range ``Range`` header.
+
+    Returns None to send the whole file, and raises ``ValueError`` if
+    the range can't be satisfied.
+    """
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None  # multiple ranges or another unit: send everything
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if not length:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError
+    return start, end
+
+
+def _read_slice(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404('Media file not found.')
+    if not os.path.isfile(fullpath):
+        raise Http404('Media file not found.')
+
+    hashed = HASHED_NAME.search(path)
+    if hashed:
+        etag = f'"{hashed.group(1)}"'
+        cache = {'max_age': IMMUTABLE_MAX_AGE, 'immutable': True}
+    else:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache = {'max_age': settings.STADIUM_MEDIA_MAX_AGE}
+    last_modified = int(stat.st_mtime)
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        offload = settings.STADIUM_MEDIA_OFFLOAD
+        if offload == 'x-accel':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.STADIUM_MEDIA_ACCEL_PREFIX + path
+        elif offload == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = fullpath
+        elif offload is not None:
+            raise ValueError(f'Unknown STADIUM_MEDIA_OFFLOAD {offload!r}, use None, x-accel or x-sendfile.')
+        else:
+            response = _file_response(request, fullpath, stat.st_size, etag, content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if response.status_code in (200, 206):
+        patch_cache_control(response, public=True, **cache)
+    return response
+
+
+def _file_response(request, fullpath, size, etag, content_type):
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header and (if_range is None or if_range == etag):
+        try:
+            span = _range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if span is not None:
+            start, end = span
+            response = StreamingHttpResponse(
+                _read_slice(fullpath, start, end - start + 1), status=206, content_type=content_type,
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+    response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,199 @@
+"""In-process request metrics, exposed in Prometheus text format.
+
+``RequestMetricsMiddleware`` records, per route (the URL name), the request
+latency and the number and duration of ORM queries it ran. Values go into
+fixed-bucket histograms, so recording is a bisect and an increment and memory
+does not grow with traffic. Quantiles are interpolated inside the bucket, so
+they are accurate to within one bucket width (~19%).
+
+Metrics are per process; with several workers scrape each one.
+"""
+import contextvars
+import hmac
+import threading
+from bisect import bisect_left
+from time import perf_counter_ns
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def exponential_bounds(start, factor, count):
+    return tuple(start * factor ** i for i in range(count))
+
+
+# 50us .. ~80s in steps of 2 ** (1/4).
+LATENCY_BOUNDS_NS = exponential_bounds(50_000, 2 ** 0.25, 83)
+QUERY_COUNT_BOUNDS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 16, 20, 25, 32, 40, 50, 64, 80, 100, 128, 256, 512, 1024)
+
+
+class Histogram:
+    """Counts of observations per bucket; bucket ``i`` holds values ``<= bounds[i]``."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile by linear interpolation inside its bucket."""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket in enumerate(counts):
+            if bucket and seen + bucket >= rank:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0
+                return lower + (self.bounds[index] - lower) * (rank - seen) / bucket
+            seen += bucket
+        return self.bounds[-1]
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.duration_ns = Histogram(LATENCY_BOUNDS_NS)
+        self.queries = Histogram(QUERY_COUNT_BOUNDS)
+        self.query_ns = Histogram(LATENCY_BOUNDS_NS)
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, duration_ns, status_code, queries, query_ns):
+        self.duration_ns.observe(duration_ns)
+        self.queries.observe(queries)
+        self.query_ns.observe(query_ns)
+        status = f'{status_code // 100}xx'
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+class Registry:
+    def __init__(self):
+        self.routes = {}
+        self._lock = threading.Lock()
+
+    def route(self, name):
+        metrics = self.routes.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self.routes.setdefault(name, RouteMetrics())
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self.routes = {}
+
+
+registry = Registry()
+
+
+class QueryStats:
+    __slots__ = ('count', 'duration_ns')
+
+    def __init__(self):
+        self.count = 0
+        self.duration_ns = 0
+
+
+# Stats of the request being handled in the current thread / task. Async ORM
+# queries run in a worker thread but inherit the context, so they land here too.
+current_queries = contextvars.ContextVar('current_queries', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` that adds the query to ``current_queries``."""
+    stats = current_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = perf_counter_ns()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration_ns += perf_counter_ns() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``record_query`` to every connection.
+
+    Each thread has its own connection, and under ASGI neither sync views nor
+    async ORM calls run in the thread of the middleware, so the wrapper has to
+    be on all of them. Queries outside a request are not recorded.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _summary(lines, name, help_text, routes, attr, scale=1):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} summary')
+    for route, metrics in routes:
+        histogram = getattr(metrics, attr)
+        label = f'route="{_escape(route)}"'
+        for q in QUANTILES:
+            value = histogram.quantile(q)
+            if value is not None:
+                lines.append(f'{name}{{{label},quantile="{q}"}} {value / scale:.6g}')
+        lines.append(f'{name}_sum{{{label}}} {histogram.sum / scale:.6g}')
+        lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+
+def render(registry=registry):
+    routes = sorted(registry.routes.items())
+    lines = []
+    _summary(lines, 'http_request_duration_seconds', 'Request latency by route.', routes, 'duration_ns', 1e9)
+    _summary(lines, 'http_request_db_queries', 'ORM queries per request by route.', routes, 'queries')
+    _summary(lines, 'http_request_db_duration_seconds', 'Time spent in ORM queries per request by route.',
+             routes, 'query_ns', 1e9)
+    lines.append('# HELP http_requests_total Requests by route and status class.')
+    lines.append('# TYPE http_requests_total counter')
+    for route, metrics in routes:
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f'http_requests_total{{route="{_escape(route)}",status="{status}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _scrape_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        keyword, _, value = request.headers.get('Authorization', '').partition(' ')
+        if keyword == 'Bearer' and hmac.compare_digest(value.strip().encode(), token.encode()):
+            return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint.
+
+    Answered for ``Authorization: Bearer <METRICS_TOKEN>`` or a client address
+    in ``METRICS_ALLOWED_IPS``. Behind a reverse proxy every request comes from
+    the proxy's address, so keep the list empty there and use the token.
+    """
+    if not _scrape_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,18 +1,61 @@
-# myproject/middleware.py
-import time
 import logging
+from time import perf_counter_ns
 
-logger = logging.getLogger(__name__)
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+logger = logging.getLogger('core.requests')
+
+
+class RequestMetricsMiddleware:
+    """Record latency and ORM query count/time per route, see ``core.metrics``.
+
+    Does no I/O itself: the per-request log line goes through the queued
+    handler configured in ``LOGGING``. Async-capable so async views under ASGI
+    are not pushed onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
 
-class RequestTimingMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-       
-        start_time = time.time()
-        response = self.get_response(request)
-        duration = time.time() - start_time
-        print(f"Request to {request.path} took {duration:.3f} seconds.")
-        logger.info(f"Request to {request.path} took {duration:.3f} seconds.")
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = self.start()
+        start = perf_counter_ns()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_queries.reset(token)
+        self.record(request, response, perf_counter_ns() - start, stats)
         return response
+
+    async def __acall__(self, request):
+        stats, token = self.start()
+        start = perf_counter_ns()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_queries.reset(token)
+        self.record(request, response, perf_counter_ns() - start, stats)
+        return response
+
+    @staticmethod
+    def start():
+        # Queries are recorded by the wrapper metrics.install_query_recorder puts on every connection.
+        stats = metrics.QueryStats()
+        return stats, metrics.current_queries.set(stats)
+
+    @staticmethod
+    def record(request, response, duration_ns, stats):
+        route = metrics.route_name(request)
+        metrics.registry.route(route).record(duration_ns, response.status_code, stats.count, stats.duration_ns)
+        logger.info(
+            'method=%s route=%s status=%s duration_ms=%.3f queries=%d db_ms=%.3f',
+            request.method, route, response.status_code, duration_ns / 1e6, stats.count, stats.duration_ns / 1e6,
+        )
@@ -0,0 +1,151 @@
+"""Prebuilt OpenAPI schema.
+
+drf_yasg builds the schema by introspecting every view and serializer, on
+every request. ``build()`` (``manage.py build_schema``, run at deploy)
+renders it once to ``openapi.json`` and ``openapi.yaml`` in
+``STADIUM_SCHEMA_DIR``, stamped with the code version, and ``schema_file``
+serves them from memory with a strong ETag and ``Cache-Control: public``.
+A process that finds the files missing or stamped with another version
+rebuilds them on the first schema request, so skipping the command only
+costs one introspection per deploy.
+
+The code version is ``STADIUM_CODE_VERSION`` (e.g. the git commit, set by
+the deploy) or, when unset, a hash of the project's Python sources and the
+Django, DRF and drf_yasg versions.
+
+The prebuilt schema is generated without a request, so it has no ``host``
+or ``schemes``: clients use the ones the schema was fetched from.
+"""
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import django
+import drf_yasg
+import rest_framework
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+API_INFO = openapi.Info(
+    title="Snippets API",
+    default_version='v1',
+    description="Test description",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@snippets.local"),
+    license=openapi.License(name="BSD License"),
+)
+
+schema_view = get_schema_view(
+    API_INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+# format -> (codec, content type)
+FORMATS = {
+    'json': (OpenAPICodecJson, 'application/json'),
+    'yaml': (OpenAPICodecYaml, 'application/yaml'),
+}
+SOURCE_DIRS = ('core', 'stadium')
+VERSION_FILE = 'VERSION'
+
+_loaded = {}  # path -> (content, etag)
+_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    version = os.environ.get('STADIUM_CODE_VERSION')
+    if version:
+        return version
+    digest = hashlib.sha256()
+    for package in (django, rest_framework, drf_yasg):
+        digest.update(f'{package.__name__}={package.__version__}\n'.encode())
+    for directory in SOURCE_DIRS:
+        for path in sorted((settings.BASE_DIR / directory).rglob('*.py')):
+            digest.update(str(path.relative_to(settings.BASE_DIR)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def schema_dir():
+    return Path(settings.STADIUM_SCHEMA_DIR)
+
+
+def built_version(directory=None):
+    """Code version the files in ``directory`` were built for, or None."""
+    try:
+        return ((directory or schema_dir()) / VERSION_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _write(path, content):
+    """Replace ``path`` atomically, so readers never see a half-written file."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build():
+    """Generate the schema and write it to ``STADIUM_SCHEMA_DIR``; returns the paths written."""
+    directory = schema_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    schema = schema_view.generator_class(API_INFO).get_schema(request=None, public=True)
+    paths = []
+    for fmt, (codec, _) in FORMATS.items():
+        path = directory / f'openapi.{fmt}'
+        _write(path, codec(validators=[]).encode(schema))
+        paths.append(path)
+    # Written last: a crash before this leaves the files marked stale.
+    _write(directory / VERSION_FILE, code_version().encode())
+    _loaded.clear()
+    return paths
+
+
+def load(fmt):
+    """``(content, etag)`` of the prebuilt schema, built first if missing or stale."""
+    path = schema_dir() / f'openapi.{fmt}'
+    entry = _loaded.get(path)
+    if entry is None:
+        with _lock:
+            entry = _loaded.get(path)
+            if entry is None:
+                if built_version(path.parent) != code_version():
+                    build()
+                content = path.read_bytes()
+                entry = _loaded[path] = (content, f'"{hashlib.sha256(content).hexdigest()[:32]}"')
+    return entry
+
+
+@require_safe
+def schema_file(request, fmt):
+    content, etag = load(fmt)
+    response = get_conditional_response(request, etag=etag) or HttpResponse(content, content_type=FORMATS[fmt][1])
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.STADIUM_SCHEMA_MAX_AGE)
+    return response
+
+
+swagger_ui = schema_view.with_ui('swagger', cache_timeout=0)
+
+
+def swagger(request, *args, **kwargs):
+    """Swagger UI; ``?format=openapi`` (the drf_yasg spec URL) gets the prebuilt JSON."""
+    if request.GET.get('format') == 'openapi':
+        return schema_file(request, 'json')
+    return swagger_ui(request, *args, **kwargs)
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
+from core.db import database_profile
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,13 +52,55 @@ AUTH_USER_MODEL = 'stadium.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'stadium.authentication.CachedTokenAuthentication',
 
     ],
+    'DEFAULT_THROTTLE_CLASSES': ['stadium.throttling.TokenBucketThrottle'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 2000,  # Adjust as needed
 }
 
+# Read-through cache for the field catalogue/detail responses (see stadium/cache.py).
+# For several workers use {'BACKEND': 'stadium.cache.DjangoCache', 'OPTIONS': {'alias': 'default'}}
+# with a shared CACHES backend, and 'versions_alias' for a non-evicting one holding the version stamps.
+STADIUM_CACHE = {
+    'BACKEND': 'stadium.cache.LocalLRUCache',
+    'OPTIONS': {'max_entries': 1000, 'timeout': 60},
+}
+
+# token key -> user snapshot, see stadium.authentication.
+STADIUM_AUTH_CACHE = {
+    'BACKEND': 'stadium.cache.LocalLRUCache',
+    'OPTIONS': {'max_entries': 10000, 'timeout': 300},
+}
+
+# Token-bucket budgets per view throttle_scope, see stadium/throttling.py.
+STADIUM_THROTTLE_RATES = {
+    # scope: {'anon' (per IP) | 'user' (per token): (requests per second, burst)}
+    'availability': {'anon': (2, 20), 'user': (5, 40)},  # filter and calendar: scans and sorts
+    'list': {'anon': (20, 100), 'user': (50, 200)},
+    'booking': {'user': (2, 20)},  # writes
+}
+# Per process; use stadium.throttling.CacheBucketStore (OPTIONS: {'alias': ...}) to share across workers.
+STADIUM_THROTTLE_STORE = {
+    'BACKEND': 'stadium.throttling.LocalBucketStore',
+    'OPTIONS': {'max_entries': 100000},
+}
+# Requests in flight per throttle_scope and process before new ones get a 503
+# (stadium.throttling.ThrottleMiddleware); 'default' covers the other views.
+STADIUM_CONCURRENCY_LIMITS = {
+    'availability': 4,
+    'default': 32,
+}
+# Benchmarks against a running server (bench_asgi --server) measure the views, not the throttles.
+if os.environ.get('STADIUM_UNTHROTTLED'):
+    STADIUM_THROTTLE_RATES = STADIUM_CONCURRENCY_LIMITS = {}
+
+# Upper bound of the 'k' (nearest fields) parameter of the geo filters, see stadium.views.parse_field_filter.
+STADIUM_MAX_NEAREST = 1000
+
+# Threads building resized WebP image variants (see stadium/images.py); 0 builds them inline.
+STADIUM_IMAGE_WORKERS = 2
 
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -66,10 +112,16 @@ SWAGGER_SETTINGS = {
         }
     },
     'USE_SESSION_AUTH': False,  # Disable Django session auth (if not needed)
+    'SPEC_URL': 'schema-json',  # the prebuilt schema, see core/schema.py
 }
 
+# Prebuilt OpenAPI schema (manage.py build_schema), see core/schema.py.
+STADIUM_SCHEMA_DIR = BASE_DIR / 'openapi'
+STADIUM_SCHEMA_MAX_AGE = 3600  # seconds; revalidated with the ETag afterwards
+
 MIDDLEWARE = [
-     "core.middleware.RequestTimingMiddleware",
+    'core.middleware.RequestMetricsMiddleware',
+    'stadium.throttling.ThrottleMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -105,22 +157,33 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# See core/db.py for the profiles: sqlite (tuned, default), sqlite-plain, postgres.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_profile(os.environ.get('STADIUM_DB_PROFILE', 'sqlite'), BASE_DIR),
 }
 
+# Log file of core.requests and django; STADIUM_REQUEST_LOG='' turns it off. The
+# test runner and the bench commands never write it: they would flood it.
+REQUEST_LOG_FILE = os.environ.get('STADIUM_REQUEST_LOG', str(BASE_DIR / 'request_timing.log'))
+if len(sys.argv) > 1 and (sys.argv[1] == 'test' or sys.argv[1].startswith('bench')):
+    REQUEST_LOG_FILE = ''
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
     'handlers': {
+        # Written by a background thread, so logging never blocks a request.
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'request_timing.log',
-        },
+            'class': 'core.log_handlers.QueuedFileHandler',
+            'filename': REQUEST_LOG_FILE,
+            'formatter': 'plain',
+        } if REQUEST_LOG_FILE else {'class': 'logging.NullHandler'},
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
@@ -132,9 +195,21 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # One line per request from core.middleware.RequestMetricsMiddleware.
+        'core.requests': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
+# /metrics answers requests with "Authorization: Bearer <METRICS_TOKEN>" or from
+# METRICS_ALLOWED_IPS (comma separated). Behind a reverse proxy every client has
+# the proxy's address, so use the token there.
+METRICS_TOKEN = os.environ.get('STADIUM_METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = tuple(filter(None, os.environ.get('STADIUM_METRICS_ALLOWED_IPS', '').split(',')))
+
 
 
 # Password validation
@@ -170,6 +245,17 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'uploads'
 
+STORAGES = {
+    # Content-hashed file names, see core/media.py.
+    'default': {'BACKEND': 'core.media.HashedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Media serving (core/media.py): None (Django sends the file), 'x-accel' (nginx) or 'x-sendfile'.
+STADIUM_MEDIA_OFFLOAD = os.environ.get('STADIUM_MEDIA_OFFLOAD') or None
+STADIUM_MEDIA_ACCEL_PREFIX = '/protected-media/'
+STADIUM_MEDIA_MAX_AGE = 3600  # seconds, for files without a content hash in their name
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
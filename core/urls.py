@@ -14,36 +14,24 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 
-from django.urls import re_path
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from django.conf import settings
-from django.conf.urls.static import static
-
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Snippets API",
-      default_version='v1',
-      description="Test description",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@snippets.local"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+from core.media import serve_media
+from core.metrics import metrics_view
+from core.schema import schema_file, swagger
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('stadium.urls'), name='stadium'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui')
+    path('swagger/', swagger, name='schema-swagger-ui'),
+    path('swagger.json', schema_file, {'fmt': 'json'}, name='schema-json'),
+    path('swagger.yaml', schema_file, {'fmt': 'yaml'}, name='schema-yaml'),
+    path('metrics', metrics_view, name='metrics'),
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
 ] 
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,9 +1,52 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
 from .models import Booking, User, FootballField, Image
+from .pagination import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables with millions of rows.
+
+    No exact ``COUNT(*)`` (neither for the page links nor the "N total"
+    link), related objects joined instead of fetched per row, and foreign
+    keys edited through autocomplete rather than a ``<select>`` of every row.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 100
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin, BaseUserAdmin):
+    fieldsets = BaseUserAdmin.fieldsets + (('Role', {'fields': ('role',)}),)
+    add_fieldsets = BaseUserAdmin.add_fieldsets + (('Role', {'fields': ('role',)}),)
+    list_display = ('username', 'email', 'role', 'is_staff')
+    list_filter = ('role', 'is_staff', 'is_superuser', 'is_active')
+
+
+@admin.register(FootballField)
+class FootballFieldAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'owner', 'address', 'hourly_rate')
+    list_select_related = ('owner',)
+    autocomplete_fields = ('owner',)
+    search_fields = ('name', 'address')
+
+
+@admin.register(Booking)
+class BookingAdmin(LargeTableAdmin):
+    list_display = ('id', 'field', 'user', 'booking_date', 'start_time', 'end_time', 'created_at')
+    list_select_related = ('field', 'user')
+    autocomplete_fields = ('field', 'user')
+    # The drill-down filters are booking_date ranges and the ordering follows
+    # booking_date_time_field_idx, so a page is an index range scan. The
+    # change_list template swaps in stadium_admin's calendar_date_hierarchy.
+    date_hierarchy = 'booking_date'
+    ordering = ('-booking_date', '-start_time')
 
-admin.site.register(User)
-admin.site.register(Booking)
-admin.site.register(FootballField)
-admin.site.register(Image)
 
-# Register your models here.
+@admin.register(Image)
+class ImageAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'football_field')
+    list_select_related = ('football_field',)
+    autocomplete_fields = ('football_field',)
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class StadiumConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stadium'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from core.db import configure_connection
+        from core.metrics import install_query_recorder
+        from . import signals  # noqa: F401
+
+        connection_created.connect(configure_connection, dispatch_uid='stadium.configure_connection')
+        connection_created.connect(install_query_recorder, dispatch_uid='stadium.install_query_recorder')
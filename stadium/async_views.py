@@ -0,0 +1,201 @@
+"""Async-native versions of the hot read endpoints.
+
+These are plain Django ``async def`` views on the async ORM, so under
+``core.asgi`` a request waiting on the database or on a slow client does not
+hold a worker thread. Responses have the same shape as the DRF views they
+mirror.
+"""
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import availability, cache, geo
+from .authentication import CachedTokenAuthentication
+from .fastpath import image_data
+from .models import Booking, FootballField, Image
+from .pagination import FieldFilterPagination, FootballFieldPagination
+from .views import parse_field_filter
+
+CENTS = Decimal('0.01')
+
+
+def _site_root(request):
+    return request.build_absolute_uri('/')[:-1]
+
+
+def _image_data(image, site_root):
+    return image_data(image.name, image.path.name, image.variants, site_root)
+
+
+def _field_data(field, images, site_root):
+    return {
+        'id': field.id,
+        'owner': field.owner_id,
+        'name': field.name,
+        'address': field.address,
+        'contact': field.contact,
+        'hourly_rate': '{:f}'.format(field.hourly_rate.quantize(CENTS)),
+        'latitude': field.latitude,
+        'longitude': field.longitude,
+        'images': [_image_data(image, site_root) for image in images],
+    }
+
+
+def _booking_data(booking):
+    created_at = timezone.localtime(booking.created_at).isoformat()
+    if created_at.endswith('+00:00'):
+        created_at = created_at[:-6] + 'Z'
+    return {
+        'id': booking.id,
+        'booking_date': booking.booking_date.isoformat(),
+        'start_time': booking.start_time.isoformat(),
+        'end_time': booking.end_time.isoformat(),
+        'created_at': created_at,
+        'user': booking.user_id,
+        'field': booking.field_id,
+    }
+
+
+async def _fields_data(fields, request):
+    """Serialise fields with their images, fetched in one extra query."""
+    images = {}
+    if fields:
+        queryset = Image.objects.filter(football_field_id__in=[field.id for field in fields]).order_by('id')
+        async for image in queryset:
+            images.setdefault(image.football_field_id, []).append(image)
+    site_root = _site_root(request)
+    return [_field_data(field, images.get(field.id, []), site_root) for field in fields]
+
+
+_token_authentication = CachedTokenAuthentication()
+
+
+async def _authenticate(request):
+    """The request's user, authenticated like the DRF views by ``CachedTokenAuthentication``.
+
+    Shares its token cache and the signals evicting revoked tokens. Raises
+    ``NotAuthenticated`` without a token and ``AuthenticationFailed`` for a
+    bad one.
+    """
+    result = await sync_to_async(_token_authentication.authenticate)(request)
+    if result is None:
+        raise NotAuthenticated()
+    return result[0]
+
+
+def _error(exc):
+    return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+
+
+def _not_found(model):
+    return JsonResponse({'detail': f'No {model._meta.object_name} matches the given query.'}, status=404)
+
+
+async def _cached(request, key, view):
+    """``CachedResponseMixin`` for the async views: same cache, ETags and 304s.
+
+    Only 200 responses of ``await view()`` are stored. The cache backend is
+    called inline; the default ``LocalLRUCache`` never blocks for long.
+    """
+    etag = cache.etag_for(key)
+    response = cache.not_modified(request, etag)
+    if response is not None:
+        return response
+    backend = cache.get_cache()
+    content = backend.lookup(key)
+    if content is not None:
+        response = HttpResponse(content, content_type='application/json')
+    else:
+        response = await view()
+        if response.status_code != 200:
+            return response
+        backend.set(key, response.content)
+    response['ETag'] = etag
+    return response
+
+
+async def field_list(request):
+    async def view():
+        paginator = FootballFieldPagination()
+        try:
+            fields = await paginator.apaginate_queryset(FootballField.objects.all(), Request(request))
+        except APIException as exc:
+            return _error(exc)
+        return JsonResponse(paginator.get_paginated_data(await _fields_data(fields, request)))
+
+    return await _cached(request, f'catalogue:{cache.catalogue_version()}:{request.build_absolute_uri()}', view)
+
+
+async def field_detail(request, pk):
+    async def view():
+        field = await FootballField.objects.filter(pk=pk).afirst()
+        if field is None:
+            return _not_found(FootballField)
+        data = await _fields_data([field], request)
+        return JsonResponse(data[0])
+
+    return await _cached(request, f'field:{pk}:{cache.field_version(pk)}:{request.build_absolute_uri()}', view)
+
+
+async def available_fields(request):
+    try:
+        params = parse_field_filter(request.GET)
+        limit = int(request.GET.get('limit', FieldFilterPagination.default_limit))
+        offset = int(request.GET.get('offset', 0))
+    except APIException as exc:
+        return _error(exc)
+    except ValueError:
+        return JsonResponse({'detail': "'limit' and 'offset' must be integers."}, status=400)
+    if limit <= 0 or offset < 0:
+        return JsonResponse({'detail': "'limit' must be positive and 'offset' must not be negative."}, status=400)
+    limit = min(limit, FieldFilterPagination.max_limit)
+
+    fields = FootballField.objects.all()
+    if params['booking_date']:
+        busy = availability.busy_fields(params['booking_date'], params['start_time'], params['end_time'])
+        fields = fields.exclude(id__in=busy)
+
+    if params['lat'] is not None:
+        fields = geo.nearest(fields, params['lat'], params['lon'], params['radius_km'], params['k'])
+    count = await fields.acount()
+    page = [field async for field in fields[offset:offset + limit]]
+
+    url = request.build_absolute_uri()
+    next_url = previous_url = None
+    if offset + limit < count:
+        next_url = replace_query_param(replace_query_param(url, 'limit', limit), 'offset', offset + limit)
+    if offset > 0:
+        previous_url = replace_query_param(url, 'limit', limit)
+        if offset - limit > 0:
+            previous_url = replace_query_param(previous_url, 'offset', offset - limit)
+        else:
+            previous_url = remove_query_param(previous_url, 'offset')
+    return JsonResponse({
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': await _fields_data(page, request),
+    })
+
+
+async def booking_detail(request, pk):
+    try:
+        await _authenticate(request)
+    except APIException as exc:
+        response = _error(exc)
+        response['WWW-Authenticate'] = _token_authentication.authenticate_header(request)
+        return response
+    booking = await Booking.objects.filter(pk=pk).afirst()
+    if booking is None:
+        return _not_found(Booking)
+    return JsonResponse(_booking_data(booking))
+
+
+# Read by stadium.throttling.ThrottleMiddleware, like a DRF view's attribute.
+field_list.throttle_scope = field_detail.throttle_scope = 'list'
+available_fields.throttle_scope = 'availability'
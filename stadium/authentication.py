@@ -0,0 +1,69 @@
+"""Token authentication with the token -> user lookup cached.
+
+``CachedTokenAuthentication`` keeps a small snapshot of the user (id,
+username, role and the permission flags) per token key, so a warm request
+is authenticated without touching the database. The rest of the user's
+columns are deferred and only loaded if something reads them.
+
+The backend is configured with ``STADIUM_AUTH_CACHE``, in the same format as
+``STADIUM_CACHE`` (see ``stadium.cache``). Entries are evicted by signals
+when a token is deleted (logout) or its user changes. A ``LocalLRUCache``
+only sees the evictions of its own process, so its ``timeout`` bounds how
+long another worker may keep accepting a revoked token.
+"""
+import hashlib
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import get_cache
+from .models import User
+
+SNAPSHOT_FIELDS = ('id', 'username', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+
+def get_token_cache():
+    return get_cache('STADIUM_AUTH_CACHE')
+
+
+def _cache_key(key):
+    # Token keys are credentials: keep them out of a shared cache.
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(keys):
+    token_cache = get_token_cache()
+    for key in keys:
+        token_cache.delete(_cache_key(key))
+
+
+def _user_from_snapshot(snapshot):
+    return User.from_db('default', SNAPSHOT_FIELDS, [snapshot[name] for name in SNAPSHOT_FIELDS])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        cache_key = _cache_key(key)
+        snapshot = token_cache.lookup(cache_key)
+        if snapshot is None:
+            token, user = self.load(key)
+            snapshot = {name: getattr(user, name) for name in SNAPSHOT_FIELDS}
+            token_cache.set(cache_key, snapshot)
+        else:
+            user = _user_from_snapshot(snapshot)
+            token = Token(key=key, user=user)
+            token._state.adding = False
+
+        if not snapshot['is_active']:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return user, token
+
+    def load(self, key):
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        return token, token.user
@@ -0,0 +1,228 @@
+"""Per-field, per-day slot bitmaps used to answer availability questions.
+
+A day is split into ``SLOTS_PER_DAY`` slots of ``SLOT_MINUTES``. Bit ``i`` of a
+``FieldAvailability.bitmap`` is set when any booking on that field and date
+touches slot ``i``. Overlap checks then become bitwise ANDs, done in SQL; only
+bookings that start or end inside a slot (e.g. 10:05) need a look at
+``Booking`` itself to decide the partially covered edge slots of a request.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import BooleanField, Exists, F, Func, OuterRef, Q
+
+from .models import Booking, FieldAvailability
+
+SLOT_MINUTES = 15
+SLOT_SECONDS = SLOT_MINUTES * 60
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+DAY_SECONDS = 24 * 3600
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def slot_mask(start_time, end_time):
+    """Bits of every slot touched by ``[start_time, end_time)``."""
+    start, end = _seconds(start_time), _seconds(end_time)
+    if end <= start:
+        return 0
+    first = start // SLOT_SECONDS
+    last = (end - 1) // SLOT_SECONDS
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def inner_mask(start_time, end_time):
+    """Bits of the slots lying completely inside ``[start_time, end_time)``."""
+    start, end = _seconds(start_time), _seconds(end_time)
+    first = -(-start // SLOT_SECONDS)
+    last = end // SLOT_SECONDS - 1
+    if last < first:
+        return 0
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def to_bytes(bits):
+    return bits.to_bytes(BITMAP_BYTES, 'big')
+
+
+def from_bytes(data):
+    return int.from_bytes(bytes(data), 'big') if data else 0
+
+
+def free_slots(bits):
+    return SLOTS_PER_DAY - bin(bits).count('1')
+
+
+def _overlapping(booking_date, start_time, end_time):
+    return Booking.objects.filter(
+        booking_date=booking_date,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    )
+
+
+class SharesSlot(Func):
+    """True when the bitmap in ``expression`` has any bit of ``mask`` set.
+
+    Evaluated byte by byte in SQL so that filtering by availability never
+    pulls bitmaps into Python. SQLite cannot read a byte of a blob as an
+    integer, so its variant looks the byte up in a blob of all 256 values.
+    """
+    output_field = BooleanField()
+    byte_template = 'get_byte({column}, {index})'
+
+    def __init__(self, expression, mask):
+        super().__init__(expression)
+        self.mask = mask
+
+    def as_sql(self, compiler, connection, byte_template=None, **extra_context):
+        column, params = compiler.compile(self.source_expressions[0])
+        template = byte_template or self.byte_template
+        terms = [
+            '(%s & %d) <> 0' % (template.format(column=column, index=index, offset=index + 1), byte)
+            for index, byte in enumerate(to_bytes(self.mask)) if byte
+        ]
+        if not terms:
+            return '1 = 0', []
+        return '(%s)' % ' OR '.join(terms), tuple(params) * len(terms)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            byte_template="(instr(X'%s', substr({column}, {offset}, 1)) - 1)" % bytes(range(256)).hex(),
+            **extra_context,
+        )
+
+
+def busy_fields(booking_date, start_time, end_time, field_ids=None):
+    """Return a queryset of the ids of fields with a booking overlapping the given time.
+
+    Fields whose bitmap shares a fully covered slot with the request are busy
+    for sure; fields that only touch the partially covered edge slots are
+    checked exactly against ``Booking``. The result is meant to be used as a
+    subquery, e.g. ``fields.exclude(id__in=busy_fields(...))``.
+    """
+    overlapping = _overlapping(booking_date, start_time, end_time).filter(field_id=OuterRef('field_id'))
+    rows = FieldAvailability.objects.filter(booking_date=booking_date).filter(
+        Q(SharesSlot(F('bitmap'), inner_mask(start_time, end_time)))
+        | Q(SharesSlot(F('bitmap'), slot_mask(start_time, end_time))) & Q(Exists(overlapping))
+    )
+    if field_ids is not None:
+        rows = rows.filter(field_id__in=field_ids)
+    return rows.values_list('field_id', flat=True)
+
+
+def busy_field_ids(booking_date, start_time, end_time, field_ids=None):
+    """``busy_fields`` as a set of ids."""
+    return set(busy_fields(booking_date, start_time, end_time, field_ids))
+
+
+def is_free(field_id, booking_date, start_time, end_time):
+    return not busy_fields(booking_date, start_time, end_time, field_ids=[field_id]).exists()
+
+
+def calendar_bookings(field_ids, date_from, date_to):
+    """``(field_id, booking_date, start_time, end_time)`` rows of the fields and dates, in sweep order."""
+    return (
+        Booking.objects.filter(field_id__in=field_ids, booking_date__gte=date_from, booking_date__lte=date_to)
+        .order_by('field_id', 'booking_date', 'start_time')
+        .values_list('field_id', 'booking_date', 'start_time', 'end_time')
+    )
+
+
+def free_intervals(field_ids, date_from, date_to, day_start=0, day_end=DAY_SECONDS):
+    """Free time of every field on every day of ``[date_from, date_to]``.
+
+    Returns ``{field_id: {date: [(start, end), ...]}}`` with times in seconds
+    since midnight, clipped to ``[day_start, day_end)``. All bookings come
+    from one range query in ``booking_field_date_time_idx`` order, and each
+    day's free intervals are the gaps left by a sweep over its bookings.
+    """
+    days = [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+    whole_day = [(day_start, day_end)] if day_start < day_end else []
+    result = {field_id: {day: list(whole_day) for day in days} for field_id in field_ids}
+    bookings = calendar_bookings(field_ids, date_from, date_to)
+    for (field_id, booking_date), day_bookings in groupby(bookings.iterator(), key=lambda row: row[:2]):
+        free = []
+        cursor = day_start
+        for _, _, start_time, end_time in day_bookings:
+            start, end = _seconds(start_time), _seconds(end_time)
+            if start > cursor:
+                free.append((cursor, min(start, day_end)))
+            cursor = max(cursor, end)
+            if cursor >= day_end:
+                break
+        if cursor < day_end:
+            free.append((cursor, day_end))
+        result[field_id][booking_date] = [(start, end) for start, end in free if start < end]
+    return result
+
+
+def _bitmaps_for(bookings):
+    bitmaps = defaultdict(int)
+    for field_id, booking_date, start_time, end_time in bookings:
+        bitmaps[(field_id, booking_date)] |= slot_mask(start_time, end_time)
+    return bitmaps
+
+
+def _save(bitmaps):
+    FieldAvailability.objects.bulk_create(
+        [
+            FieldAvailability(field_id=field_id, booking_date=booking_date, bitmap=to_bytes(bits))
+            for (field_id, booking_date), bits in bitmaps.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['field', 'booking_date'],
+        update_fields=['bitmap'],
+        batch_size=1000,
+    )
+
+
+def keys_q(keys):
+    """Match exactly the given ``(field_id, booking_date)`` pairs, one clause per date."""
+    by_date = defaultdict(set)
+    for field_id, booking_date in keys:
+        by_date[booking_date].add(field_id)
+    query = Q()
+    for booking_date, field_ids in by_date.items():
+        query |= Q(booking_date=booking_date, field_id__in=field_ids)
+    return query
+
+
+def refresh(keys):
+    """Recompute the bitmaps of the given ``(field_id, booking_date)`` pairs."""
+    keys = set(keys)
+    if not keys:
+        return
+    bookings = Booking.objects.filter(keys_q(keys)).values_list('field_id', 'booking_date', 'start_time', 'end_time')
+    bitmaps = _bitmaps_for(bookings)
+    with transaction.atomic():
+        empty = keys - bitmaps.keys()
+        if empty:
+            FieldAvailability.objects.filter(keys_q(empty)).delete()
+        _save(bitmaps)
+
+
+def rebuild(chunk_size=10000):
+    """Rebuild every bitmap from ``Booking``, e.g. after bulk imports."""
+    with transaction.atomic():
+        FieldAvailability.objects.all().delete()
+        bookings = (
+            Booking.objects.order_by('field_id', 'booking_date')
+            .values_list('field_id', 'booking_date', 'start_time', 'end_time')
+            .iterator(chunk_size=chunk_size)
+        )
+        pending = defaultdict(int)
+        current_field = None
+        for field_id, booking_date, start_time, end_time in bookings:
+            if field_id != current_field and len(pending) >= chunk_size:
+                _save(pending)
+                pending = defaultdict(int)
+            current_field = field_id
+            pending[(field_id, booking_date)] |= slot_mask(start_time, end_time)
+        _save(pending)
@@ -0,0 +1,92 @@
+"""Small helpers shared by the benchmark management commands."""
+import math
+import resource
+import sys
+import threading
+import time
+
+from django.db import connection
+
+# Benchmarks measure capacity: no rate limits or load shedding (see stadium.throttling).
+UNTHROTTLED = {'STADIUM_THROTTLE_RATES': {}, 'STADIUM_CONCURRENCY_LIMITS': {}}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def latency_summary(latencies):
+    """Summarise latencies given in seconds as milliseconds."""
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0) * 1000, 2),
+    }
+
+
+def run_threads(worker, threads):
+    """Run ``worker(index)`` in ``threads`` threads and return the wall time.
+
+    Each thread closes its own database connection when it is done. If a
+    worker raises, the first exception is re-raised once all threads are
+    done, instead of the thread dying quietly and skewing the results.
+    """
+    errors = []
+
+    def target(index):
+        try:
+            worker(index)
+        except BaseException as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=target, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f'{len(errors)} of {threads} benchmark threads failed') from errors[0]
+    return elapsed
+
+
+def peak_rss_mb():
+    """High-water mark of this process' resident set size."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def find_regressions(current, baseline, threshold):
+    """Compare two ``{route: result}`` dicts from ``manage.py bench``.
+
+    A route regresses when its p95 latency grows or its throughput drops by
+    more than ``threshold`` (a fraction), or when it runs more queries per
+    request or has more failed requests at all. p95 changes under 1ms are
+    ignored as noise.
+    """
+    regressions = []
+    for route, result in sorted(current.items()):
+        base = baseline.get(route)
+        if base is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + threshold) and result['p95_ms'] - base['p95_ms'] >= 1:
+            regressions.append(f"{route}: p95 {base['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result['rps'] < base['rps'] / (1 + threshold):
+            regressions.append(f"{route}: throughput {base['rps']} -> {result['rps']} req/s")
+        if result['queries_per_request'] > base['queries_per_request'] + 0.01:
+            regressions.append(
+                f"{route}: queries/request {base['queries_per_request']} -> {result['queries_per_request']}"
+            )
+        if result.get('errors', 0) > base.get('errors', 0):
+            regressions.append(f"{route}: errors {base.get('errors', 0)} -> {result['errors']}")
+    return regressions
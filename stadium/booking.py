@@ -0,0 +1,130 @@
+"""Race-free booking writes.
+
+Every write goes through ``save_booking``: inside one transaction it first
+takes the ``BookingLock`` row of the target (field, date), then checks
+``Booking`` for overlaps and saves. Two clients racing for the same slot are
+serialised on that row. On backends with row locks (PostgreSQL, MySQL)
+bookings for other fields or days proceed in parallel; SQLite has a single
+write lock, so there every booking write waits for the previous one.
+``save_bookings`` does the same for a whole batch with a fixed number of
+queries.
+
+The conflict check reads ``Booking`` itself under the lock, never the
+``FieldAvailability`` bitmaps: those are derived data, refreshed by signals
+after the write, and only serve reads.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+
+from . import availability, rollups
+from .models import Booking, BookingLock
+
+CONFLICT_MESSAGE = "This stadium is already booked for the selected time."
+
+
+def lock_slot(field_id, booking_date):
+    """Lock the (field, date) row for the rest of the current transaction.
+
+    The first statement is an UPDATE so that SQLite grabs its write lock
+    before reading anything; otherwise two deferred transactions could both
+    read and then fail to upgrade with "database is locked".
+    """
+    lock = BookingLock.objects.filter(field_id=field_id, booking_date=booking_date)
+    if lock.update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            BookingLock.objects.create(field_id=field_id, booking_date=booking_date)
+    except IntegrityError:
+        lock.update(version=F('version') + 1)
+
+
+def lock_slots(keys):
+    """``lock_slot`` for many ``(field_id, booking_date)`` pairs in two statements."""
+    BookingLock.objects.bulk_create(
+        [BookingLock(field_id=field_id, booking_date=booking_date) for field_id, booking_date in keys],
+        ignore_conflicts=True,
+    )
+    query = Q()
+    for field_id, dates in _dates_by_field(keys).items():
+        query |= Q(field_id=field_id, booking_date__in=dates)
+    BookingLock.objects.filter(query).update(version=F('version') + 1)
+
+
+def _dates_by_field(keys):
+    by_field = defaultdict(set)
+    for field_id, booking_date in keys:
+        by_field[field_id].add(booking_date)
+    return by_field
+
+
+def has_conflict(field_id, booking_date, start_time, end_time, exclude_pk=None):
+    """Whether a booking other than ``exclude_pk`` overlaps ``[start_time, end_time)``."""
+    bookings = Booking.objects.filter(
+        field_id=field_id,
+        booking_date=booking_date,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    )
+    if exclude_pk is not None:
+        bookings = bookings.exclude(pk=exclude_pk)
+    return bookings.exists()
+
+
+def save_booking(serializer, **kwargs):
+    """Save a ``BookingSerializer`` unless the slot overlaps another booking."""
+    data = serializer.validated_data
+    instance = serializer.instance
+
+    def value(name):
+        return data[name] if name in data else getattr(instance, name)
+
+    field = value('field')
+    booking_date = value('booking_date')
+    start_time = value('start_time')
+    end_time = value('end_time')
+
+    with transaction.atomic():
+        lock_slot(field.pk, booking_date)
+        if has_conflict(field.pk, booking_date, start_time, end_time, exclude_pk=getattr(instance, 'pk', None)):
+            raise ValidationError(CONFLICT_MESSAGE)
+        return serializer.save(**kwargs)
+
+
+def save_bookings(items, **kwargs):
+    """Create the bookings described by ``items``, skipping the ones that overlap.
+
+    ``items`` are dicts with ``field``, ``booking_date``, ``start_time`` and
+    ``end_time``. Existing bookings are read with one query per field, and
+    items are also checked against the earlier items of the same batch.
+    Returns one ``(booking, error)`` pair per item, in order.
+    """
+    keys = {(item['field'].pk, item['booking_date']) for item in items}
+    results, accepted = [], []
+    with transaction.atomic():
+        lock_slots(keys)
+        taken = defaultdict(list)
+        for field_id, dates in _dates_by_field(keys).items():
+            bookings = Booking.objects.filter(field_id=field_id, booking_date__in=dates)
+            for booking_date, start_time, end_time in bookings.values_list('booking_date', 'start_time', 'end_time'):
+                taken[field_id, booking_date].append((start_time, end_time))
+
+        for item in items:
+            slots = taken[item['field'].pk, item['booking_date']]
+            if any(start < item['end_time'] and end > item['start_time'] for start, end in slots):
+                results.append((None, CONFLICT_MESSAGE))
+                continue
+            slots.append((item['start_time'], item['end_time']))
+            booking = Booking(**item, **kwargs)
+            accepted.append(booking)
+            results.append((booking, None))
+
+        # bulk_create sends no signals, so the bitmaps and rollups are refreshed here.
+        Booking.objects.bulk_create(accepted)
+        keys = {(booking.field_id, booking.booking_date) for booking in accepted}
+        availability.refresh(keys)
+        rollups.refresh(keys)
+    return results
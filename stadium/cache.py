@@ -0,0 +1,300 @@
+"""Read-through cache for field catalogue and detail responses.
+
+Cached entries are keyed on version stamps (one for the whole catalogue, one
+per field), and signals bump those stamps whenever a ``FootballField`` or
+``Image`` changes, or a deleted owner is cleared from their fields. Nothing is
+ever deleted explicitly: stale entries just stop being looked up and age out
+of the LRU. The version stamps are kept apart from the bodies, so a burst of
+new bodies never evicts a version.
+
+The backend is chosen with the ``STADIUM_CACHE`` setting::
+
+    STADIUM_CACHE = {
+        'BACKEND': 'stadium.cache.LocalLRUCache',   # or 'stadium.cache.DjangoCache'
+        'OPTIONS': {'max_entries': 1000, 'timeout': 60},
+    }
+
+``LocalLRUCache`` lives in the worker process, so with several workers a
+version bump is only seen by the worker that handled the write. The version
+stamps therefore expire with the backend ``timeout`` like the bodies do: a
+worker that missed a write serves the old body, and answers 304 to its ETag,
+for at most ``timeout`` seconds. Keep it short there, or point
+``DjangoCache`` at a shared cache alias. With ``timeout: None`` nothing
+expires, which is only correct for a single worker or a shared backend.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'stadium.cache.LocalLRUCache',
+    'OPTIONS': {'max_entries': 1000, 'timeout': 60},
+}
+
+
+DEFAULT_TIMEOUT = object()
+
+
+class BaseCache:
+    """Interface of a cache backend, plus the counters every backend keeps.
+
+    ``timeout`` is in seconds; ``None`` means the entry never expires. Version
+    stamps go through ``get_version``/``set_version`` and are stored apart
+    from the bodies; they expire with ``timeout`` but are never evicted.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._counters_lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_version(self, key):
+        raise NotImplementedError
+
+    def set_version(self, key, value):
+        raise NotImplementedError
+
+    def lookup(self, key):
+        """``get`` that counts towards the hit/miss statistics."""
+        value = self.get(key)
+        self._count('misses' if value is None else 'hits')
+        return value
+
+    def stats(self):
+        return {
+            'backend': type(self).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class LocalLRUCache(BaseCache):
+    """In-process LRU with an optional per-entry timeout.
+
+    ``max_entries`` bounds the bodies only; the versions (one per field, plus
+    the catalogue's) live in a plain dict next to them.
+    """
+
+    def __init__(self, max_entries=1000, timeout=None):
+        super().__init__(timeout)
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _expires(self, timeout):
+        timeout = self.timeout if timeout is DEFAULT_TIMEOUT else timeout
+        return time.monotonic() + timeout if timeout is not None else None
+
+    @staticmethod
+    def _live(store, key):
+        entry = store.get(key)
+        if entry is not None and entry[1] is not None and entry[1] < time.monotonic():
+            del store[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(self._data, key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        expires = self._expires(timeout)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._count('evictions')
+
+    def get_version(self, key):
+        with self._lock:
+            entry = self._live(self._versions, key)
+            return entry[0] if entry else None
+
+    def set_version(self, key, value):
+        expires = self._expires(DEFAULT_TIMEOUT)
+        with self._lock:
+            self._versions[key] = (value, expires)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(entries=len(self._data), max_entries=self.max_entries, versions=len(self._versions))
+        return stats
+
+
+class DjangoCache(BaseCache):
+    """Adapter over a ``CACHES`` alias, e.g. Redis or memcached shared by all workers.
+
+    Evictions happen inside the cache server and are not counted here. Point
+    ``versions_alias`` at a cache that does not evict (e.g. a Redis database
+    with ``maxmemory-policy noeviction``) to keep the versions out of reach
+    of the bodies; it defaults to ``alias``.
+    """
+
+    def __init__(self, alias='default', timeout=None, versions_alias=None):
+        super().__init__(timeout)
+        self.alias = alias
+        self.versions_alias = versions_alias or alias
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._cache.set(key, value, self.timeout if timeout is DEFAULT_TIMEOUT else timeout)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_version(self, key):
+        return caches[self.versions_alias].get(key)
+
+    def set_version(self, key, value):
+        caches[self.versions_alias].set(key, value, self.timeout)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_cache(setting='STADIUM_CACHE'):
+    """The backend configured by ``setting`` (default: ``STADIUM_CACHE``), built once."""
+    backend = _backends.get(setting)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(setting)
+            if backend is None:
+                config = getattr(settings, setting, DEFAULT_SETTINGS)
+                backend = _backends[setting] = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+    return backend
+
+
+def reset_cache():
+    """Drop the configured backends, e.g. after changing their settings in tests."""
+    _backends.clear()
+
+
+def _version(key):
+    # A version that was lost (evicted or expired) is replaced by a fresh
+    # timestamp, so entries cached under the old one can never become current
+    # again. Versions live as long as the bodies (the backend timeout), which
+    # bounds how long a worker that missed a bump keeps serving its old ETag.
+    cache = get_cache()
+    version = cache.get_version(key)
+    if version is None:
+        version = time.time_ns()
+        cache.set_version(key, version)
+    return version
+
+
+def catalogue_version():
+    return _version('version:catalogue')
+
+
+def field_version(pk):
+    return _version(f'version:field:{pk}')
+
+
+def bump_field(pk):
+    cache = get_cache()
+    now = time.time_ns()
+    cache.set_version('version:catalogue', now)
+    if pk is not None:
+        cache.set_version(f'version:field:{pk}', now)
+
+
+def etag_for(key):
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()[:32]
+
+
+def not_modified(request, etag):
+    """A 304 for ``request`` when its ``If-None-Match`` matches ``etag``, else ``None``."""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if etag in etags or '*' in etags:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+    return None
+
+
+class CachedResponseMixin:
+    """Serve JSON GET responses from the cache, with ETag / If-None-Match support.
+
+    Views provide ``get_cache_key(request)``, which must include every version
+    stamp the response depends on. The ETag is derived from that key, so a
+    matching ``If-None-Match`` is answered with a 304 before any query runs;
+    it is as fresh as the version stamps, see the module docstring.
+    """
+
+    def get_cache_key(self, request):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().get(request, *args, **kwargs)
+
+        key = self.get_cache_key(request)
+        etag = etag_for(key)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        cache = get_cache()
+        content = cache.lookup(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=request.accepted_renderer.media_type)
+            response['ETag'] = etag
+            return response
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            response.add_post_render_callback(lambda rendered: cache.set(key, rendered.content))
+        return response
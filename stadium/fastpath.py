@@ -0,0 +1,241 @@
+"""Read-only fast path for the large list endpoints.
+
+DRF serializes a row by resolving every field's attribute and calling its
+``to_representation``; on a 2000-row page that costs far more than the SQL.
+``RowSerializer`` compiles a serializer's fields once into plain converters
+over ``.values()`` dicts, and ``FastJSONRenderer`` renders with orjson when
+it is installed. The bytes sent are the same as the DRF serializer plus
+``JSONRenderer`` would produce (``FastPathTests`` checks this); anything the
+fast path cannot reproduce exactly falls back to DRF.
+"""
+import decimal
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from .images import storage_url, variant_urls
+from .models import Image
+from .serializers import BookingSerializer, FootballFieldSerializer
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used instead
+    orjson = None
+
+ISO_8601 = 'iso-8601'
+# Fields whose ``to_representation`` is a no-op on the value the database returns.
+PLAIN_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+
+
+class ReprFloat(float):
+    """A float orjson would print differently from ``repr()``.
+
+    orjson does not serialize float subclasses, so meeting one makes
+    ``FastJSONRenderer`` fall back to the stdlib encoder.
+    """
+
+
+def exact_float(value):
+    value = float(value)
+    # Same digits as repr() in this range; outside it repr() uses an exponent.
+    if value == 0.0 or 1e-4 <= abs(value) < 1e16:
+        return value
+    return ReprFloat(value)
+
+
+def _decimal_converter(field):
+    if field.localize or not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        return field.to_representation
+    if field.decimal_places is None:
+        return '{:f}'.format
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    tz = getattr(field, 'timezone', None)
+    if output_format is None or output_format.lower() != ISO_8601 or (tz is None and not settings.USE_TZ):
+        return field.to_representation
+    # Looked up per page: the current timezone can change per request.
+    tz = tz or timezone.get_current_timezone()
+
+    def convert(value):
+        if timezone.is_naive(value):
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _date_or_time_converter(field, setting):
+    output_format = getattr(field, 'format', setting)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+def converter_for(field):
+    """A function turning a database value into ``field``'s output, or None if it is passed as is."""
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return _date_or_time_converter(field, api_settings.DATE_FORMAT)
+    if isinstance(field, serializers.TimeField):
+        return _date_or_time_converter(field, api_settings.TIME_FORMAT)
+    if isinstance(field, serializers.ChoiceField):
+        return field.to_representation
+    if isinstance(field, serializers.FloatField):
+        return exact_float
+    if isinstance(field, PLAIN_FIELDS):
+        return None
+    if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+        return None  # .values() returns the id
+    raise TypeError(f'{type(field).__name__} {field.field_name!r} has no fast path converter.')
+
+
+class RowSerializer:
+    """Compiled, read-only version of ``serializer_class`` over ``.values()`` rows.
+
+    Only fields backed by a model column are supported; the names in
+    ``exclude`` (nested or computed fields) are left for the caller to add.
+    """
+
+    def __init__(self, serializer_class, exclude=()):
+        self.serializer_class = serializer_class
+        self.exclude = set(exclude)
+        self._fields = None
+
+    @property
+    def fields(self):
+        # Built on first use, once the app registry and settings are ready.
+        if self._fields is None:
+            fields = []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only or name in self.exclude:
+                    continue
+                if field.source == '*' or '.' in field.source:
+                    raise TypeError(f'Field {name!r} has a dotted source, which the fast path does not support.')
+                converter_for(field)  # fail early on unsupported fields
+                fields.append((name, field.source, field))
+            self._fields = fields
+        return self._fields
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values(*[source for _, source, _ in self.fields])
+
+    def to_representation(self, rows):
+        columns = [(name, source, converter_for(field)) for name, source, field in self.fields]
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert in columns:
+                value = row[source]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+def absolute_url(url, site_root):
+    if url.startswith('/') and not url.startswith('//'):
+        return site_root + url
+    return url
+
+
+def image_data(name, path, variants, site_root):
+    """What ``ImageSerializer`` returns for one image, from its column values."""
+    path = absolute_url(storage_url(path), site_root) if path else None
+    urls = {key: absolute_url(url, site_root) for key, url in variant_urls(variants).items()}
+    return {'name': name, 'path': path, 'thumbnail': urls.get('thumb', path), 'variants': urls}
+
+
+def images_by_field(field_ids, site_root):
+    """``{field_id: [image data]}`` for ``field_ids``, in one query."""
+    images = {}
+    rows = (
+        Image.objects.filter(football_field_id__in=field_ids)
+        .order_by('id')
+        .values_list('football_field_id', 'name', 'path', 'variants')
+    )
+    for field_id, name, path, variants in rows:
+        images.setdefault(field_id, []).append(image_data(name, path, variants, site_root))
+    return images
+
+
+FIELD_ROWS = RowSerializer(FootballFieldSerializer, exclude=['images'])
+BOOKING_ROWS = RowSerializer(BookingSerializer)
+
+
+def field_data(rows, request):
+    """``FootballFieldSerializer(many=True).data`` for ``FIELD_ROWS`` rows, images included."""
+    data = FIELD_ROWS.to_representation(rows)
+    images = images_by_field([item['id'] for item in data], request.build_absolute_uri('/')[:-1])
+    for item in data:
+        item['images'] = images.get(item['id'], [])
+    return data
+
+
+def booking_data(rows):
+    return BOOKING_ROWS.to_representation(rows)
+
+
+def search_data(rows, request):
+    """``FieldSearchSerializer`` output for ``search.search()`` rows."""
+    site_root = request.build_absolute_uri('/')[:-1]
+    data = []
+    for row in rows:
+        cents = row['price_cents']
+        item = {
+            'id': row['field_id'],
+            'name': row['name'],
+            'address': row['address'],
+            'hourly_rate': f'{cents // 100}.{cents % 100:02d}',
+            'latitude': exact_float(row['latitude']),
+            'longitude': exact_float(row['longitude']),
+            'thumbnail': absolute_url(row['thumbnail'], site_root) if row['thumbnail'] else None,
+        }
+        if 'distance' in row:
+            item['distance_km'] = exact_float(round(row['distance'], 3))
+        data.append(item)
+    return data
+
+
+def _no_default(obj):
+    raise TypeError
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` using orjson for compact UTF-8 output, byte-identical to it.
+
+    Floats must come through ``exact_float`` (``RowSerializer`` does that for
+    float columns). Anything orjson cannot encode the way ``JSONRenderer``
+    would (dates, Decimals, lazy strings, ``ReprFloat``...) makes it fall back
+    to ``JSONRenderer``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=_no_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer: these are valid JSON but not valid JavaScript.
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return content
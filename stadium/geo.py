@@ -0,0 +1,205 @@
+"""Spatial helpers for FootballField lookups.
+
+Every field stores the geohash of its coordinates, so a radius query only has
+to scan the handful of cells around the user instead of the whole table. The
+bounding box of the circle narrows that further on the indexed latitude /
+longitude columns, and the haversine distance itself is computed, filtered
+and sorted on in SQL.
+
+The geohash is computed by ``FootballField.save()`` only. ``bulk_update``,
+``QuerySet.update`` and raw SQL that move a field leave its old cell behind,
+so the field drops out of radius queries around its new position; run
+``rebuild_geohashes`` (``manage.py rebuild_geohash``) after such writes.
+"""
+import math
+
+from django.db.models import Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+GEOHASH_PRECISION = 9
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BASE32_INDEX = {char: i for i, char in enumerate(BASE32)}
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(BASE32[value])
+            bit = 0
+            value = 0
+    return ''.join(chars)
+
+
+def rebuild_geohashes(fields, chunk_size=10000):
+    """Recompute the stored geohash of the ``FootballField`` queryset ``fields``.
+
+    Only rows whose cell changed are written. Returns their ids.
+    """
+    changed = []
+    pending = []
+    rows = fields.order_by('pk').values_list('pk', 'latitude', 'longitude', 'geohash').iterator(chunk_size=chunk_size)
+    for pk, latitude, longitude, geohash in rows:
+        cell = encode(latitude, longitude)
+        if cell != geohash:
+            pending.append(fields.model(pk=pk, geohash=cell))
+        if len(pending) >= chunk_size:
+            fields.model.objects.bulk_update(pending, ['geohash'])
+            changed.extend(field.pk for field in pending)
+            pending = []
+    fields.model.objects.bulk_update(pending, ['geohash'])
+    changed.extend(field.pk for field in pending)
+    return changed
+
+
+def decode_bbox(geohash):
+    """Return ``(lat_min, lat_max, lon_min, lon_max)`` of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def cell_size_degrees(precision):
+    """Return ``(height, width)`` of a cell at ``precision`` in degrees."""
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def precision_for_radius(latitude, radius_km):
+    """Pick the finest precision whose cells are at least ``radius_km`` wide.
+
+    With cells that large the circle around any point fits in the 3x3 block
+    around the point's own cell. Returns 0 when no precision fits (huge radius
+    or near the poles), meaning the caller has to scan everything.
+    """
+    max_lat = min(90.0, abs(latitude) + radius_km / KM_PER_DEGREE)
+    cos_lat = math.cos(math.radians(max_lat))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size_degrees(precision)
+        if height * KM_PER_DEGREE >= radius_km and width * KM_PER_DEGREE * cos_lat >= radius_km:
+            return precision
+    return 0
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Return the geohash cells covering a circle, or ``None`` for "all cells"."""
+    precision = precision_for_radius(latitude, radius_km)
+    if not precision:
+        return None
+    center = encode(latitude, longitude, precision)
+    lat_min, lat_max, lon_min, lon_max = decode_bbox(center)
+    height, width = lat_max - lat_min, lon_max - lon_min
+    center_lat, center_lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+
+    cells = set()
+    for d_lat in (-1, 0, 1):
+        lat = center_lat + d_lat * height
+        if not -90.0 < lat < 90.0:
+            continue
+        for d_lon in (-1, 0, 1):
+            lon = (center_lon + d_lon * width + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def cells_q(cells, field_name='geohash'):
+    """Build a Q matching rows whose geohash lies in any of ``cells``.
+
+    Uses range predicates rather than ``startswith`` so SQLite can use the
+    index on the column ('~' sorts after every base32 character).
+    """
+    query = Q()
+    for cell in cells:
+        query |= Q(**{f'{field_name}__gte': cell, f'{field_name}__lt': cell + '~'})
+    return query
+
+
+def bbox_q(latitude, longitude, radius_km, lat_field='latitude', lon_field='longitude'):
+    """Q matching the bounding box of the circle, split at the antimeridian.
+
+    Longitude is left unconstrained when the circle contains a pole. Radii
+    beyond half the circumference cover the whole sphere.
+    """
+    angle = min(radius_km / EARTH_RADIUS_KM, math.pi)
+    d_lat = math.degrees(angle)
+    query = Q(**{f'{lat_field}__gte': latitude - d_lat, f'{lat_field}__lte': latitude + d_lat})
+    ratio = math.sin(angle) / math.cos(math.radians(latitude)) if abs(latitude) < 90 else 1
+    if latitude + d_lat >= 90 or latitude - d_lat <= -90 or ratio >= 1:
+        return query
+    d_lon = math.degrees(math.asin(ratio))
+    lon_min, lon_max = longitude - d_lon, longitude + d_lon
+    if lon_min < -180:
+        lon_q = Q(**{f'{lon_field}__gte': lon_min + 360}) | Q(**{f'{lon_field}__lte': lon_max})
+    elif lon_max > 180:
+        lon_q = Q(**{f'{lon_field}__gte': lon_min}) | Q(**{f'{lon_field}__lte': lon_max - 360})
+    else:
+        lon_q = Q(**{f'{lon_field}__gte': lon_min, f'{lon_field}__lte': lon_max})
+    return query & lon_q
+
+
+def distance_km(latitude, longitude, lat_field='latitude', lon_field='longitude'):
+    """Haversine distance from the point to each row, as a query expression."""
+    phi = math.radians(latitude)
+    half_d_phi = (Radians(lat_field) - phi) / 2
+    half_d_lambda = (Radians(lon_field) - math.radians(longitude)) / 2
+    a = Power(Sin(half_d_phi), 2) + math.cos(phi) * Cos(Radians(lat_field)) * Power(Sin(half_d_lambda), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+def nearest(queryset, latitude, longitude, radius_km, k=None):
+    """Objects within ``radius_km``, nearest first, as a lazy queryset.
+
+    Rows are annotated with ``distance`` in kilometres. The covering geohash
+    cells and the bounding box prefilter on indexes; the distance filter,
+    ``ORDER BY distance`` and the ``LIMIT`` of ``k`` or of the page run in the
+    database.
+    """
+    queryset = queryset.filter(bbox_q(latitude, longitude, radius_km))
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells is not None:
+        queryset = queryset.filter(cells_q(cells))
+    queryset = (
+        queryset.annotate(distance=distance_km(latitude, longitude))
+        .filter(distance__lte=radius_km)
+        .order_by('distance', 'pk')
+    )
+    return queryset[:k] if k else queryset
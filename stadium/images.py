@@ -0,0 +1,144 @@
+"""Field image uploads and their resized WebP variants.
+
+``save_uploads`` moves the uploaded files into storage (Django already
+spools big uploads to a temporary file, which the file system storage just
+renames into place), inserts all ``Image`` rows with one ``bulk_create`` and,
+once the transaction commits, queues ``generate_variants`` for them. The
+request does not wait for Pillow: variants are built by a small thread pool
+(Pillow releases the GIL while decoding, resizing and encoding) and written
+to ``Image.variants`` as ``{name: storage path}``. Until then the serializers
+fall back to the original file.
+
+``STADIUM_IMAGE_WORKERS`` sets the pool size; ``0`` builds the variants
+inline, which the tests use. ``manage.py generate_image_variants`` fills in
+images uploaded before this existed.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connection, transaction
+from django.utils.encoding import filepath_to_uri
+from PIL import Image as PILImage, ImageOps, UnidentifiedImageError
+
+from . import cache, search
+from .models import Image
+
+logger = logging.getLogger(__name__)
+
+# name -> bounding box; images are only ever scaled down.
+VARIANTS = {
+    'thumb': (320, 320),
+    'medium': (1280, 1280),
+}
+VARIANT_DIR = 'media/images/variants'
+WEBP_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'STADIUM_IMAGE_WORKERS', 2), thread_name_prefix='stadium-images',
+            )
+        return _executor
+
+
+def save_uploads(field, files):
+    """Store ``files`` for ``field`` and schedule their variants."""
+    upload_to = Image._meta.get_field('path').upload_to
+    images = Image.objects.bulk_create([
+        Image(
+            football_field=field, name=upload.name,
+            path=default_storage.save(os.path.join(upload_to, os.path.basename(upload.name)), upload),
+        )
+        for upload in files
+    ])
+    if images:
+        # bulk_create sends no post_save
+        cache.bump_field(field.pk)
+        search.refresh_thumbnails([field.pk])
+        ids = [image.pk for image in images]
+        transaction.on_commit(lambda: schedule_variants(ids))
+    return images
+
+
+def schedule_variants(ids):
+    if getattr(settings, 'STADIUM_IMAGE_WORKERS', 2) <= 0:
+        generate_variants(ids)
+    else:
+        get_executor().submit(_generate_in_worker, ids)
+
+
+def _generate_in_worker(ids):
+    try:
+        generate_variants(ids)
+    except Exception:
+        logger.exception('Building image variants failed for %s', ids)
+    finally:
+        connection.close()
+
+
+def generate_variants(ids):
+    """Build every variant of the ``Image`` rows ``ids`` and record them."""
+    field_ids = set()
+    for image in Image.objects.filter(pk__in=ids).exclude(path=''):
+        try:
+            variants = render_variants(image)
+        except (OSError, UnidentifiedImageError) as exc:
+            logger.warning('Cannot build variants of image %s (%s): %s', image.pk, image.path.name, exc)
+            continue
+        Image.objects.filter(pk=image.pk).update(variants=variants)
+        field_ids.add(image.football_field_id)
+    for field_id in field_ids:
+        cache.bump_field(field_id)
+    search.refresh_thumbnails(field_ids)
+
+
+def render_variants(image):
+    with default_storage.open(image.path.name, 'rb') as source:
+        original = PILImage.open(source)
+        # JPEG can decode straight at a fraction of the size, much cheaper
+        # than decoding everything and throwing most of it away.
+        original.draft('RGB', max(VARIANTS.values()))
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+        stem = os.path.splitext(os.path.basename(image.path.name))[0]
+        variants = {}
+        # Largest first, so each smaller variant is resized from the previous one.
+        for name, size in sorted(VARIANTS.items(), key=lambda item: item[1], reverse=True):
+            original.thumbnail(size, PILImage.LANCZOS)
+            out = BytesIO()
+            original.save(out, 'WEBP', quality=WEBP_QUALITY, method=4)
+            variants[name] = default_storage.save(f'{VARIANT_DIR}/{image.pk}_{stem}_{name}.webp', ContentFile(out.getvalue()))
+    return variants
+
+
+def storage_url(name):
+    """``default_storage.url(name)``, minus the ``urljoin`` for file system storage.
+
+    Joining a relative path without dot segments onto ``base_url`` (which
+    always ends with a slash) is plain concatenation, and ``urljoin`` is most
+    of the cost of listing thousands of images.
+    """
+    if isinstance(default_storage, FileSystemStorage):
+        url = filepath_to_uri(name).lstrip('/')
+        if '/.' not in '/' + url:
+            return default_storage.base_url + url
+    return default_storage.url(name)
+
+
+def variant_urls(variants):
+    """``{name: url}`` of an ``Image.variants`` value."""
+    return {name: storage_url(path) for name, path in (variants or {}).items()}
@@ -0,0 +1,62 @@
+"""Deterministic row generators for ``generate_fake_data``.
+
+Nothing here touches Django, so the booking generator can run in worker
+processes and hand plain tuples back to the parent, which does the inserts.
+Every field draws from its own ``random.Random`` seeded with the run seed and
+the field's position, so the output does not depend on the worker count or
+on how the work was chunked.
+"""
+import math
+import random
+
+FIRST_HOUR = 6
+SLOTS_PER_DAY = 16  # one-hour slots from 06:00 to 22:00
+
+
+def field_rng(seed, position):
+    return random.Random(seed * 1_000_003 + position)
+
+
+def cluster_centers(rng, count):
+    """City centres with Zipf-like weights: a few big cities, many small towns."""
+    centers = [(rng.uniform(-55.0, 65.0), rng.uniform(-180.0, 180.0)) for _ in range(count)]
+    weights = [1 / (rank + 1) for rank in range(count)]
+    return centers, weights
+
+
+def field_location(rng, centers, weights, spread_km=15.0):
+    """A point scattered normally (sigma ``spread_km``) around a weighted random centre."""
+    lat, lon = rng.choices(centers, weights)[0]
+    sigma = spread_km / 111.32
+    lat = max(-89.9, min(89.9, rng.gauss(lat, sigma)))
+    lon = rng.gauss(lon, sigma / max(0.05, math.cos(math.radians(lat))))
+    return lat, (lon + 180.0) % 360.0 - 180.0
+
+
+def days_needed(bookings_per_field, min_days):
+    return max(min_days, math.ceil(bookings_per_field / SLOTS_PER_DAY))
+
+
+_user_ids = ()
+
+
+def init_worker(user_ids):
+    global _user_ids
+    _user_ids = user_ids
+
+
+def bookings_for_fields(seed, first_ordinal, days, fields):
+    """Bookings for ``fields``, a list of ``(position, field_id, count)``.
+
+    Each field gets ``count`` distinct one-hour slots, so bookings never
+    overlap. Returns ``(field_id, user_id, date_ordinal, start_hour)`` tuples
+    ordered by field and date.
+    """
+    rows = []
+    for position, field_id, count in fields:
+        rng = field_rng(seed, position)
+        for slot in sorted(rng.sample(range(days * SLOTS_PER_DAY), count)):
+            day, hour = divmod(slot, SLOTS_PER_DAY)
+            user_id = _user_ids[rng.randrange(len(_user_ids))]
+            rows.append((field_id, user_id, first_ordinal + day, FIRST_HOUR + hour))
+    return rows
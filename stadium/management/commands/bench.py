@@ -0,0 +1,347 @@
+import json
+import os
+import platform
+import sqlite3
+import tempfile
+import threading
+import time as clock
+from collections import Counter
+from datetime import date, time, timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import URLPattern
+from rest_framework.authtoken.models import Token
+
+from core import metrics
+from stadium import urls
+from stadium.benchmarks import UNTHROTTLED, find_regressions, latency_summary, peak_rss_mb, run_threads
+from stadium.cache import get_cache
+from stadium.models import Booking, FootballField, User
+
+# scale -> generate_fake_data options
+SCALES = {
+    '1k': {'num_users': 100, 'num_fields': 100, 'num_bookings': 1_000},
+    '100k': {'num_users': 1_000, 'num_fields': 2_000, 'num_bookings': 100_000},
+    '1m': {'num_users': 10_000, 'num_fields': 10_000, 'num_bookings': 1_000_000},
+}
+
+PASSWORD = 'bench-password'
+# Bookings written by the scenarios go far in the future, clear of the seeded ones.
+WRITE_DAY = date(2100, 1, 1)
+DELETE_DAY = date(2200, 1, 1)
+
+
+class Scenarios:
+    """One request per iteration ``i`` for every route in ``stadium.urls``.
+
+    Each method is named after the URL name (dashes as underscores) and
+    returns ``(method, path, data, auth)``, ``auth`` being None, 'user',
+    'admin' or a token key. Write scenarios touch distinct rows per iteration, and
+    ``cleanup`` removes them, so runs can be repeated on the same database.
+    """
+
+    def __init__(self, user, admin, run_id):
+        self.user, self.admin, self.run_id = user, admin, run_id
+        self.field_ids = list(FootballField.objects.order_by('id').values_list('id', flat=True)[:1000])
+        self.booking_ids = list(Booking.objects.order_by('id').values_list('id', flat=True)[:1000])
+        field = FootballField.objects.get(pk=self.field_ids[0])
+        self.lat, self.lon, self.owner_id = field.latitude, field.longitude, field.owner_id
+        self.booking_date = Booking.objects.order_by('id').values_list('booking_date', flat=True).first()
+
+    def setup(self, route, count):
+        # The delete scenarios get their own rows to delete.
+        if route == 'delete-booking':
+            bookings = Booking.objects.bulk_create(
+                Booking(
+                    user=self.user, field_id=self.field(i), booking_date=DELETE_DAY + timedelta(days=i),
+                    start_time=time(10), end_time=time(11),
+                )
+                for i in range(count)
+            )
+            self.deletable = [booking.pk for booking in bookings]
+        elif route == 'logout':
+            # Logging out deletes the token, so every request gets its own user.
+            users = User.objects.bulk_create(
+                User(username=f'bench-{self.run_id}-logout-{i}', role='client') for i in range(count)
+            )
+            tokens = Token.objects.bulk_create(Token(key=Token.generate_key(), user=user) for user in users)
+            self.logout_tokens = [token.key for token in tokens]
+        elif route == 'delete-stadium':
+            fields = FootballField.objects.bulk_create(
+                FootballField(owner=self.user, **self.field_body(i, 'bench')) for i in range(count)
+            )
+            self.deletable = [field.pk for field in fields]
+
+    def cleanup(self):
+        """Remove what the write scenarios added, so the database can be reused."""
+        Booking.objects.filter(booking_date__gte=WRITE_DAY).delete()
+        FootballField.objects.filter(name__startswith='bench ').delete()
+        User.objects.filter(username__startswith=f'bench-{self.run_id}-').delete()
+
+    def field(self, i):
+        return self.field_ids[i % len(self.field_ids)]
+
+    def booking(self, i):
+        return self.booking_ids[i % len(self.booking_ids)]
+
+    def field_body(self, i, name):
+        return {
+            'name': f'{name} {self.run_id} {i}', 'address': 'address', 'contact': 'contact',
+            'hourly_rate': '20.00', 'latitude': self.lat, 'longitude': self.lon,
+        }
+
+    def registration(self, i):
+        return 'post', '/api/auth/register/', {
+            'username': f'bench-{self.run_id}-{i}', 'email': '', 'role': 'client', 'password': PASSWORD,
+        }, None
+
+    def login(self, i):
+        return 'post', '/api/auth/login/', {'username': self.user.username, 'password': PASSWORD}, None
+
+    def logout(self, i):
+        return 'post', '/api/auth/logout/', {}, self.logout_tokens[i]
+
+    def get_stadium(self, i):
+        return 'get', '/api/stadium/list', None, None
+
+    def detail_stadium(self, i):
+        return 'get', f'/api/stadium/detail/{self.field(i)}', None, None
+
+    def update_stadium(self, i):
+        return 'put', f'/api/stadium/update/{self.field(i)}', self.field_body(i, 'updated'), 'user'
+
+    def delete_stadium(self, i):
+        return 'delete', f'/api/stadium/delete/{self.deletable[i]}', None, 'user'
+
+    def create_stadium(self, i):
+        return 'post', '/api/stadium/create/', self.field_body(i, 'bench'), 'user'
+
+    def search_stadium(self, i):
+        return 'get', (
+            f'/api/stadium/search/?q=a&min_price=10&max_price=80&lat={self.lat}&lon={self.lon}&radius_km=25'
+        ), None, None
+
+    def cache_stats(self, i):
+        return 'get', '/api/stadium/cache/stats', None, 'admin'
+
+    def create_booking(self, i):
+        return 'post', '/api/stadium/book/create', {
+            'field': self.field(i), 'booking_date': (WRITE_DAY + timedelta(days=i)).isoformat(),
+            'start_time': '10:00', 'end_time': '11:00',
+        }, 'user'
+
+    def bulk_create_booking(self, i):
+        return 'post', '/api/stadium/book/bulk-create', {'recurrence': {
+            'field': self.field(i), 'booking_date': (WRITE_DAY + timedelta(weeks=4 * i)).isoformat(),
+            'until': (WRITE_DAY + timedelta(weeks=4 * i + 3)).isoformat(), 'start_time': '12:00', 'end_time': '13:00',
+        }}, 'user'
+
+    def update_booking(self, i):
+        return 'patch', f'/api/stadium/book/update/{self.booking(i)}', {}, 'user'
+
+    def detail_booking(self, i):
+        return 'get', f'/api/stadium/book/detail/{self.booking(i)}', None, 'user'
+
+    def list_booking(self, i):
+        return 'get', '/api/stadium/book/list/', None, 'user'
+
+    def export_booking(self, i):
+        return 'get', f'/api/stadium/book/export/?field={self.field(i)}', None, 'admin'
+
+    def delete_booking(self, i):
+        return 'delete', f'/api/stadium/book/delete/{self.deletable[i]}', None, 'admin'
+
+    def filter(self, i):
+        return 'get', (
+            f'/api/stadium/book/filter/?booking_date={self.booking_date}&start_time=10:00&end_time=11:00'
+            f'&lat={self.lat}&lon={self.lon}&radius_km=25'
+        ), None, None
+
+    def calendar(self, i):
+        return 'get', (
+            f'/api/stadium/calendar/?date_from={self.booking_date}&date_to={self.booking_date + timedelta(days=6)}'
+            f'&lat={self.lat}&lon={self.lon}&radius_km=25'
+        ), None, None
+
+    def owner_stats(self, i):
+        return 'get', (
+            f'/api/stadium/owner/stats/?date_from={self.booking_date}&date_to={self.booking_date + timedelta(days=89)}'
+            f'&group=week&owner={self.owner_id}'
+        ), None, 'admin'
+
+    def async_get_stadium(self, i):
+        return 'get', '/api/async/stadium/list', None, None
+
+    def async_detail_stadium(self, i):
+        return 'get', f'/api/async/stadium/detail/{self.field(i)}', None, None
+
+    def async_filter(self, i):
+        return 'get', self.filter(i)[1].replace('/api/stadium/', '/api/async/stadium/'), None, None
+
+    def async_detail_booking(self, i):
+        return 'get', f'/api/async/stadium/book/detail/{self.booking(i)}', None, 'user'
+
+
+def route_names():
+    return [pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every stadium route on a seeded database and compare with a JSON baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='1k')
+        parser.add_argument('--route', action='append', dest='routes', help='Only these URL names (repeatable)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per route')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads')
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'bench_baseline.json'))
+        parser.add_argument('--save', action='store_true', help='Store this run as the baseline for the scale')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed relative regression of p95 latency and throughput (default: 0.25)')
+        parser.add_argument('--keepdb', action='store_true', help='Keep and reuse the seeded benchmark database')
+
+    def handle(self, *args, **options):
+        names = route_names()
+        missing = [name for name in names if not hasattr(Scenarios, name.replace('-', '_'))]
+        if missing:
+            raise CommandError(f"No benchmark scenario for route(s): {', '.join(missing)}")
+        if options['routes']:
+            unknown = set(options['routes']) - set(names)
+            if unknown:
+                raise CommandError(f"Unknown route(s): {', '.join(sorted(unknown))}")
+            names = [name for name in names if name in options['routes']]
+
+        scale = options['scale']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite':
+            # A file per scale, shared by the client threads and reused by --keepdb.
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(), f'stadium_bench_{scale}.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **UNTHROTTLED):
+                results = self.run(scale, names, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+        failed = [
+            f"{name}: {result['errors']} of {result['requests']} requests failed {result['error_statuses']}"
+            for name, result in results.items()
+            if result['errors'] or result['requests'] < options['requests']
+        ]
+        if failed:
+            raise CommandError('Failed requests, not comparing or saving this run:\n  ' + '\n  '.join(failed))
+        self.compare(scale, results, options)
+
+    def seed(self, scale):
+        if FootballField.objects.exists():
+            return
+        self.stdout.write(f'Seeding {scale} dataset...')
+        call_command('generate_fake_data', seed=0, stdout=self.stdout, **SCALES[scale])
+
+    def run(self, scale, names, options):
+        self.seed(scale)
+        user, _ = User.objects.get_or_create(username='bench-user', defaults={'role': 'stadium_owner'})
+        admin, _ = User.objects.get_or_create(username='bench-admin', defaults={'role': 'admin', 'is_staff': True})
+        for account in (user, admin):
+            account.set_password(PASSWORD)
+            account.save()
+        tokens = {'user': Token.objects.get_or_create(user=user)[0].key,
+                  'admin': Token.objects.get_or_create(user=admin)[0].key}
+        scenarios = Scenarios(user, admin, run_id=int(clock.time()))
+        connection.close()
+
+        self.stdout.write(f"{'route':<22} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6} {'errors':>6}")
+        results = {}
+        try:
+            for name in names:
+                scenarios.setup(name, options['requests'])
+                results[name] = result = self.run_route(
+                    name, getattr(scenarios, name.replace('-', '_')), tokens, options,
+                )
+                self.stdout.write(
+                    f"{name:<22} {result['rps']:>8.1f} {result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms "
+                    f"{result['p99_ms']:>7.1f}ms {result['queries_per_request']:>6.1f} {result['errors']:>6}"
+                )
+        finally:
+            scenarios.cleanup()
+        self.stdout.write(f'peak RSS {peak_rss_mb()}MB')
+        return results
+
+    def run_route(self, name, scenario, tokens, options):
+        total, threads = options['requests'], options['concurrency']
+        get_cache().clear()
+        metrics.registry.clear()
+        latencies, statuses = [], []
+        lock = threading.Lock()
+        counter = iter(range(total))
+
+        def worker(_):
+            # View exceptions come back as 500s and count as errors instead of killing the thread.
+            clients = {
+                None: Client(raise_request_exception=False),
+                'user': Client(raise_request_exception=False, headers={'Authorization': f"Token {tokens['user']}"}),
+                'admin': Client(raise_request_exception=False, headers={'Authorization': f"Token {tokens['admin']}"}),
+            }
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                method, path, data, auth = scenario(i)
+                kwargs = {'content_type': 'application/json'} if data is not None else {}
+                client = clients.get(auth)
+                if client is None:
+                    client, kwargs['headers'] = clients[None], {'Authorization': f'Token {auth}'}
+                started = clock.perf_counter()
+                response = getattr(client, method)(path, data, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latency = clock.perf_counter() - started
+                with lock:
+                    latencies.append(latency)
+                    statuses.append(response.status_code)
+
+        elapsed = run_threads(worker, threads)
+        route = metrics.registry.routes.get(name)
+        queries = route.queries.sum / route.queries.count if route and route.queries.count else 0
+        return {
+            **latency_summary(latencies),
+            'rps': round(len(latencies) / elapsed, 1),
+            'queries_per_request': round(queries, 2),
+            'requests': len(statuses),
+            'errors': sum(not 200 <= status < 300 for status in statuses),
+            'error_statuses': dict(Counter(status for status in statuses if not 200 <= status < 300)),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+    def compare(self, scale, results, options):
+        path = Path(options['baseline'])
+        stored = json.loads(path.read_text()) if path.exists() else {}
+        if options['save']:
+            baseline = stored.get(scale, {}).get('routes', {})
+            stored[scale] = {
+                'environment': {
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'sqlite': sqlite3.sqlite_version,
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                },
+                'routes': {**baseline, **results},
+            }
+            path.write_text(json.dumps(stored, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f'Baseline for {scale} written to {path}')
+            return
+        if scale not in stored:
+            self.stdout.write(f'No {scale} baseline in {path}; run with --save to store one.')
+            return
+        regressions = find_regressions(results, stored[scale]['routes'], options['threshold'])
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'No regressions against the {scale} baseline.'))
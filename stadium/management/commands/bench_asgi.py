@@ -0,0 +1,209 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from stadium.benchmarks import UNTHROTTLED, latency_summary
+from stadium.models import Booking, FootballField
+
+# endpoint -> (sync DRF path, async path); {field} and {booking} are filled in.
+ENDPOINTS = {
+    'list': ('/api/stadium/list?page_size=100', '/api/async/stadium/list?page_size=100'),
+    'detail': ('/api/stadium/detail/{field}', '/api/async/stadium/detail/{field}'),
+    'filter': ('/api/stadium/book/filter/?lat={lat}&lon={lon}&radius_km=10',
+               '/api/async/stadium/book/filter/?lat={lat}&lon={lon}&radius_km=10'),
+    'booking': ('/api/stadium/book/detail/{booking}', '/api/async/stadium/book/detail/{booking}'),
+}
+
+
+
+
+class HTTPConnection:
+    """Minimal HTTP/1.1 keep-alive client on asyncio streams, one per simulated user.
+
+    Good enough for benchmarking our own server: no TLS, no redirects, the
+    body is read and dropped.
+    """
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def get(self, path, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f'GET {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length, chunked, close = 0, False, False
+        while (line := await self.reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding':
+                chunked = 'chunked' in value
+            elif name == 'connection':
+                close = value == 'close'
+        if chunked:
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        else:
+            await self.reader.readexactly(length)
+        if close:
+            await self.close()
+        return status
+
+    async def close(self):
+        if self.writer is not None:
+            writer, self.reader, self.writer = self.writer, None, None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+class Command(BaseCommand):
+    help = ('Compare sync (WSGI, thread pool) and async (ASGI) throughput of the read endpoints '
+            'at the same concurrency, in process or against a running server')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=list(ENDPOINTS) + ['all'], default='all')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Requests in flight on both sides: WSGI worker threads and ASGI client tasks')
+        parser.add_argument('--client_delay_ms', type=float, default=0,
+                            help='Time a slow client keeps its connection busy after the response')
+        parser.add_argument('--server', default=None,
+                            help='Base URL of a running server on this database, e.g. http://127.0.0.1:8000 '
+                                 'for "uvicorn core.asgi:application"; requests then go over one TCP '
+                                 'connection per client instead of the in-process test clients')
+
+    def handle(self, *args, **options):
+        field = FootballField.objects.order_by('id').first()
+        booking = Booking.objects.order_by('id').first()
+        if field is None or booking is None:
+            raise CommandError("Needs at least one field and one booking, run generate_fake_data first.")
+        token, _ = Token.objects.get_or_create(user=booking.user)
+        self.headers = {'Authorization': f'Token {token.key}'}
+        values = {'field': field.id, 'booking': booking.id, 'lat': field.latitude, 'lon': field.longitude}
+        connection.close()
+
+        names = list(ENDPOINTS) if options['endpoint'] == 'all' else [options['endpoint']]
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} concurrent clients per side, "
+            f"client delay {options['client_delay_ms']}ms"
+        )
+        if options['server']:
+            # Both paths are served by the same server: under an ASGI server the sync
+            # views run on its thread pool and the async ones on its event loop.
+            for name in names:
+                for label, path in zip(('sync', 'async'), ENDPOINTS[name]):
+                    self.report(f'{name} {label}', *asyncio.run(self.run_http(path.format(**values), options)))
+            return
+        # The test clients always send "Host: testserver".
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **UNTHROTTLED):
+            for name in names:
+                sync_path, async_path = (path.format(**values) for path in ENDPOINTS[name])
+                self.report(f'{name} wsgi', *self.run_wsgi(sync_path, options))
+                self.report(f'{name} asgi', *asyncio.run(self.run_asgi(async_path, options)))
+
+    def report(self, label, elapsed, latencies, errors):
+        summary = latency_summary(latencies)
+        self.stdout.write(
+            f"{label:<14} req/s={len(latencies) / elapsed:8.1f} p50={summary['p50_ms']:8.1f}ms "
+            f"p99={summary['p99_ms']:8.1f}ms errors={errors}"
+        )
+
+    def run_wsgi(self, path, options):
+        delay = options['client_delay_ms'] / 1000
+        client = Client(headers=self.headers)
+        results = []
+        remaining = iter(range(options['requests']))
+        remaining_lock = threading.Lock()
+
+        def next_request():
+            with remaining_lock:
+                return next(remaining, None) is not None
+
+        # Closed loop like the ASGI side: each thread is a client sending its next request when done.
+        def user():
+            try:
+                while next_request():
+                    submitted = time.perf_counter()
+                    response = client.get(path)
+                    if delay:
+                        time.sleep(delay)
+                    results.append((time.perf_counter() - submitted, response.status_code))
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for future in [pool.submit(user) for _ in range(options['concurrency'])]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in results], sum(status != 200 for _, status in results)
+
+    async def run_asgi(self, path, options):
+        delay = options['client_delay_ms'] / 1000
+        client = AsyncClient()
+        results = []
+        remaining = iter(range(options['requests']))
+
+        async def user():
+            for _ in remaining:
+                submitted = time.perf_counter()
+                response = await client.get(path, headers=self.headers)
+                if delay:
+                    await asyncio.sleep(delay)
+                results.append((time.perf_counter() - submitted, response.status_code))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in results], sum(status != 200 for _, status in results)
+
+    async def run_http(self, path, options):
+        url = urlsplit(options['server'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("--server must be an http:// URL.")
+        path = url.path.rstrip('/') + path
+        delay = options['client_delay_ms'] / 1000
+        results, errors = [], 0
+        remaining = iter(range(options['requests']))
+
+        async def user():
+            nonlocal errors
+            connection = HTTPConnection(url.hostname, url.port or 80)
+            try:
+                for _ in remaining:
+                    submitted = time.perf_counter()
+                    try:
+                        status = await connection.get(path, self.headers)
+                    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                        errors += 1
+                        await connection.close()
+                        continue
+                    if delay:
+                        await asyncio.sleep(delay)
+                    results.append((time.perf_counter() - submitted, status))
+            finally:
+                await connection.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in results], errors + sum(status != 200 for _, status in results)
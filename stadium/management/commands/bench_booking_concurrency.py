@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, time as dtime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from stadium.benchmarks import UNTHROTTLED, latency_summary, run_threads
+from stadium.models import Booking, FootballField, User
+
+
+class Command(BaseCommand):
+    help = 'Hammer api/stadium/book/create from many threads and report conflicts, bookings/sec and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=50, help='Requests per thread')
+        parser.add_argument('--fields', type=int, default=8, help='Number of distinct fields to book')
+        parser.add_argument('--slots', type=int, default=16, help='Distinct hourly slots per field and day')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark user, fields and bookings')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user, _ = User.objects.get_or_create(username='bench-booking-client', defaults={'role': 'client'})
+        token, _ = Token.objects.get_or_create(user=user)
+        fields = [
+            FootballField.objects.create(
+                owner=user, name=f'bench field {i}', address='bench', contact='bench',
+                hourly_rate=10, latitude=0, longitude=0,
+            )
+            for i in range(options['fields'])
+        ]
+        # A date nobody books by hand, so existing data does not skew conflicts.
+        booking_date = date.today() + timedelta(days=3650)
+
+        plans = []
+        for _ in range(options['threads']):
+            plan = []
+            for _ in range(options['requests']):
+                hour = rng.randrange(options['slots'])
+                plan.append({
+                    'field': rng.choice(fields).id,
+                    'booking_date': booking_date.isoformat(),
+                    'start_time': dtime(6 + hour % 17, rng.choice((0, 30))).strftime('%H:%M'),
+                    'end_time': dtime(7 + hour % 17, 0).strftime('%H:%M'),
+                })
+            plans.append(plan)
+
+        latencies = []
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def worker(index):
+            client = APIClient(raise_request_exception=False, HTTP_HOST='localhost')
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            local_latencies, local_statuses = [], Counter()
+            for payload in plans[index]:
+                started = time.perf_counter()
+                response = client.post('/api/stadium/book/create', payload)
+                local_latencies.append(time.perf_counter() - started)
+                local_statuses[response.status_code] += 1
+            with lock:
+                latencies.extend(local_latencies)
+                statuses.update(local_statuses)
+
+        try:
+            with override_settings(**UNTHROTTLED):
+                elapsed = run_threads(worker, options['threads'])
+            overlaps = Booking.objects.filter(field__in=fields).filter(
+                field__bookings__booking_date=F('booking_date'),
+                field__bookings__start_time__lt=F('end_time'),
+                field__bookings__end_time__gt=F('start_time'),
+                field__bookings__id__lt=F('id'),
+            ).count()
+        finally:
+            if not options['keep']:
+                FootballField.objects.filter(id__in=[f.id for f in fields]).delete()
+
+        created = statuses[201]
+        summary = latency_summary(latencies)
+        self.stdout.write(f"requests:      {sum(statuses.values())} from {options['threads']} threads")
+        self.stdout.write(f"created:       {created}")
+        self.stdout.write(f"conflicts:     {statuses[400]}")
+        self.stdout.write(f"errors:        {sum(n for code, n in statuses.items() if code not in (201, 400))}")
+        self.stdout.write(f"bookings/sec:  {created / elapsed:.1f}")
+        self.stdout.write(f"requests/sec:  {sum(statuses.values()) / elapsed:.1f}")
+        self.stdout.write(f"latency p50/p99: {summary['p50_ms']} / {summary['p99_ms']} ms")
+        if overlaps:
+            self.stderr.write(self.style.ERROR(f"double bookings detected: {overlaps}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("no double bookings"))
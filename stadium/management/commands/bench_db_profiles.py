@@ -0,0 +1,143 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time as clock
+from collections import Counter
+from datetime import date, timedelta
+from itertools import count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.utils import OperationalError
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from core.db import database_profile
+from stadium.benchmarks import UNTHROTTLED, latency_summary, run_threads
+from stadium.models import Booking, FootballField, User
+
+PROFILES = ('sqlite-plain', 'sqlite')
+WRITE_DAY = date(2300, 1, 1)
+
+
+class Command(BaseCommand):
+    help = ('Mixed read/write load on the booking endpoints against a copy of the database, '
+            'once per SQLite profile (see core/db.py)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_db_profiles compares SQLite profiles, the default database is not SQLite.')
+        source = str(connection.settings_dict['NAME'])
+        if not FootballField.objects.exists() or not Booking.objects.exists():
+            raise CommandError('The database has no fields or bookings, run generate_fake_data first.')
+        connection.close()
+
+        db_settings = connections.settings['default']
+        original = dict(db_settings)
+        self.stdout.write(f"{'profile':<14} {'reads/s':>8} {'read p50':>9} {'p95':>8} {'p99':>8} "
+                          f"{'writes/s':>9} {'write p95':>10} {'locked':>7} {'errors':>7}")
+        try:
+            for name in options['profiles']:
+                fd, copy = tempfile.mkstemp(suffix='.sqlite3', prefix=f'stadium_{name}_')
+                os.close(fd)
+                try:
+                    self.copy_database(source, copy)
+                    profile = database_profile(name, settings.BASE_DIR)
+                    db_settings.clear()
+                    db_settings.update(original, **{**profile, 'NAME': copy})
+                    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **UNTHROTTLED):
+                        result = self.run(options)
+                    connection.close()
+                finally:
+                    for suffix in ('', '-wal', '-shm', '-journal'):
+                        if os.path.exists(copy + suffix):
+                            os.remove(copy + suffix)
+                self.stdout.write(
+                    f"{name:<14} {result['reads_per_s']:>8.1f} {result['read']['p50_ms']:>8.1f}ms "
+                    f"{result['read']['p95_ms']:>7.1f}ms {result['read']['p99_ms']:>7.1f}ms "
+                    f"{result['writes_per_s']:>9.1f} {result['write']['p95_ms']:>8.1f}ms "
+                    f"{result['locked']:>7} {result['errors']:>7}"
+                )
+        finally:
+            db_settings.clear()
+            db_settings.update(original)
+
+    def copy_database(self, source, target):
+        """A consistent snapshot of ``source``, in rollback-journal mode like a fresh file."""
+        with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+            src.backup(dst)
+            dst.execute('PRAGMA journal_mode = DELETE')
+        src.close()
+        dst.close()
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        user = User.objects.order_by('id').first()
+        token = Token.objects.get_or_create(user=user)[0].key
+        field_ids = list(FootballField.objects.values_list('id', flat=True)[:1000])
+        sample = list(Booking.objects.order_by('?').values_list('id', 'booking_date')[:200])
+        connection.close()
+
+        def read(i):
+            kind = i % 3
+            if kind == 0:
+                return '/api/stadium/book/list/'
+            booking_id, booking_date = sample[i % len(sample)]
+            if kind == 1:
+                return f'/api/stadium/book/detail/{booking_id}'
+            return f'/api/stadium/book/filter/?booking_date={booking_date}&start_time=10:00&end_time=11:00'
+
+        slots = count()
+        reads, writes = [], []
+        statuses = Counter()
+        lock = threading.Lock()
+        deadline = clock.perf_counter() + options['duration']
+
+        def worker(index):
+            writer = index < options['writers']
+            client = Client(raise_request_exception=False, headers={'Authorization': f'Token {token}'})
+            latencies, local = [], Counter()
+            i = index
+            while clock.perf_counter() < deadline:
+                started = clock.perf_counter()
+                if writer:
+                    with lock:
+                        slot = next(slots)
+                    day, hour = divmod(slot, 16)
+                    response = client.post('/api/stadium/book/create', {
+                        'field': rng.choice(field_ids),
+                        'booking_date': (WRITE_DAY + timedelta(days=day)).isoformat(),
+                        'start_time': f'{6 + hour:02}:00', 'end_time': f'{7 + hour:02}:00',
+                    })
+                else:
+                    response = client.get(read(i))
+                    i += options['readers']
+                latencies.append(clock.perf_counter() - started)
+                if response.exc_info and isinstance(response.exc_info[1], OperationalError) \
+                        and 'locked' in str(response.exc_info[1]):
+                    local['locked'] += 1
+                elif response.status_code >= 400:
+                    local['errors'] += 1
+            with lock:
+                (writes if writer else reads).extend(latencies)
+                statuses.update(local)
+
+        elapsed = run_threads(worker, options['writers'] + options['readers'])
+        return {
+            'read': latency_summary(reads),
+            'write': latency_summary(writes),
+            'reads_per_s': round(len(reads) / elapsed, 1),
+            'writes_per_s': round(len(writes) / elapsed, 1),
+            'locked': statuses['locked'],
+            'errors': statuses['errors'],
+        }
@@ -0,0 +1,61 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from stadium.benchmarks import UNTHROTTLED
+from stadium.models import Booking, User
+
+
+class Command(BaseCommand):
+    help = 'Compare exporting all bookings through the paginated list view and the streaming export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page_size', type=int, default=1000, help='Page size used for the list view')
+        parser.add_argument('--output', choices=['ndjson', 'csv'], default='ndjson')
+
+    def measure(self, label, run):
+        tracemalloc.start()
+        started = time.perf_counter()
+        rows, size = run()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{label:<12} rows={rows:<9} bytes={size:<11} time={elapsed:.2f}s "
+            f"rows/sec={rows / elapsed if elapsed else 0:.0f} peak_mem={peak / 2**20:.1f}MB"
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_active=True).first()
+        if user is None:
+            raise CommandError("No users found. Please create some users first.")
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(user)
+        total = Booking.objects.count()
+        self.stdout.write(f"Exporting {total} bookings")
+
+        def list_view():
+            rows = size = 0
+            url = f"/api/stadium/book/list/?page_size={options['page_size']}"
+            while url:
+                response = client.get(url)
+                size += len(response.content)
+                rows += len(response.data['results'])
+                url = response.data['next']
+            return rows, size
+
+        def export_view():
+            rows = size = 0
+            response = client.get(f"/api/stadium/book/export/?output={options['output']}")
+            for chunk in response.streaming_content:
+                size += len(chunk)
+                rows += chunk.count(b'\n')
+            response.close()
+            return rows - (options['output'] == 'csv'), size
+
+        with override_settings(**UNTHROTTLED):
+            self.measure('list view', list_view)
+            self.measure('export', export_view)
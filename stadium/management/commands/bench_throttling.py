@@ -0,0 +1,92 @@
+import logging
+import threading
+import time as clock
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from stadium.benchmarks import UNTHROTTLED, latency_summary, run_threads
+from stadium.models import Booking
+from stadium.throttling import get_bucket_store
+
+ABUSER_IP = '203.0.113.66'
+MODES = ('unprotected', 'protected')
+
+
+class Command(BaseCommand):
+    help = ('Latency of well-behaved clients while one IP floods the availability filter, '
+            'without and with rate limiting and load shedding (see stadium/throttling.py)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Well-behaved clients, one IP each')
+        parser.add_argument('--abusers', type=int, default=8, help='Threads of the abusive client')
+        parser.add_argument('--think_ms', type=float, default=500, help='Pause of a good client between requests')
+        parser.add_argument('--abuser_rtt_ms', type=float, default=10,
+                            help='Network round trip of the abusive client; without it the in-process client '
+                                 'spins on cheap rejections and competes for the GIL like no remote client could')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+
+    def handle(self, *args, **options):
+        dates = list(Booking.objects.values_list('booking_date', flat=True).distinct()[:50])
+        if not dates:
+            raise CommandError('The database has no bookings, run generate_fake_data first.')
+        connection.close()
+
+        self.stdout.write(f"{options['clients']} clients ({options['think_ms']:.0f}ms think time), "
+                          f"{options['abusers']} abusive threads, {options['duration']:.0f}s per mode")
+        self.stdout.write(f"{'mode':<12} {'good p50':>9} {'p95':>8} {'p99':>8} {'good ok':>8} "
+                          f"{'abuse req/s':>12} {'served':>7} {'429':>6} {'503':>6}")
+        # Every 429 and 503 would be logged.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        for mode in options['modes']:
+            get_bucket_store().clear()
+            overrides = UNTHROTTLED if mode == 'unprotected' else {}
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **overrides):
+                result = self.run(options, dates)
+            good, abuse = result['good'], result['abuse']
+            self.stdout.write(
+                f"{mode:<12} {good['p50_ms']:>7.1f}ms {good['p95_ms']:>6.1f}ms {good['p99_ms']:>6.1f}ms "
+                f"{result['good_ok']:>7.1%} {result['abuse_per_s']:>12.1f} "
+                f"{abuse[200]:>7} {abuse[429]:>6} {abuse[503]:>6}"
+            )
+
+    def run(self, options, dates):
+        def filter_url(i):
+            return f'/api/stadium/book/filter/?booking_date={dates[i % len(dates)]}&start_time=10:00&end_time=11:00'
+
+        good_latencies, good, abuse = [], Counter(), Counter()
+        lock = threading.Lock()
+        deadline = clock.perf_counter() + options['duration']
+
+        def worker(index):
+            abuser = index < options['abusers']
+            client = Client(raise_request_exception=False, REMOTE_ADDR=ABUSER_IP if abuser else f'198.51.100.{index}')
+            latencies, statuses = [], Counter()
+            i = index
+            while clock.perf_counter() < deadline:
+                # Good clients alternate a catalogue page and a small availability search.
+                url = filter_url(i) if abuser or i % 2 else '/api/stadium/list?page_size=20'
+                if not abuser:
+                    url += '&limit=20' if i % 2 else ''
+                started = clock.perf_counter()
+                response = client.get(url)
+                if not abuser:
+                    latencies.append(clock.perf_counter() - started)
+                statuses[response.status_code] += 1
+                i += 1
+                clock.sleep((options['abuser_rtt_ms'] if abuser else options['think_ms']) / 1000)
+            with lock:
+                good_latencies.extend(latencies)
+                (abuse if abuser else good).update(statuses)
+
+        elapsed = run_threads(worker, options['abusers'] + options['clients'])
+        return {
+            'good': latency_summary(good_latencies),
+            'good_ok': good[200] / max(sum(good.values()), 1),
+            'abuse': abuse,
+            'abuse_per_s': round(sum(abuse.values()) / elapsed, 1),
+        }
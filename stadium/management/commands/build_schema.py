@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    help = 'Render the OpenAPI schema to STADIUM_SCHEMA_DIR (run at deploy, see core/schema.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the files match the code version')
+
+    def handle(self, *args, **options):
+        version = schema.code_version()
+        if not options['force'] and schema.built_version() == version:
+            self.stdout.write(f"Schema in {schema.schema_dir()} is up to date ({version}).")
+            return
+        for path in schema.build():
+            self.stdout.write(f"Wrote {path}")
+        self.stdout.write(f"Schema built for code version {version}.")
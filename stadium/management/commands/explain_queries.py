@@ -0,0 +1,69 @@
+from datetime import date, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from stadium import availability, fastpath, geo, search
+from stadium.models import Booking, FootballField
+from stadium.pagination import BookingPagination, FootballFieldPagination, UncountedLimitOffsetPagination
+from stadium.views import DEFAULT_RADIUS_KM, MAX_CALENDAR_DAYS, MAX_CALENDAR_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Print the query plan of every hot query so index regressions are visible'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--booking_date', type=date.fromisoformat, default=None)
+        parser.add_argument('--field_id', type=int, default=None)
+
+    def hot_queries(self, options):
+        sample = Booking.objects.order_by('-id').values('id', 'field_id', 'booking_date', 'start_time').first() or {}
+        field_id = options['field_id'] or sample.get('field_id') or 1
+        booking_date = options['booking_date'] or sample.get('booking_date') or date.today()
+        start_time, end_time = time(10, 0), time(11, 30)
+        lat, lon = 41.3, 69.2
+        # The pages after the sample rows, as the list views fetch them from a cursor.
+        booking_cursor = [booking_date, sample.get('start_time') or start_time, sample.get('id') or 0]
+        field_cursor = [FootballField.objects.order_by('-id').values_list('id', flat=True)[50:51].first() or 0]
+        search_page = slice(0, UncountedLimitOffsetPagination.default_limit + 1)
+        overlap = {
+            'booking_date': booking_date,
+            'start_time__lt': end_time,
+            'end_time__gt': start_time,
+        }
+        return [
+            ('booking overlap check for one field',
+             Booking.objects.filter(field_id=field_id, **overlap)),
+            ('busy fields on a date (bitmap overlap and edge slot check)',
+             availability.busy_fields(booking_date, start_time, end_time)),
+            ('availability bitmap refresh',
+             Booking.objects.filter(booking_date=booking_date, field_id__in=[field_id])
+             .values_list('field_id', 'booking_date', 'start_time', 'end_time')),
+            ('nearby fields, nearest first',
+             geo.nearest(FootballField.objects.all(), lat, lon, 10, k=20)),
+            ('field list page (keyset on -id)',
+             FootballFieldPagination().page_queryset(
+                 fastpath.FIELD_ROWS.values(FootballField.objects.all()), field_cursor,
+             )),
+            ('booking list page (keyset on booking_date, start_time, id)',
+             BookingPagination().page_queryset(fastpath.BOOKING_ROWS.values(Booking.objects.all()), booking_cursor)),
+            ('calendar fields of an area',
+             geo.nearest(FootballField.objects.all(), lat, lon, DEFAULT_RADIUS_KM)
+             .values_list('id', flat=True)[:MAX_CALENDAR_FIELDS]),
+            ('calendar bookings of a week',
+             availability.calendar_bookings(
+                 [field_id], booking_date, booking_date + timedelta(days=min(6, MAX_CALENDAR_DAYS - 1)),
+             )),
+            ('field search, text and price',
+             search.search('arena', min_cents=2000, max_cents=5000)[search_page]),
+            ('field search, text, price and distance',
+             search.search('arena', 2000, 5000, lat, lon, DEFAULT_RADIUS_KM)[search_page]),
+        ]
+
+    def handle(self, *args, **options):
+        for title, queryset in self.hot_queries(options):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {title}"))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
+        self.stdout.write(f"({connection.vendor} backend)")
@@ -1,83 +1,194 @@
-# your_app/management/commands/generate_sample_data.py
-
 import random
-from datetime import date, timedelta, time
-from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from django.db import transaction
-from stadium.models import FootballField, Booking, User
+import time as clock
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
 from faker import Faker
 
-User = get_user_model()
-fake = Faker()
+from stadium import availability, geo, loadgen, rollups, search
+from stadium.models import Booking, FootballField, Image, User
+
 
 class Command(BaseCommand):
-    help = 'Generate sample data for FootballField and Booking'
+    help = 'Generate users, fields, images and non-overlapping bookings for load tests'
 
     def add_arguments(self, parser):
-        parser.add_argument(
-            '--num_fields',
-            type=int,
-            default=100,
-            help='Number of FootballField objects to create (default: 1000)'
-        )
-        parser.add_argument(
-            '--num_bookings',
-            type=int,
-            default=100,
-            help='Number of Booking objects to create (default: 1000)'
-        )
+        parser.add_argument('--num_users', type=int, default=100, help='Users to create (default: 100)')
+        parser.add_argument('--num_fields', type=int, default=100, help='FootballFields to create (default: 100)')
+        parser.add_argument('--num_bookings', type=int, default=100, help='Bookings to create (default: 100)')
+        parser.add_argument('--images_per_field', type=int, default=2)
+        parser.add_argument('--owner_ratio', type=float, default=0.1, help='Share of new users that own fields')
+        parser.add_argument('--clusters', type=int, default=20, help='Number of cities fields are grouped around')
+        parser.add_argument('--days', type=int, default=30,
+                            help='Days to spread bookings over, raised if the fields would not fit them')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch_size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating bookings')
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        num_fields = options['num_fields']
-        num_bookings = options['num_bookings']
-
-        self.stdout.write(f"Generating {num_fields} FootballField records...")
-        fields = []
-        for _ in range(num_fields):
-            user = User.objects.get(id=1)
-            lat = random.uniform(-90, 90)
-            lon = random.uniform(-180, 180)
-            field = FootballField(
-                owner=user,  # You can assign a random user if needed.
-                name=fake.company(),
-                address=fake.address(),
-                contact=fake.phone_number(),
-                hourly_rate=round(random.uniform(10, 100), 2),
-                latitude=lat,
-                longitude=lon
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker()
+        self.fake.seed_instance(options['seed'])
+
+        owner_ids, client_ids = self.create_users(options['num_users'])
+        if not owner_ids and not client_ids:
+            owner_ids = client_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+            if not owner_ids:
+                raise CommandError('No users to own fields or make bookings, use --num_users.')
+        field_ids = self.create_fields(options['num_fields'], owner_ids or client_ids)
+        self.create_bookings(options['num_bookings'], field_ids, client_ids or owner_ids)
+
+        started = clock.perf_counter()
+        availability.rebuild(chunk_size=self.batch_size)
+        self.stdout.write(f'Rebuilt availability bitmaps in {clock.perf_counter() - started:.1f}s')
+        started = clock.perf_counter()
+        rollups.rebuild(chunk_size=self.batch_size)
+        self.stdout.write(f'Rebuilt daily stats in {clock.perf_counter() - started:.1f}s')
+        started = clock.perf_counter()
+        search.rebuild(chunk_size=self.batch_size)
+        self.stdout.write(f'Rebuilt search rows in {clock.perf_counter() - started:.1f}s')
+
+    def report(self, label, rows, started):
+        elapsed = clock.perf_counter() - started
+        self.stdout.write(f'{label}: {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s)')
+
+    def insert(self, model, objects):
+        """Stream ``objects`` into ``bulk_create`` one batch at a time."""
+        created = []
+        objects = iter(objects)
+        while batch := list(islice(objects, self.batch_size)):
+            created.extend(obj.pk for obj in model.objects.bulk_create(batch))
+        return created
+
+    def insert_rows(self, model, names, params):
+        """``executemany`` of already adapted values, in one transaction.
+
+        Used for bookings: at millions of rows, compiling every value through
+        ``bulk_create`` costs ~20x more than the insert itself.
+        """
+        qn = connection.ops.quote_name
+        columns = ', '.join(qn(model._meta.get_field(name).column) for name in names)
+        sql = f"INSERT INTO {qn(model._meta.db_table)} ({columns}) VALUES ({', '.join(['%s'] * len(names))})"
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def create_users(self, count):
+        started = clock.perf_counter()
+        offset = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        password = make_password('password')  # hashing is slow, do it once
+        owners = round(count * self.options['owner_ratio'])
+        users = (
+            User(
+                username=f'user{offset + i}',
+                email=f'user{offset + i}@example.com',
+                password=password,
+                role='stadium_owner' if i < owners else 'client',
             )
-            fields.append(field)
-        FootballField.objects.bulk_create(fields)
-        self.stdout.write("FootballField records created.")
+            for i in range(count)
+        )
+        ids = self.insert(User, users)
+        self.report('Users', count, started)
+        return ids[:owners], ids[owners:]
 
-        # Retrieve the created fields for use in bookings.
-        fields = list(FootballField.objects.all())
+    def create_fields(self, count, owner_ids):
+        started = clock.perf_counter()
+        centers, weights = loadgen.cluster_centers(self.rng, max(1, self.options['clusters']))
 
-        # Ensure there are users available for booking (you might need to create one manually or use a fixture)
-        users = list(User.objects.all())
-        if not users:
-            self.stdout.write("No users found. Please create some users first.")
+        def fields():
+            for _ in range(count):
+                lat, lon = loadgen.field_location(self.rng, centers, weights)
+                yield FootballField(
+                    owner_id=self.rng.choice(owner_ids),
+                    name=self.fake.company(),
+                    address=self.fake.address(),
+                    contact=self.fake.phone_number(),
+                    hourly_rate=round(self.rng.uniform(10, 100), 2),
+                    latitude=lat,
+                    longitude=lon,
+                    geohash=geo.encode(lat, lon),
+                )
+
+        field_ids = self.insert(FootballField, fields())
+        self.report('Fields', count, started)
+
+        started = clock.perf_counter()
+        per_field = self.options['images_per_field']
+        images = (
+            Image(football_field_id=field_id, name=f'{field_id}_{n}.jpg', path=f'images/{field_id}_{n}.jpg')
+            for field_id in field_ids
+            for n in range(per_field)
+        )
+        self.insert(Image, images)
+        self.report('Images', len(field_ids) * per_field, started)
+        return field_ids
+
+    def create_bookings(self, count, field_ids, user_ids):
+        if not count:
             return
+        if not field_ids:
+            raise CommandError('Bookings need fields, use --num_fields.')
+        started = clock.perf_counter()
+        base, extra = divmod(count, len(field_ids))
+        days = loadgen.days_needed(base + bool(extra), self.options['days'])
+        first_day = date.today()
+        seed = self.options['seed']
 
-        self.stdout.write(f"Generating {num_bookings} Booking records...")
-        bookings = []
-        for _ in range(num_bookings):
-            print(_)
-            field = random.choice(fields)
-            # Generate a random date within the next 30 days.
-            b_date = date.today() + timedelta(days=random.randint(0, 30))
-            start_hour = random.randint(6, 20)
-            start = time(hour=start_hour, minute=0)
-            end = time(hour=start_hour + 1, minute=0)
-            booking = Booking(
-                user=random.choice(users),
-                field=field,
-                booking_date=b_date,
-                start_time=start,
-                end_time=end,
-            )
-            bookings.append(booking)
-        Booking.objects.bulk_create(bookings)
-        self.stdout.write("Booking records created.")
+        # Each task covers roughly one batch of bookings.
+        per_task = max(1, self.batch_size // max(base, 1))
+        plan = [(position, field_id, base + (position < extra)) for position, field_id in enumerate(field_ids)]
+        tasks = (
+            (seed, first_day.toordinal(), days, plan[i:i + per_task])
+            for i in range(0, len(plan), per_task)
+        )
+
+        ops = connection.ops
+        created_at = ops.adapt_datetimefield_value(timezone.now())
+        times = {hour: ops.adapt_timefield_value(time(hour)) for hour in range(24)}
+        dates = {}
+
+        def to_params(rows):
+            for field_id, user_id, ordinal, hour in rows:
+                booking_date = dates.get(ordinal)
+                if booking_date is None:
+                    booking_date = dates[ordinal] = ops.adapt_datefield_value(date.fromordinal(ordinal))
+                yield field_id, user_id, booking_date, times[hour], times[hour + 1], created_at
+
+        self.stdout.write(
+            f'Generating {count} bookings over {days} days from {first_day} '
+            f'to {first_day + timedelta(days=days - 1)}...'
+        )
+        inserted = 0
+        for rows in self.generate(tasks, user_ids):
+            self.insert_rows(Booking, ['field', 'user', 'booking_date', 'start_time', 'end_time', 'created_at'],
+                             to_params(rows))
+            inserted += len(rows)
+            if inserted % (self.batch_size * 20) < len(rows):
+                self.report('  bookings so far', inserted, started)
+        self.report('Bookings', inserted, started)
+
+    def generate(self, tasks, user_ids):
+        """Yield the rows of each task in order, keeping a bounded number in flight."""
+        workers = self.options['workers']
+        if workers <= 1:
+            loadgen.init_worker(user_ids)
+            for task in tasks:
+                yield loadgen.bookings_for_fields(*task)
+            return
+
+        with ProcessPoolExecutor(workers, initializer=loadgen.init_worker, initargs=(user_ids,)) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(loadgen.bookings_for_fields, *task))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
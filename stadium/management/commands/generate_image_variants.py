@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from stadium import images
+from stadium.models import Image
+
+
+class Command(BaseCommand):
+    help = 'Build the resized WebP variants of images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild the variants of every image')
+        parser.add_argument('--batch_size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        queryset = Image.objects.exclude(path='').exclude(path=None)
+        if not options['all']:
+            queryset = queryset.filter(variants={})
+        ids = list(queryset.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(ids), options['batch_size']):
+            images.generate_variants(ids[start:start + options['batch_size']])
+        built = Image.objects.filter(id__in=ids).exclude(variants={}).count()
+        self.stdout.write(f'Built variants for {built} of {len(ids)} images.')
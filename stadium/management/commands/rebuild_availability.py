@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from stadium import availability
+from stadium.models import FieldAvailability
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-field day slot bitmaps from Booking (needed after bulk imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk_size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        availability.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rebuilt {FieldAvailability.objects.count()} availability bitmaps.")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from stadium import geo, search
+from stadium.models import FootballField
+
+
+class Command(BaseCommand):
+    help = 'Recompute the geohash of every field (needed after bulk_update / QuerySet.update of coordinates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk_size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        changed = geo.rebuild_geohashes(FootballField.objects.all(), chunk_size=chunk_size)
+        # The search rows copy the cell.
+        for start in range(0, len(changed), chunk_size):
+            search.refresh(changed[start:start + chunk_size])
+        self.stdout.write(f"Updated the geohash of {len(changed)} fields.")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from stadium import rollups
+from stadium.models import FieldDailyStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-field daily booking stats from Booking (needed after bulk imports or rate changes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk_size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rollups.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rebuilt {FieldDailyStats.objects.count()} daily stats rows.")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from stadium import search
+from stadium.models import FieldSearch
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the field search rows from FootballField and Image (needed after bulk imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk_size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        search.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rebuilt {FieldSearch.objects.count()} search rows.")
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+# Frozen copy of stadium.geo.encode at precision 9 as of this migration.
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision=9):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(BASE32[value])
+            bit = 0
+            value = 0
+    return ''.join(chars)
+
+
+def fill_geohash(apps, schema_editor):
+    FootballField = apps.get_model('stadium', 'FootballField')
+    fields = list(FootballField.objects.only('id', 'latitude', 'longitude'))
+    for field in fields:
+        field.geohash = encode(field.latitude, field.longitude)
+    FootballField.objects.bulk_update(fields, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stadium', '0003_booking_stadium_boo_booking_4eb40b_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='footballfield',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=9),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copies of stadium.availability as of this migration, so that later
+# changes to the slot size or encoding cannot change what it writes.
+SLOT_SECONDS = 15 * 60
+BITMAP_BYTES = 12
+
+
+def slot_mask(start_time, end_time):
+    start = start_time.hour * 3600 + start_time.minute * 60 + start_time.second
+    end = end_time.hour * 3600 + end_time.minute * 60 + end_time.second
+    if end <= start:
+        return 0
+    first = start // SLOT_SECONDS
+    last = (end - 1) // SLOT_SECONDS
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def to_bytes(bits):
+    return bits.to_bytes(BITMAP_BYTES, 'big')
+
+
+def build_bitmaps(apps, schema_editor):
+    Booking = apps.get_model('stadium', 'Booking')
+    FieldAvailability = apps.get_model('stadium', 'FieldAvailability')
+    bitmaps = {}
+    rows = Booking.objects.values_list('field_id', 'booking_date', 'start_time', 'end_time')
+    for field_id, booking_date, start_time, end_time in rows.iterator():
+        key = (field_id, booking_date)
+        bitmaps[key] = bitmaps.get(key, 0) | slot_mask(start_time, end_time)
+    FieldAvailability.objects.bulk_create(
+        [FieldAvailability(field_id=f, booking_date=d, bitmap=to_bytes(bits)) for (f, d), bits in bitmaps.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stadium', '0004_footballfield_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('bitmap', models.BinaryField(max_length=12)),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='stadium.footballfield')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['booking_date'], name='stadium_fie_booking_359c38_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='fieldavailability',
+            constraint=models.UniqueConstraint(fields=('field', 'booking_date'), name='unique_field_availability_per_day'),
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
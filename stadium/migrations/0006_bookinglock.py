@@ -0,0 +1,27 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stadium', '0005_fieldavailability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_locks', to='stadium.footballfield')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bookinglock',
+            constraint=models.UniqueConstraint(fields=('field', 'booking_date'), name='unique_booking_lock_per_day'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stadium', '0006_bookinglock'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='stadium_boo_booking_4eb40b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='stadium_boo_start_t_aa29fd_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='stadium_boo_end_tim_e0f7b6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='stadium_boo_field_i_8425fa_idx',
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='field',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='stadium.footballfield'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['field', 'booking_date', 'start_time', 'end_time'], name='booking_field_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_date', 'start_time', 'end_time', 'field'], name='booking_date_time_field_idx'),
+        ),
+    ]
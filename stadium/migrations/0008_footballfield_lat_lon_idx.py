@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stadium', '0007_booking_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='footballfield',
+            index=models.Index(fields=['latitude', 'longitude'], name='field_lat_lon_idx'),
+        ),
+    ]
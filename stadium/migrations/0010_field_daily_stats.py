@@ -0,0 +1,29 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stadium', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('booked_minutes', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='stadium.footballfield')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='fielddailystats',
+            constraint=models.UniqueConstraint(fields=('field', 'booking_date'), name='unique_field_stats_per_day'),
+        ),
+    ]
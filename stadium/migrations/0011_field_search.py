@@ -0,0 +1,105 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:11
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copies of stadium.search as of this migration, so that later changes
+# to the FTS setup or the row format cannot change what it creates.
+FTS_TABLE = 'stadium_fieldsearch_fts'
+FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, address, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON stadium_fieldsearch BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, name, address) VALUES (new.field_id, new.name, new.address);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF name, address ON stadium_fieldsearch BEGIN
+        UPDATE {FTS_TABLE} SET name = new.name, address = new.address WHERE rowid = old.field_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON stadium_fieldsearch BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.field_id;
+    END""",
+    f"INSERT INTO {FTS_TABLE} (rowid, name, address) SELECT field_id, name, address FROM stadium_fieldsearch",
+]
+DROP_FTS_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}' for name in ('insert', 'update', 'delete')
+] + [f'DROP TABLE IF EXISTS {FTS_TABLE}']
+
+
+def _execute_on_sqlite(connection, statements):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def price_cents(rate):
+    return int((Decimal(rate) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def thumbnail_url(path, variants):
+    name = (variants or {}).get('thumb') or path
+    return default_storage.url(name) if name else ''
+
+
+def create_fts(apps, schema_editor):
+    _execute_on_sqlite(schema_editor.connection, FTS_SQL)
+
+
+def drop_fts(apps, schema_editor):
+    _execute_on_sqlite(schema_editor.connection, DROP_FTS_SQL)
+
+
+def fill_search(apps, schema_editor):
+    FootballField = apps.get_model('stadium', 'FootballField')
+    FieldSearch = apps.get_model('stadium', 'FieldSearch')
+    Image = apps.get_model('stadium', 'Image')
+    thumbnails = {}
+    for field_id, path, variants in Image.objects.order_by('football_field_id', 'id').values_list(
+        'football_field_id', 'path', 'variants',
+    ).iterator():
+        if field_id not in thumbnails and thumbnail_url(path, variants):
+            thumbnails[field_id] = thumbnail_url(path, variants)
+    fields = FootballField.objects.values_list('id', 'name', 'address', 'hourly_rate', 'latitude', 'longitude', 'geohash')
+    FieldSearch.objects.bulk_create(
+        (
+            FieldSearch(
+                field_id=pk, name=name, address=address, price_cents=price_cents(rate), latitude=latitude,
+                longitude=longitude, geohash=geohash, thumbnail=thumbnails.get(pk, ''),
+            )
+            for pk, name, address, rate, latitude, longitude, geohash in fields.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stadium', '0010_field_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldSearch',
+            fields=[
+                ('field', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='stadium.footballfield')),
+                ('name', models.CharField(max_length=255)),
+                ('address', models.CharField(max_length=255)),
+                ('price_cents', models.PositiveIntegerField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('geohash', models.CharField(max_length=9)),
+                ('thumbnail', models.CharField(blank=True, default='', max_length=500)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['price_cents'], name='fieldsearch_price_idx'), models.Index(fields=['geohash', 'price_cents'], name='fieldsearch_cell_price_idx'), models.Index(fields=['latitude', 'longitude'], name='fieldsearch_lat_lon_idx')],
+            },
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+        migrations.RunPython(fill_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stadium', '0011_field_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_date', 'start_time', 'id'], name='booking_date_start_id_idx'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from rest_framework.authtoken.models import Token
 
+from . import geo
+
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -22,13 +24,30 @@ class FootballField(models.Model):
     hourly_rate = models.DecimalField(max_digits=6, decimal_places=2)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # Maintained by save(); bulk writes of the coordinates need geo.rebuild_geohashes.
+    geohash = models.CharField(max_length=geo.GEOHASH_PRECISION, db_index=True, editable=False, default='')
+
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter of the nearby search, see geo.bbox_q.
+            models.Index(fields=['latitude', 'longitude'], name='field_lat_lon_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.geohash = geo.encode(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
     
 class Image(models.Model):
     name = models.CharField(max_length=255)
-    path = models.ImageField(upload_to='media/images')
+    path = models.ImageField(upload_to='media/images', blank=True, null=True)
+    # variant name -> storage path, filled in by stadium.images once resized.
+    variants = models.JSONField(default=dict, blank=True)
     football_field = models.ForeignKey(FootballField, on_delete=models.CASCADE)
 
     def __str__(self):
@@ -36,7 +55,8 @@ class Image(models.Model):
 
 class Booking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
-    field = models.ForeignKey(FootballField, on_delete=models.CASCADE, related_name='bookings')
+    # Covered by the leading column of booking_field_date_time_idx.
+    field = models.ForeignKey(FootballField, on_delete=models.CASCADE, related_name='bookings', db_index=False)
     booking_date = models.DateField()
     start_time = models.TimeField()
     end_time = models.TimeField()
@@ -44,12 +64,81 @@ class Booking(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['booking_date']),
-            models.Index(fields=['start_time']),
-            models.Index(fields=['end_time']),
-            models.Index(fields=['field']),
+            # Overlap check for one field: field + booking_date + time range.
+            models.Index(fields=['field', 'booking_date', 'start_time', 'end_time'], name='booking_field_date_time_idx'),
+            # Availability scan across fields for one date, answered from the index alone.
+            models.Index(fields=['booking_date', 'start_time', 'end_time', 'field'], name='booking_date_time_field_idx'),
+            # Keyset order of the booking list (BookingPagination.ordering).
+            models.Index(fields=['booking_date', 'start_time', 'id'], name='booking_date_start_id_idx'),
         ]
 
     def __str__(self):
-        return f"{self.field.name}" - {self.booking_date} ({self.start_time}-{self.end_time})
-    
\ No newline at end of file
+        return f"{self.field.name} - {self.booking_date} ({self.start_time}-{self.end_time})"
+    
+
+class FieldAvailability(models.Model):
+    """Slot bitmap of one field on one day, see ``stadium.availability``."""
+    field = models.ForeignKey(FootballField, on_delete=models.CASCADE, related_name='availability')
+    booking_date = models.DateField()
+    bitmap = models.BinaryField(max_length=12)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['field', 'booking_date'], name='unique_field_availability_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['booking_date']),
+        ]
+
+
+class FieldDailyStats(models.Model):
+    """Bookings, booked minutes and revenue of one field on one day, see ``stadium.rollups``."""
+    field = models.ForeignKey(FootballField, on_delete=models.CASCADE, related_name='daily_stats')
+    booking_date = models.DateField()
+    bookings = models.PositiveIntegerField(default=0)
+    booked_minutes = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['field', 'booking_date'], name='unique_field_stats_per_day'),
+        ]
+
+
+class BookingLock(models.Model):
+    """Lock row for one (field, booking_date).
+
+    Booking writes bump ``version`` before checking for overlaps, which takes
+    a row lock on backends with row locking (and the write lock on SQLite), so
+    concurrent writers only queue up behind writers of the same field and day.
+    """
+    field = models.ForeignKey(FootballField, on_delete=models.CASCADE, related_name='booking_locks')
+    booking_date = models.DateField()
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['field', 'booking_date'], name='unique_booking_lock_per_day'),
+        ]
+
+
+class FieldSearch(models.Model):
+    """Denormalized search row of one field, see ``stadium.search``."""
+    field = models.OneToOneField(FootballField, on_delete=models.CASCADE, primary_key=True, related_name='search')
+    name = models.CharField(max_length=255)
+    address = models.CharField(max_length=255)
+    # hourly_rate in cents, an integer index instead of a decimal one.
+    price_cents = models.PositiveIntegerField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    geohash = models.CharField(max_length=geo.GEOHASH_PRECISION)
+    # URL of the first image's thumbnail (or the image itself), '' without images.
+    thumbnail = models.CharField(max_length=500, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['price_cents'], name='fieldsearch_price_idx'),
+            # Geo cells first, the price range is then checked in the index.
+            models.Index(fields=['geohash', 'price_cents'], name='fieldsearch_cell_price_idx'),
+            models.Index(fields=['latitude', 'longitude'], name='fieldsearch_lat_lon_idx'),
+        ]
@@ -0,0 +1,256 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on the full ordering key.
+
+    The cursor holds the ordering values of the first/last row of the current
+    page, and the next page is fetched with a ``WHERE key > cursor`` predicate.
+    Page N costs the same as page 1, and no ``COUNT(*)`` is run. The last entry
+    of ``ordering`` must be unique (usually ``id``) to break ties.
+    """
+    ordering = ('-id',)
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request)
+        return self._build_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, fetching with the async ORM."""
+        queryset = self._page_queryset(queryset, request)
+        return self._build_page([obj async for obj in queryset])
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+
+        values, reverse = self.decode_cursor(request)
+        self.cursor_values, self.reverse = values, reverse
+        return self.page_queryset(queryset, values, reverse)
+
+    def page_queryset(self, queryset, values=None, reverse=False):
+        """The page after (``reverse``: before) the row whose ordering key is ``values``, plus one row."""
+        ordering = [self._flip(name) for name in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.seek(ordering, values))
+        return queryset[:self.page_size + 1]
+
+    def _build_page(self, results):
+        values, reverse = self.cursor_values, self.reverse
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = has_more if reverse else values is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def seek(self, ordering, values):
+        """``(f1, f2, ...) > (v1, v2, ...)`` in terms of the given directions.
+
+        The leading ``f1 >= v1`` bound is redundant but lets the database use
+        an index range scan instead of evaluating the OR for every row.
+        """
+        names = [name.lstrip('-') for name in ordering]
+        lookups = ['lt' if name.startswith('-') else 'gt' for name in ordering]
+        query = Q()
+        for i, (name, lookup) in enumerate(zip(names, lookups)):
+            equal = {names[j]: values[j] for j in range(i)}
+            query |= Q(**equal, **{f'{name}__{lookup}': values[i]})
+        return Q(**{f'{names[0]}__{lookups[0]}e': values[0]}) & query
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def _row_values(self, item):
+        if isinstance(item, dict):
+            return [item[field.attname] for field in self.fields]
+        return [getattr(item, field.attname) for field in self.fields]
+
+    def encode_cursor(self, item, reverse):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in self._row_values(item)]
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':')).encode()
+        cursor = base64.urlsafe_b64encode(payload).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            if not isinstance(payload, dict) or not isinstance(payload.get('v'), list):
+                raise ValueError('Malformed cursor')
+            values = [field.to_python(value) for field, value in zip(self.fields, payload['v'], strict=True)]
+            if None in values:
+                raise ValueError('Cursor without a value')
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque cursor from the next/previous link.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Rows per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class FootballFieldPagination(KeysetPagination):
+    ordering = ('-id',)
+
+
+class BookingPagination(KeysetPagination):
+    ordering = ('booking_date', 'start_time', 'id')
+
+
+class FieldFilterPagination(LimitOffsetPagination):
+    """``limit``/``offset`` pages of the available-fields filter, at most ``max_limit`` fields each."""
+    default_limit = 100
+    max_limit = 100
+
+
+class UncountedLimitOffsetPagination(LimitOffsetPagination):
+    """``limit``/``offset`` pages without the ``COUNT(*)``.
+
+    One extra row is fetched to tell whether there is a next page, so a page
+    costs one query and the response has no ``count``.
+    """
+    default_limit = 20
+    max_limit = 100
+    template = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(), self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        del schema['properties']['count']
+        schema['required'] = ['results']
+        return schema
+
+
+class EstimatedCountPaginator(Paginator):
+    """Django (admin) paginator that never runs a full ``COUNT(*)``.
+
+    Counts are exact up to ``count_limit`` rows, counted with a ``LIMIT``
+    subquery. Past that, an unfiltered table reports the planner's estimate
+    (``pg_class.reltuples`` on PostgreSQL, the largest id elsewhere, read
+    from the primary key index) and a filtered one reports the capped count,
+    so the page links stop there.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        count = queryset.order_by()[:self.count_limit + 1].count()
+        if count <= self.count_limit or queryset.query.where:
+            return count
+        return max(count, self.estimate(queryset) or 0)
+
+    def estimate(self, queryset):
+        model = queryset.model
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > 0:  # -1 until the table is analyzed
+                return int(row[0])
+        return model._default_manager.using(queryset.db).aggregate(last=Max('pk'))['last']
@@ -5,3 +5,9 @@ class IsFieldOwnerOrAdmin(BasePermission):
     def has_object_permission(self, request, view, obj):
         return request.user.is_staff or obj.field.owner == request.user
     
+
+
+class IsStadiumOwnerOrAdmin(BasePermission):
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_staff or user.role in ('stadium_owner', 'admin')))
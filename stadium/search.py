@@ -0,0 +1,228 @@
+"""Search read model for field discovery.
+
+``FieldSearch`` keeps one narrow row per field with what the search
+endpoint filters and returns: name and address, the rate as integer cents,
+coordinates and geohash cell, and the URL of the first image's thumbnail.
+Saving a field refreshes its row, image changes refresh the thumbnail, and
+deleting the field cascades; ``rebuild_search`` recomputes everything after
+bulk imports.
+
+On SQLite the name and address are also indexed in the FTS5 table
+``stadium_fieldsearch_fts`` (rowid = field id), which triggers on
+``stadium_fieldsearch`` keep in step. ``search()`` combines the full-text
+match, the price range on the ``price_cents`` indexes and the geohash /
+bounding box prefilter of ``stadium.geo`` into one query. Other backends
+fall back to ``icontains`` on name and address.
+"""
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+from . import geo, images
+from .models import FieldSearch, FootballField, Image
+
+FTS_TABLE = 'stadium_fieldsearch_fts'
+FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, address, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON stadium_fieldsearch BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, name, address) VALUES (new.field_id, new.name, new.address);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF name, address ON stadium_fieldsearch BEGIN
+        UPDATE {FTS_TABLE} SET name = new.name, address = new.address WHERE rowid = old.field_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON stadium_fieldsearch BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.field_id;
+    END""",
+    f"INSERT INTO {FTS_TABLE} (rowid, name, address) SELECT field_id, name, address FROM stadium_fieldsearch",
+]
+DROP_FTS_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}' for name in ('insert', 'update', 'delete')
+] + [f'DROP TABLE IF EXISTS {FTS_TABLE}']
+
+SOURCE_FIELDS = ('id', 'name', 'address', 'hourly_rate', 'latitude', 'longitude', 'geohash')
+COLUMNS = ['field_id', 'name', 'address', 'price_cents', 'latitude', 'longitude', 'geohash', 'thumbnail']
+RESULT_FIELDS = ('field_id', 'name', 'address', 'price_cents', 'latitude', 'longitude', 'thumbnail')
+ORDERINGS = {
+    'price': ('price_cents', 'pk'),
+    '-price': ('-price_cents', '-pk'),
+    'distance': ('distance', 'pk'),
+}
+TOKEN = re.compile(r'\w+')
+
+
+def _execute_on_sqlite(connection, statements):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def create_fts(connection):
+    """Create the FTS5 table and its triggers, indexing the current rows."""
+    _execute_on_sqlite(connection, FTS_SQL)
+
+
+def drop_fts(connection):
+    _execute_on_sqlite(connection, DROP_FTS_SQL)
+
+
+def price_cents(rate):
+    return int((Decimal(rate) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def thumbnail_url(path, variants):
+    """URL of the image's thumbnail, or of the image until it is built; '' without a file."""
+    name = (variants or {}).get('thumb') or path
+    return images.storage_url(name) if name else ''
+
+
+def _thumbnails(field_ids=None):
+    """``{field_id: thumbnail URL}`` of the first image (by id) that has a file."""
+    rows = Image.objects.order_by('football_field_id', 'id')
+    if field_ids is not None:
+        rows = rows.filter(football_field_id__in=field_ids)
+    thumbnails = {}
+    for field_id, path, variants in rows.values_list('football_field_id', 'path', 'variants').iterator():
+        if field_id not in thumbnails:
+            url = thumbnail_url(path, variants)
+            if url:
+                thumbnails[field_id] = url
+    return thumbnails
+
+
+def _values(fields, thumbnails):
+    """``COLUMNS`` tuples of the ``SOURCE_FIELDS`` rows ``fields``."""
+    return [
+        (pk, name, address, price_cents(rate), latitude, longitude, geohash, thumbnails.get(pk, ''))
+        for pk, name, address, rate, latitude, longitude, geohash in fields
+    ]
+
+
+def _upsert(values):
+    FieldSearch.objects.bulk_create(
+        [FieldSearch(**dict(zip(COLUMNS, row))) for row in values],
+        update_conflicts=True, unique_fields=['field'], update_fields=COLUMNS[1:], batch_size=1000,
+    )
+
+
+def _insert(values):
+    """``executemany`` of new rows; ``bulk_create`` would cost several times the insert."""
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(FieldSearch._meta.get_field(name).column) for name in COLUMNS)
+    sql = f"INSERT INTO {qn(FieldSearch._meta.db_table)} ({columns}) VALUES ({', '.join(['%s'] * len(COLUMNS))})"
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, values)
+
+
+def lock(field_ids):
+    """Take the write lock before a transaction touches the FTS table.
+
+    On SQLite a transaction that has read cannot upgrade to the write lock
+    while another connection writes: it fails at once with "database is
+    locked", whatever the busy timeout. FTS5 reads its own tables when a
+    statement writing it (through the triggers) is prepared, so such a
+    statement must not be the first write of a transaction. This is a
+    plain ``UPDATE`` of ``field_ids`` that fires no trigger, which waits for
+    the lock like any write.
+    """
+    FieldSearch.objects.filter(field_id__in=field_ids).update(price_cents=F('price_cents'))
+
+
+def refresh(field_ids):
+    """Recompute the search rows of ``field_ids``.
+
+    Everything is read before the transaction, which starts with ``lock``.
+    """
+    field_ids = set(field_ids)
+    if not field_ids:
+        return
+    fields = list(FootballField.objects.filter(pk__in=field_ids).values_list(*SOURCE_FIELDS))
+    values = _values(fields, _thumbnails(field_ids))
+    gone = field_ids - {row[0] for row in fields}
+    with transaction.atomic():
+        lock(field_ids)
+        if gone:
+            FieldSearch.objects.filter(field_id__in=gone).delete()
+        _upsert(values)
+
+
+def refresh_thumbnails(field_ids):
+    """Update only the thumbnails, e.g. after image changes.
+
+    Never inserts rows, so it is safe while a field and its images are
+    being deleted.
+    """
+    field_ids = set(field_ids)
+    thumbnails = _thumbnails(field_ids)
+    for field_id in field_ids:
+        FieldSearch.objects.filter(field_id=field_id).update(thumbnail=thumbnails.get(field_id, ''))
+
+
+def _insert_fields(fields):
+    _insert(_values(fields, _thumbnails([field[0] for field in fields])))
+
+
+def rebuild(chunk_size=10000):
+    """Rebuild every row from ``FootballField`` and ``Image``.
+
+    The FTS table is dropped meanwhile and indexed in one go at the end,
+    which is several times cheaper than the triggers row by row.
+    """
+    with transaction.atomic():
+        drop_fts(connection)
+        FieldSearch.objects.all().delete()
+        fields = FootballField.objects.order_by('id').values_list(*SOURCE_FIELDS).iterator(chunk_size=chunk_size)
+        chunk = []
+        for row in fields:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                _insert_fields(chunk)
+                chunk = []
+        _insert_fields(chunk)
+        create_fts(connection)
+
+
+def match_expression(text):
+    """FTS5 query matching rows containing every word of ``text`` as a prefix, or None."""
+    terms = TOKEN.findall(text.casefold())
+    return ' '.join(f'"{term}"*' for term in terms) or None
+
+
+def text_q(text):
+    terms = TOKEN.findall(text.casefold())
+    if not terms:
+        return Q()
+    if connection.vendor == 'sqlite':
+        return Q(field_id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match_expression(text)],
+        ))
+    query = Q()
+    for term in terms:
+        query &= Q(name__icontains=term) | Q(address__icontains=term)
+    return query
+
+
+def search(text=None, min_cents=None, max_cents=None, lat=None, lon=None, radius_km=None, ordering=None):
+    """``FieldSearch`` values rows matching every given filter, as a lazy queryset.
+
+    With ``lat``/``lon`` the rows are limited to ``radius_km`` and carry
+    ``distance`` in kilometres. ``ordering`` is a key of ``ORDERINGS``;
+    it defaults to nearest first with coordinates, else cheapest first.
+    """
+    rows = FieldSearch.objects.all()
+    if text:
+        rows = rows.filter(text_q(text))
+    if min_cents is not None:
+        rows = rows.filter(price_cents__gte=min_cents)
+    if max_cents is not None:
+        rows = rows.filter(price_cents__lte=max_cents)
+    fields = RESULT_FIELDS
+    if lat is not None:
+        rows = geo.nearest(rows, lat, lon, radius_km)
+        fields += ('distance',)
+    return rows.order_by(*ORDERINGS[ordering or ('distance' if lat is not None else 'price')]).values(*fields)
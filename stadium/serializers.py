@@ -1,4 +1,10 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
 from rest_framework import serializers
+
+from .images import save_uploads, variant_urls
 from .models import User, FootballField, Booking, Image
 
 
@@ -16,18 +22,44 @@ class UserSerializer(serializers.ModelSerializer):
 class ImageSerializer(serializers.ModelSerializer):
     
     path = serializers.SerializerMethodField()  
+    thumbnail = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
 
 
     class Meta:
         model = Image
-        fields = ['name', 'path']
+        fields = ['name', 'path', 'thumbnail', 'variants']
     
     def get_path(self, obj):
         """Return full image URL."""
-        request = self.context.get('request')
-        if obj.path:
-            return request.build_absolute_uri(obj.path.url) if request else obj.path.url
-        return None
+        if not obj.path:
+            return None
+        return self._absolute(obj.path.url)
+
+    def get_thumbnail(self, obj):
+        """The small variant, or the original until it has been built."""
+        thumb = obj.variants.get('thumb')
+        if thumb:
+            return self._absolute(default_storage.url(thumb))
+        return self.get_path(obj)
+
+    def get_variants(self, obj):
+        return {name: self._absolute(url) for name, url in variant_urls(obj.variants).items()}
+
+    def _absolute(self, url):
+        if url.startswith('/') and not url.startswith('//'):
+            return self._site_root() + url
+        return url
+
+    def _site_root(self):
+        """``scheme://host`` of the request, resolved once per serialization."""
+        root = self.context.get('_site_root')
+        if root is None:
+            request = self.context.get('request')
+            root = request.build_absolute_uri('/')[:-1] if request else ''
+            if request:
+                self.context['_site_root'] = root
+        return root
 
 class FootballFieldSerializer(serializers.ModelSerializer):
    
@@ -49,26 +81,25 @@ class FootballFieldSerializer(serializers.ModelSerializer):
         read_only_fields = ['owner']
 
     def create(self, validated_data):
-
         request = self.context.get('request')
-       
-        images_data = request.FILES.getlist('images')
-      
-        print(images_data, 'this is datasa')
-       
-        football_field = FootballField.objects.create(**validated_data)
-        print()
-        for image in images_data:
-            # Check if the image data is a dict (normal case)
-            if isinstance(image, dict):
-                Image.objects.create(football_field=football_field, **image)
-            else:
-                # Otherwise, it's likely an InMemoryUploadedFile
-                # Use image.name for the name and assign the file to 'path'
-                Image.objects.create(football_field=football_field, name=image.name, path=image)
-            print('image createdddd--')
+        uploads = request.FILES.getlist('images') if request else []
+        with transaction.atomic():
+            football_field = FootballField.objects.create(**validated_data)
+            save_uploads(football_field, uploads)
         return football_field
 
+class FieldSearchSerializer(serializers.Serializer):
+    """A search result, built from ``FieldSearch`` rows by ``fastpath.search_data``."""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    address = serializers.CharField()
+    hourly_rate = serializers.DecimalField(max_digits=6, decimal_places=2)
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    thumbnail = serializers.URLField(allow_null=True)
+    distance_km = serializers.FloatField(required=False, help_text='Only with lat/lon')
+
+
 class BookingSerializer(serializers.ModelSerializer):
     
 
@@ -77,3 +108,96 @@ class BookingSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ['user', 'created_at']
 
+
+MAX_BULK_BOOKINGS = 366
+
+
+class BulkFieldRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolve the field from the batch ``BulkBookingSerializer`` loaded up front,
+    instead of running one query per item."""
+
+    def to_internal_value(self, data):
+        fields = self.context.get('_fields')
+        if fields is None:
+            return super().to_internal_value(data)
+        try:
+            return fields[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+def validate_time_range(attrs):
+    if attrs['start_time'] >= attrs['end_time']:
+        raise serializers.ValidationError({'end_time': 'end_time must be after start_time.'})
+    return attrs
+
+
+class BulkBookingItemSerializer(BookingSerializer):
+    field = BulkFieldRelatedField(queryset=FootballField.objects.all())
+
+    def validate(self, attrs):
+        return validate_time_range(attrs)
+
+
+class RecurrenceSerializer(serializers.Serializer):
+    """Same time slot on ``booking_date`` and then every week up to ``until``."""
+    field = serializers.PrimaryKeyRelatedField(queryset=FootballField.objects.all())
+    booking_date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    frequency = serializers.ChoiceField(choices=['weekly'], default='weekly')
+    until = serializers.DateField()
+
+    def validate(self, attrs):
+        validate_time_range(attrs)
+        if attrs['until'] < attrs['booking_date']:
+            raise serializers.ValidationError({'until': 'until must not be before booking_date.'})
+        if len(self.occurrences(attrs)) > MAX_BULK_BOOKINGS:
+            raise serializers.ValidationError(f'A recurrence may not produce more than {MAX_BULK_BOOKINGS} bookings.')
+        return attrs
+
+    @staticmethod
+    def occurrences(attrs):
+        weeks = (attrs['until'] - attrs['booking_date']).days // 7
+        return [
+            {
+                'field': attrs['field'],
+                'booking_date': attrs['booking_date'] + timedelta(weeks=week),
+                'start_time': attrs['start_time'],
+                'end_time': attrs['end_time'],
+            }
+            for week in range(weeks + 1)
+        ]
+
+
+class BulkBookingSerializer(serializers.Serializer):
+    """Either an explicit ``bookings`` list or a ``recurrence`` rule."""
+    bookings = BulkBookingItemSerializer(many=True, required=False, allow_empty=False, max_length=MAX_BULK_BOOKINGS)
+    recurrence = RecurrenceSerializer(required=False)
+
+    def to_internal_value(self, data):
+        bookings = data.get('bookings') if isinstance(data, dict) else None
+        if isinstance(bookings, list):
+            ids = set()
+            for item in bookings:
+                try:
+                    ids.add(int(item['field']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            self.context['_fields'] = FootballField.objects.in_bulk(ids)
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if ('bookings' in attrs) == ('recurrence' in attrs):
+            raise serializers.ValidationError('Provide exactly one of "bookings" or "recurrence".')
+        return attrs
+
+    @property
+    def items(self):
+        """The bookings to create, as dicts of model field values."""
+        data = self.validated_data
+        if 'recurrence' in data:
+            return RecurrenceSerializer.occurrences(data['recurrence'])
+        return data['bookings']
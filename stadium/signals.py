@@ -0,0 +1,84 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, availability, cache, rollups, search
+from .models import Booking, FootballField, Image, User
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_slot(sender, instance, **kwargs):
+    """Keep the slot a booking is moved away from, so it can be refreshed too."""
+    instance._previous_slot = None
+    if instance.pk:
+        instance._previous_slot = (
+            Booking.objects.filter(pk=instance.pk).values_list('field_id', 'booking_date').first()
+        )
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, **kwargs):
+    keys = {(instance.field_id, instance.booking_date)}
+    previous = getattr(instance, '_previous_slot', None)
+    if previous:
+        keys.add(previous)
+    availability.refresh(keys)
+    rollups.refresh(keys)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    keys = [(instance.field_id, instance.booking_date)]
+    availability.refresh(keys)
+    rollups.refresh(keys)
+
+
+@receiver(post_save, sender=FootballField)
+@receiver(post_delete, sender=FootballField)
+def football_field_changed(sender, instance, **kwargs):
+    cache.bump_field(instance.pk)
+
+
+@receiver(post_save, sender=FootballField)
+def football_field_saved(sender, instance, **kwargs):
+    # Deleting a field cascades to its search row.
+    search.refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=FootballField)
+def football_field_deleting(sender, instance, **kwargs):
+    # Runs inside the deletion's transaction, before the cascade reaches the FTS table.
+    search.lock([instance.pk])
+
+
+@receiver(pre_delete, sender=User)
+def owner_deleting(sender, instance, **kwargs):
+    """Remember the user's fields: the ``SET_NULL`` on their owner is a bare UPDATE without signals."""
+    instance._owned_field_ids = list(FootballField.objects.filter(owner_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=User)
+def owner_deleted(sender, instance, **kwargs):
+    for pk in getattr(instance, '_owned_field_ids', ()):
+        cache.bump_field(pk)
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def image_changed(sender, instance, **kwargs):
+    cache.bump_field(instance.football_field_id)
+    search.refresh_thumbnails([instance.football_field_id])
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    authentication.forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # login() only touches last_login, which is not part of the snapshot.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    authentication.forget_tokens(Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
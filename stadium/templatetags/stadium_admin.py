@@ -0,0 +1,92 @@
+"""Admin date hierarchy that does not scan the table.
+
+Django's ``date_hierarchy`` lists the years, months or days that have rows
+with ``SELECT DISTINCT`` over the whole (filtered) changelist, which reads
+every booking. ``calendar_date_hierarchy`` takes the first and last date
+(one index seek each) and offers every calendar period in between, so a
+period may turn out empty. The links are the same ``__year``/``__month``/
+``__day`` filters, which Django turns into date ranges on the index.
+"""
+import calendar
+import datetime
+
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+from django.db.models import Max, Min
+from django.template import Library
+from django.utils import formats
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = Library()
+
+
+def calendar_date_hierarchy(cl):
+    field_name = cl.date_hierarchy
+    year_field, month_field, day_field = (f'{field_name}__{part}' for part in ('year', 'month', 'day'))
+    year, month, day = (cl.params.get(name) for name in (year_field, month_field, day_field))
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    # Two aggregates: a single MIN or MAX is an index seek, both at once is a scan on SQLite.
+    first = cl.queryset.aggregate(value=Min(field_name))['value']
+    last = cl.queryset.aggregate(value=Max(field_name))['value']
+    if first is None or last is None:
+        return {'show': False}
+    if not (year or month or day) and first.year == last.year:
+        year = first.year
+        if first.month == last.month:
+            month = first.month
+
+    if year and month and day:
+        date = datetime.date(int(year), int(month), int(day))
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year, month_field: month}), 'title': capfirst(formats.date_format(date, 'YEAR_MONTH_FORMAT'))},
+            'choices': [{'title': capfirst(formats.date_format(date, 'MONTH_DAY_FORMAT'))}],
+        }
+    if year and month:
+        year, month = int(year), int(month)
+        days = [
+            datetime.date(year, month, number) for number in range(1, calendar.monthrange(year, month)[1] + 1)
+            if first <= datetime.date(year, month, number) <= last
+        ]
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year}), 'title': str(year)},
+            'choices': [
+                {'link': link({year_field: year, month_field: month, day_field: date.day}),
+                 'title': capfirst(formats.date_format(date, 'MONTH_DAY_FORMAT'))}
+                for date in days
+            ],
+        }
+    if year:
+        year = int(year)
+        months = [
+            datetime.date(year, number, 1) for number in range(1, 13)
+            if (first.year, first.month) <= (year, number) <= (last.year, last.month)
+        ]
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {'link': link({year_field: year, month_field: date.month}),
+                 'title': capfirst(formats.date_format(date, 'YEAR_MONTH_FORMAT'))}
+                for date in months
+            ],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({year_field: str(number)}), 'title': str(number)}
+            for number in range(first.year, last.year + 1)
+        ],
+    }
+
+
+@register.tag(name='calendar_date_hierarchy')
+def calendar_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser, token, func=calendar_date_hierarchy, template_name='date_hierarchy.html', takes_context=False,
+    )
@@ -1,3 +1,1414 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import json
+import shutil
+import tempfile
+import threading
+import time as clock
+from datetime import date, time
+from unittest import mock
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image as PILImage
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import media, metrics, schema
+from core.db import SQLITE_PRAGMAS, database_profile
+
+from . import availability, export, fastpath, geo, images, loadgen, rollups, search, throttling
+from .authentication import get_token_cache
+from .benchmarks import UNTHROTTLED, find_regressions, run_threads
+from .cache import LocalLRUCache, get_cache
+from .fastpath import FastJSONRenderer
+from .models import Booking, FieldAvailability, FieldDailyStats, FieldSearch, FootballField, Image, User
+from .management.commands.explain_queries import Command as ExplainQueriesCommand
+from .pagination import BookingPagination, EstimatedCountPaginator
+from .serializers import BookingSerializer, FootballFieldSerializer
+
+
+def run_concurrently(target, count):
+    """Run ``target(i)`` for ``i`` in ``range(count)`` in threads started together; returns their exceptions."""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def worker(i):
+        try:
+            barrier.wait()
+            target(i)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class QueryCountTests(TestCase):
+    """Every endpoint must run the same number of queries whatever the page size."""
+
+    booking_date = date(2030, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', password='secret', role='stadium_owner')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def create_fields(self, count):
+        for i in range(count):
+            field = FootballField.objects.create(
+                owner=self.user, name=f'field {i}', address='address', contact='contact',
+                hourly_rate='25.00', latitude=41.3 + i / 1000, longitude=69.2,
+            )
+            Image.objects.create(football_field=field, name='a.png', path='media/images/a.png')
+            Image.objects.create(football_field=field, name='b.png', path='media/images/b.png')
+            Booking.objects.create(
+                user=self.user, field=field, booking_date=self.booking_date,
+                start_time=time(10, 5), end_time=time(11, 0),
+            )
+
+    def count_queries(self, url, params=None):
+        get_token_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def assertConstantQueries(self, url, params=None):
+        self.create_fields(2)
+        small = self.count_queries(url, params)
+        self.create_fields(20)
+        large = self.count_queries(url, params)
+        self.assertEqual(small, large, f'{url} runs more queries as the page grows')
+
+    def test_field_list(self):
+        self.assertConstantQueries('/api/stadium/list')
+
+    def test_field_detail(self):
+        self.create_fields(1)
+        field = FootballField.objects.get()
+        self.assertEqual(self.count_queries(f'/api/stadium/detail/{field.pk}'), 3)
+
+    def test_filter_by_time(self):
+        self.assertConstantQueries('/api/stadium/book/filter/', {
+            'booking_date': self.booking_date.isoformat(), 'start_time': '11:00', 'end_time': '12:00',
+        })
+
+    def test_filter_by_distance(self):
+        self.assertConstantQueries('/api/stadium/book/filter/', {'lat': 41.3, 'lon': 69.2, 'radius_km': 10})
+
+    def test_booking_list(self):
+        self.assertConstantQueries('/api/stadium/book/list/')
+
+    def test_booking_detail(self):
+        self.create_fields(1)
+        booking = Booking.objects.get()
+        self.assertEqual(self.count_queries(f'/api/stadium/book/detail/{booking.pk}'), 2)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='secret', role='client')
+        fields = [
+            FootballField.objects.create(
+                owner=cls.user, name=f'field {i}', address='address', contact='contact',
+                hourly_rate='10.00', latitude=0, longitude=0,
+            )
+            for i in range(5)
+        ]
+        for day in (1, 2):
+            for hour in (9, 10):
+                for field in fields:
+                    Booking.objects.create(
+                        user=cls.user, field=field, booking_date=date(2030, 1, day),
+                        start_time=time(hour), end_time=time(hour + 1),
+                    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, link='next'):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            page = [row['id'] for row in response.data['results']]
+            ids.extend(page if link == 'next' else reversed(page))
+            url = response.data[link]
+            pages += 1
+        return ids, pages
+
+    def test_bookings_forward_and_back(self):
+        expected = list(Booking.objects.order_by('booking_date', 'start_time', 'id').values_list('id', flat=True))
+        ids, pages = self.walk('/api/stadium/book/list/?page_size=3')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 7)
+
+        last = self.client.get('/api/stadium/book/list/?page_size=3')
+        while last.data['next']:
+            last = self.client.get(last.data['next'])
+        ids, _ = self.walk(last.data['previous'], link='previous')
+        self.assertEqual(ids, list(reversed(expected[:18])))
+
+    def test_fields_newest_first(self):
+        ids, _ = self.walk('/api/stadium/list?page_size=2')
+        self.assertEqual(ids, list(FootballField.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/stadium/book/list/?page_size=3')
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql']])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/stadium/book/list/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_cursor_payloads(self):
+        for payload in ({'v': [None]}, {'v': [None, None, None]}, [1], 'x', 7, {'v': 5}, {'v': {'a': 1}}, {}):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+            for url in ('/api/stadium/list', '/api/async/stadium/list', '/api/stadium/book/list/'):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404, (url, payload))
+
+    def test_explain_queries_uses_the_list_query(self):
+        booking = Booking.objects.order_by('-id').first()
+        pagination = BookingPagination()
+        pagination.base_url = 'http://testserver/api/stadium/book/list/'
+        pagination.fields = [Booking._meta.get_field(name) for name in pagination.ordering]
+        with CaptureQueriesContext(connection) as view_queries:
+            self.client.get(pagination.encode_cursor(booking, reverse=False))
+
+        queries = dict(ExplainQueriesCommand().hot_queries({'field_id': None, 'booking_date': None}))
+        with CaptureQueriesContext(connection) as explained:
+            list(queries['booking list page (keyset on booking_date, start_time, id)'])
+        self.assertEqual(explained[0]['sql'], view_queries[-1]['sql'])
+
+    def test_booking_list_order_comes_from_an_index(self):
+        queries = dict(ExplainQueriesCommand().hot_queries({'field_id': None, 'booking_date': None}))
+        plan = queries['booking list page (keyset on booking_date, start_time, id)'].explain()
+        self.assertIn('booking_date_start_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class ResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.field = FootballField.objects.create(
+            name='field', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        self.url = f'/api/stadium/detail/{self.field.pk}'
+
+    def test_hit_skips_database(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match(self):
+        etag = self.client.get('/api/stadium/list')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/stadium/list', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_image_change_invalidates(self):
+        before = self.client.get(self.url)
+        Image.objects.create(football_field=self.field, name='a.png', path='media/images/a.png')
+        after = self.client.get(self.url)
+        self.assertNotEqual(before['ETag'], after['ETag'])
+        self.assertEqual(len(after.json()['images']), 1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=before['ETag']).status_code, 200)
+
+    def test_versions_expire_with_the_bodies(self):
+        # A write handled by another worker bumps only that worker's versions.
+        etag = self.client.get(self.url)['ETag']
+        FootballField.objects.filter(pk=self.field.pk).update(name='renamed')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        later = clock.monotonic() + get_cache().timeout + 1
+        with mock.patch('stadium.cache.time.monotonic', return_value=later):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['name'], 'renamed')
+
+
+    def test_deleting_the_owner_invalidates(self):
+        owner = User.objects.create_user(username='leaving', password='secret', role='stadium_owner')
+        field = FootballField.objects.get(pk=self.field.pk)
+        field.owner = owner
+        field.save()
+        before = self.client.get(self.url)
+        self.assertEqual(before.json()['owner'], owner.pk)
+
+        owner.delete()
+        after = self.client.get(self.url)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertIsNone(after.json()['owner'])
+
+    def test_bodies_never_evict_versions(self):
+        backend = LocalLRUCache(max_entries=2)
+        backend.set_version('version:catalogue', 1)
+        for key in range(10):
+            backend.set(key, key)
+        self.assertEqual(backend.get_version('version:catalogue'), 1)
+        self.assertEqual(backend.stats()['evictions'], 8)
+
+    def test_counters_are_exact_under_threads(self):
+        backend = LocalLRUCache()
+        backend.set('hit', 1)
+
+        def lookups(i):
+            for _ in range(1000):
+                backend.lookup('hit')
+                backend.lookup('miss')
+
+        self.assertEqual(run_concurrently(lookups, 8), [])
+        self.assertEqual((backend.hits, backend.misses), (8000, 8000))
+
+
+class AsyncViewTests(TestCase):
+    """The async endpoints return the same bodies as their DRF counterparts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', password='secret', role='stadium_owner')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.field = FootballField.objects.create(
+            owner=cls.user, name='field', address='address', contact='contact',
+            hourly_rate='25.50', latitude=41.3, longitude=69.2,
+        )
+        Image.objects.create(football_field=cls.field, name='a.png', path='media/images/a.png')
+        cls.booking = Booking.objects.create(
+            user=cls.user, field=cls.field, booking_date=date(2030, 1, 1), start_time=time(10), end_time=time(11),
+        )
+
+    def setUp(self):
+        get_cache().clear()
+
+    def assertSameBody(self, sync_url, async_url, **headers):
+        expected = self.client.get(sync_url, headers=headers)
+        response = self.client.get(async_url, headers=headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+
+    def test_field_list_and_detail(self):
+        self.assertSameBody('/api/stadium/list', '/api/async/stadium/list')
+        self.assertSameBody(f'/api/stadium/detail/{self.field.pk}', f'/api/async/stadium/detail/{self.field.pk}')
+
+    def test_list_and_detail_use_the_response_cache(self):
+        for url in ('/api/async/stadium/list', f'/api/async/stadium/detail/{self.field.pk}'):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+                not_modified = self.client.get(url, headers={'if-none-match': first['ETag']})
+            self.assertEqual(cached.content, first.content)
+            self.assertEqual(cached['ETag'], first['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+
+            FootballField.objects.filter(pk=self.field.pk).first().save()
+            self.assertNotEqual(self.client.get(url)['ETag'], first['ETag'])
+
+    def test_filter(self):
+        query = '?lat=41.3&lon=69.2&radius_km=5&booking_date=2030-01-01&start_time=12:00&end_time=13:00'
+        self.assertSameBody(f'/api/stadium/book/filter/{query}', f'/api/async/stadium/book/filter/{query}')
+
+    def test_filter_page_bounds(self):
+        url = '/api/async/stadium/book/filter/'
+        for params in ({'limit': -1}, {'limit': 0}, {'offset': -3}, {'limit': 'ten'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+        for count in range(150):
+            FootballField.objects.create(
+                name=f'field {count}', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+            )
+        for path in (url, '/api/stadium/book/filter/'):
+            data = self.client.get(path, {'limit': 1000}).json()
+            self.assertEqual((data['count'], len(data['results'])), (151, 100), path)
+            self.assertIn('limit=100', data['next'])
+
+    def test_booking_detail_requires_token(self):
+        url = f'/api/async/stadium/book/detail/{self.booking.pk}'
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertSameBody(
+            f'/api/stadium/book/detail/{self.booking.pk}', url, authorization=f'Token {self.token.key}',
+        )
+
+    def test_booking_detail_uses_the_token_cache(self):
+        sync_url = f'/api/stadium/book/detail/{self.booking.pk}'
+        url = f'/api/async/stadium/book/detail/{self.booking.pk}'
+        for headers in ({}, {'authorization': 'Token wrong'}, {'authorization': 'Token'}):
+            self.assertSameBody(sync_url, url, **headers)
+            self.assertEqual(self.client.get(url, headers=headers)['WWW-Authenticate'], 'Token')
+
+        get_token_cache().clear()
+        headers = {'authorization': f'Token {self.token.key}'}
+        self.client.get(url, headers=headers)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, headers=headers).status_code, 200)
+
+        # Logging out deletes the token, and the signals evict it from the cache.
+        Token.objects.filter(pk=self.token.pk).delete()
+        self.assertEqual(self.client.get(url, headers=headers).status_code, 401)
+
+
+class BulkBookingTests(TestCase):
+
+    url = '/api/stadium/book/bulk-create'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='secret', role='client')
+        cls.field = FootballField.objects.create(
+            name='field', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_weekly_season_in_few_queries(self):
+        recurrence = {
+            'field': self.field.pk, 'booking_date': '2030-01-07', 'until': '2030-12-30',
+            'start_time': '18:00', 'end_time': '19:00',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'recurrence': recurrence}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['accepted'], 52)
+        self.assertEqual(Booking.objects.count(), 52)
+        statements = [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql']]
+        self.assertLessEqual(len(statements), 10, statements)
+        self.assertFalse(availability.is_free(self.field.pk, date(2030, 12, 30), time(18, 30), time(19)))
+        self.assertEqual(FieldDailyStats.objects.filter(field=self.field).count(), 52)
+
+    def test_conflicts_rejected_per_item(self):
+        Booking.objects.create(
+            user=self.user, field=self.field, booking_date=date(2030, 1, 1), start_time=time(10), end_time=time(11),
+        )
+        bookings = [
+            {'field': self.field.pk, 'booking_date': '2030-01-01', 'start_time': '10:30', 'end_time': '11:30'},
+            {'field': self.field.pk, 'booking_date': '2030-01-02', 'start_time': '10:00', 'end_time': '11:00'},
+            {'field': self.field.pk, 'booking_date': '2030-01-02', 'start_time': '10:45', 'end_time': '12:00'},
+            {'field': self.field.pk, 'booking_date': '2030-01-02', 'start_time': '11:00', 'end_time': '12:00'},
+        ]
+        response = self.client.post(self.url, {'bookings': bookings}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual([r['status'] for r in response.data['results']], ['rejected', 'accepted', 'rejected', 'accepted'])
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_unknown_field(self):
+        bookings = [{'field': 0, 'booking_date': '2030-01-01', 'start_time': '10:00', 'end_time': '11:00'}]
+        response = self.client.post(self.url, {'bookings': bookings}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(**UNTHROTTLED)
+class BookingConflictTests(TestCase):
+
+    url = '/api/stadium/book/create'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='secret', role='client')
+        cls.field = FootballField.objects.create(
+            name='field', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+        )
+        cls.booking = Booking.objects.create(
+            user=cls.user, field=cls.field, booking_date=date(2030, 1, 1), start_time=time(10), end_time=time(11),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def book(self, start_time, end_time, field=None):
+        return self.client.post(self.url, {
+            'field': (field or self.field).pk, 'booking_date': '2030-01-01',
+            'start_time': start_time, 'end_time': end_time,
+        }, format='json')
+
+    def test_overlaps_at_the_edges_of_the_slot(self):
+        for start_time, end_time in [('09:00', '10:01'), ('10:59', '12:00'), ('10:00', '11:00'), ('10:15', '10:30'),
+                                     ('09:00', '12:00'), ('10:07', '10:08')]:
+            self.assertEqual(self.book(start_time, end_time).status_code, 400, (start_time, end_time))
+        self.assertEqual(self.book('09:00', '10:00').status_code, 201)
+        self.assertEqual(self.book('11:00', '11:30').status_code, 201)
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_conflicts_checked_against_bookings_not_bitmaps(self):
+        FieldAvailability.objects.all().delete()
+        self.assertEqual(self.book('10:30', '11:30').status_code, 400)
+
+    def test_update_ignores_its_own_slot(self):
+        url = f'/api/stadium/book/update/{self.booking.pk}'
+        response = self.client.patch(url, {'start_time': '10:30', 'end_time': '11:30'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        other = Booking.objects.create(
+            user=self.user, field=self.field, booking_date=date(2030, 1, 1), start_time=time(12), end_time=time(13),
+        )
+        response = self.client.patch(f'/api/stadium/book/update/{other.pk}', {'start_time': '11:29'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(**UNTHROTTLED)
+class BookingRaceTests(TransactionTestCase):
+
+    def test_one_of_many_concurrent_requests_wins(self):
+        user = User.objects.create_user(username='client', password='secret', role='client')
+        field = FootballField.objects.create(
+            name='field', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+        )
+        statuses = []
+
+        def book(i):
+            client = APIClient()
+            client.force_authenticate(user)
+            statuses.append(client.post('/api/stadium/book/create', {
+                'field': field.pk, 'booking_date': '2030-01-01',
+                'start_time': f'10:{i:02d}', 'end_time': f'11:{i:02d}',
+            }, format='json').status_code)
+
+        self.assertEqual(run_concurrently(book, 8), [])
+        self.assertEqual(sorted(statuses), [201] + [400] * 7)
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+@override_settings(**UNTHROTTLED)
+class BookingExportTests(TestCase):
+
+    url = '/api/stadium/book/export/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', role='stadium_owner')
+        cls.client_user = User.objects.create_user(username='client', password='secret', role='client')
+        cls.admin = User.objects.create_user(username='admin', password='secret', role='admin')
+        cls.field, cls.other = [
+            FootballField.objects.create(
+                owner=owner, name='field', address='address', contact='contact', hourly_rate='10.00',
+                latitude=0, longitude=0,
+            )
+            for owner in (cls.owner, cls.admin)
+        ]
+        for day in range(1, 6):
+            for field, user, hour in [(cls.field, cls.client_user, 9), (cls.other, cls.admin, 9),
+                                      (cls.other, cls.client_user, 11)]:
+                Booking.objects.create(
+                    user=user, field=field, booking_date=date(2030, 1, day), start_time=time(hour), end_time=time(hour + 1),
+                )
+
+    def export(self, user=None, **params):
+        client = APIClient()
+        client.force_authenticate(user or self.admin)
+        response = client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        if params.get('output') == 'csv':
+            return response, list(csv.DictReader(StringIO(content)))
+        return response, [json.loads(line) for line in content.splitlines()]
+
+    def ids(self, user=None, **params):
+        return [row['id'] for row in self.export(user, **params)[1]]
+
+    def test_formats(self):
+        response, rows = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bookings.ndjson"')
+        expected = BookingSerializer(Booking.objects.order_by('id'), many=True).data
+        self.assertEqual(rows, [dict(row) for row in expected])
+
+        response, csv_rows = self.export(output='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(csv_rows, [{key: str(value) for key, value in row.items()} for row in rows])
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get(self.url, {'output': 'xml'}).status_code, 400)
+
+    def test_filters(self):
+        bookings = Booking.objects.order_by('id')
+        self.assertEqual(self.ids(field=self.field.pk), [b.pk for b in bookings.filter(field=self.field)])
+        self.assertEqual(self.ids(owner=self.admin.pk), [b.pk for b in bookings.filter(field=self.other)])
+        self.assertEqual(
+            self.ids(date_from='2030-01-02', date_to='2030-01-03'),
+            [b.pk for b in bookings.filter(booking_date__range=(date(2030, 1, 2), date(2030, 1, 3)))],
+        )
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        for params in ({'field': 'x'}, {'owner': '1.5'}, {'date_from': '01/02/2030'}):
+            self.assertEqual(client.get(self.url, params).status_code, 400, params)
+
+    def test_scoped_to_the_user(self):
+        bookings = Booking.objects.order_by('id')
+        self.assertEqual(self.ids(self.owner), [b.pk for b in bookings.filter(field=self.field)])
+        self.assertEqual(self.ids(self.client_user), [b.pk for b in bookings.filter(user=self.client_user)])
+        self.assertEqual(self.ids(self.client_user, owner=self.admin.pk),
+                         [b.pk for b in bookings.filter(user=self.client_user, field=self.other)])
+        self.assertEqual(len(self.ids()), 15)
+        self.assertEqual(APIClient().get(self.url).status_code, 401)
+
+    def test_streams_in_batches(self):
+        _, chunks = export.stream(Booking.objects.all(), 'ndjson', chunk_size=4, batch_size=4)
+        chunks = list(chunks)
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [4, 4, 4, 3])
+
+
+class AvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='secret', role='client')
+        cls.fields = [
+            FootballField.objects.create(
+                name='field', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+            )
+            for _ in range(5)
+        ]
+        for field, (start_time, end_time) in zip(cls.fields, [
+            (time(10), time(11)), (time(10, 5), time(10, 20)), (time(10, 50), time(11, 10)),
+            (time(0), time(0, 15)), (time(23, 45), time(23, 59, 59)),
+        ]):
+            Booking.objects.create(
+                user=cls.user, field=field, booking_date=date(2030, 1, 1), start_time=start_time, end_time=end_time,
+            )
+
+    def bitmaps(self):
+        return {
+            (field_id, booking_date): availability.from_bytes(bitmap)
+            for field_id, booking_date, bitmap in FieldAvailability.objects.values_list('field_id', 'booking_date', 'bitmap')
+        }
+
+    def test_bitmap_encoding(self):
+        self.assertEqual(availability.slot_mask(time(0), time(0, 15)), 1)
+        self.assertEqual(availability.slot_mask(time(23, 45), time(23, 59, 59)), 1 << 95)
+        self.assertEqual(availability.to_bytes(1), bytes(11) + b'\x01')
+        self.assertEqual(availability.to_bytes(1 << 95), b'\x80' + bytes(11))
+        bits = availability.slot_mask(time(10, 5), time(10, 20))
+        self.assertEqual(availability.from_bytes(availability.to_bytes(bits)), bits)
+        self.assertEqual(availability.from_bytes(None), 0)
+        self.assertEqual(availability.free_slots(bits), 94)
+        self.assertEqual(self.bitmaps()[self.fields[0].pk, date(2030, 1, 1)], 0b1111 << 40)
+
+    def test_rounding_to_15_minute_slots(self):
+        def slot(*indexes):
+            return sum(1 << i for i in indexes)
+
+        self.assertEqual(availability.slot_mask(time(10), time(10, 15)), slot(40))
+        self.assertEqual(availability.slot_mask(time(10, 5), time(10, 20)), slot(40, 41))
+        self.assertEqual(availability.slot_mask(time(10, 14, 59), time(10, 15, 1)), slot(40, 41))
+        self.assertEqual(availability.slot_mask(time(11), time(10)), 0)
+        self.assertEqual(availability.inner_mask(time(10), time(10, 30)), slot(40, 41))
+        self.assertEqual(availability.inner_mask(time(10, 5), time(10, 44)), slot(41))
+        self.assertEqual(availability.inner_mask(time(10, 5), time(10, 20)), 0)
+
+    def test_rebuild(self):
+        expected = self.bitmaps()
+        self.assertEqual(len(expected), 5)
+        FieldAvailability.objects.all().delete()
+        availability.rebuild(chunk_size=2)
+        self.assertEqual(self.bitmaps(), expected)
+
+    def test_busy_field_ids_match_the_booking_query(self):
+        field_ids = [field.pk for field in self.fields]
+        times = [time(0), time(0, 10), time(0, 15), time(9, 59), time(10), time(10, 5), time(10, 15), time(10, 20),
+                 time(10, 50), time(11), time(11, 5), time(11, 10), time(23, 45), time(23, 59, 59)]
+        for start_time in times:
+            for end_time in times:
+                if end_time <= start_time:
+                    continue
+                expected = set(Booking.objects.filter(
+                    booking_date=date(2030, 1, 1), start_time__lt=end_time, end_time__gt=start_time,
+                ).values_list('field_id', flat=True))
+                window = (date(2030, 1, 1), start_time, end_time)
+                self.assertEqual(availability.busy_field_ids(*window), expected, window)
+                self.assertEqual(availability.busy_field_ids(*window, field_ids=field_ids[:2]),
+                                 expected & set(field_ids[:2]), window)
+                free = FootballField.objects.exclude(id__in=availability.busy_fields(*window))
+                self.assertEqual(set(free.values_list('id', flat=True)), set(field_ids) - expected, window)
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        metrics.registry.clear()
+        get_cache().clear()
+
+    def test_latency_and_queries_per_route(self):
+        field = FootballField.objects.create(
+            name='field', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+        )
+        for _ in range(3):
+            self.client.get(f'/api/stadium/detail/{field.pk}')
+            self.client.get(f'/api/async/stadium/detail/{field.pk}')
+        sync, async_ = metrics.registry.routes['detail-stadium'], metrics.registry.routes['async-detail-stadium']
+        self.assertEqual(sync.duration_ns.count, 3)
+        self.assertEqual(async_.duration_ns.count, 3)
+        self.assertEqual(async_.queries.sum, 2)  # field and images once, then the response cache
+
+        with self.settings(METRICS_TOKEN='scrape'):
+            body = self.client.get('/metrics', headers={'authorization': 'Bearer scrape'}).content.decode()
+        self.assertIn('http_request_duration_seconds{route="detail-stadium",quantile="0.99"}', body)
+        self.assertIn('http_request_db_queries_count{route="async-detail-stadium"} 3', body)
+        self.assertIn('http_requests_total{route="detail-stadium",status="2xx"} 3', body)
+
+    @override_settings(METRICS_TOKEN='scrape', METRICS_ALLOWED_IPS=('10.0.0.9',))
+    def test_metrics_need_the_token_or_an_allowed_ip(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)  # 127.0.0.1, e.g. a local proxy
+        self.assertEqual(self.client.get('/metrics', headers={'authorization': 'Bearer wrong'}).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'authorization': 'Bearer scrape'}).status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+    def test_histogram_quantiles(self):
+        histogram = metrics.Histogram(metrics.LATENCY_BOUNDS_NS)
+        for ms in range(1, 101):
+            histogram.observe(ms * 1_000_000)
+        for q in metrics.QUANTILES:
+            self.assertAlmostEqual(histogram.quantile(q) / 1e6, q * 100, delta=q * 100 * 0.2)
+
+
+class AsgiRequestMetricsTests(TransactionTestCase):
+    """Under an ASGI server views and async ORM calls run in an executor thread with its own connection."""
+
+    def setUp(self):
+        metrics.registry.clear()
+        get_cache().clear()
+
+    def test_queries_counted_under_asgi(self):
+        field = FootballField.objects.create(
+            name='field', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+        )
+
+        async def requests():
+            client = AsyncClient()
+            try:
+                for url in (f'/api/stadium/detail/{field.pk}', f'/api/async/stadium/detail/{field.pk}'):
+                    self.assertEqual((await client.get(url)).status_code, 200)
+            finally:
+                await sync_to_async(connections.close_all)()
+
+        # Not async_to_sync: that would run the sync code in this thread, on this connection.
+        asyncio.run(requests())
+        routes = metrics.registry.routes
+        self.assertEqual(routes['async-detail-stadium'].queries.sum, 2)
+        self.assertGreater(routes['detail-stadium'].queries.sum, 0)
+
+
+class LoadGeneratorTests(TestCase):
+
+    def test_bookings_deterministic_and_non_overlapping(self):
+        loadgen.init_worker([1, 2, 3])
+        plan = [(position, 100 + position, 40) for position in range(6)]
+        rows = loadgen.bookings_for_fields(7, 700000, 3, plan)
+        chunked = [row for part in (plan[:2], plan[2:]) for row in loadgen.bookings_for_fields(7, 700000, 3, part)]
+        self.assertEqual(rows, chunked)
+        self.assertEqual(len(rows), 240)
+        self.assertEqual(len({(field, day, hour) for field, _, day, hour in rows}), 240)
+
+
+class BenchmarkBaselineTests(TestCase):
+
+    def test_find_regressions(self):
+        baseline = {'list': {'p95_ms': 10.0, 'rps': 100.0, 'queries_per_request': 2.0}}
+        self.assertEqual(find_regressions({'list': {'p95_ms': 12.0, 'rps': 90.0, 'queries_per_request': 2.0}},
+                                          baseline, 0.25), [])
+        regressions = find_regressions({'list': {'p95_ms': 20.0, 'rps': 50.0, 'queries_per_request': 3.0}},
+                                       baseline, 0.25)
+        self.assertEqual(len(regressions), 3)
+        regressions = find_regressions({'list': {'p95_ms': 10.0, 'rps': 100.0, 'queries_per_request': 2.0,
+                                                 'errors': 1}}, baseline, 0.25)
+        self.assertEqual(regressions, ['list: errors 0 -> 1'])
+
+    def test_worker_failures_are_raised(self):
+        def worker(index):
+            if index == 1:
+                raise ValueError('boom')
+
+        with self.assertRaises(RuntimeError) as raised:
+            run_threads(worker, 3)
+        self.assertIsInstance(raised.exception.__cause__, ValueError)
+
+    def test_every_route_has_a_scenario(self):
+        from .management.commands.bench import Scenarios, route_names
+
+        self.assertEqual([name for name in route_names() if not hasattr(Scenarios, name.replace('-', '_'))], [])
+
+
+class DatabaseProfileTests(TestCase):
+
+    def test_pragmas_applied_to_new_connections(self):
+        self.assertEqual(connection.settings_dict['PRAGMAS'], SQLITE_PRAGMAS)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_postgres_profile(self):
+        env = {'POSTGRES_DB': 'db', 'POSTGRES_USER': 'user', 'POSTGRES_HOST': 'pg', 'POSTGRES_PORT': '6432'}
+        with mock.patch.dict('os.environ', env):
+            profile = database_profile('postgres', None)
+        self.assertEqual(profile['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(
+            [profile[key] for key in ('NAME', 'USER', 'HOST', 'PORT')], ['db', 'user', 'pg', '6432'],
+        )
+        self.assertEqual(profile['CONN_MAX_AGE'], 600)
+        self.assertTrue(profile['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('OPTIONS', profile)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            database_profile('mysql', None)
+
+
+class PrebuiltSchemaTests(TestCase):
+
+    def setUp(self):
+        schema_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, schema_dir)
+        settings_override = override_settings(STADIUM_SCHEMA_DIR=schema_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_built_once_and_served_with_etag(self):
+        with mock.patch.object(schema, 'build', wraps=schema.build) as build:
+            response = self.client.get('/swagger.json')
+            self.assertEqual(self.client.get('/swagger/?format=openapi').content, response.content)
+        build.assert_called_once()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/stadium/book/list/', json.loads(response.content)['paths'])
+        self.assertIn('public', response['Cache-Control'])
+
+        not_modified = self.client.get('/swagger.json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(self.client.get('/swagger.yaml')['Content-Type'], 'application/yaml')
+
+    def test_stale_build_is_replaced(self):
+        schema.build()
+        (schema.schema_dir() / schema.VERSION_FILE).write_text('old')
+        schema._loaded.clear()
+        with mock.patch.object(schema, 'build', wraps=schema.build) as build:
+            self.assertEqual(self.client.get('/swagger.json').status_code, 200)
+        build.assert_called_once()
+        self.assertEqual(schema.built_version(), schema.code_version())
+
+
+class NearestFieldsTests(TestCase):
+
+    points = [(41.3, 69.2), (41.31, 69.21), (41.5, 69.4), (42.3, 69.2), (0.0, 179.95), (0.0, -179.95), (89.9, 10.0)]
+
+    @classmethod
+    def setUpTestData(cls):
+        for lat, lon in cls.points:
+            FootballField.objects.create(
+                name='field', address='address', contact='contact', hourly_rate='10.00', latitude=lat, longitude=lon,
+            )
+
+    def assertMatchesHaversine(self, lat, lon, radius_km):
+        expected = sorted(
+            (geo.haversine_km(lat, lon, field.latitude, field.longitude), field.id)
+            for field in FootballField.objects.all()
+        )
+        expected = [(round(distance, 6), pk) for distance, pk in expected if distance <= radius_km]
+        nearest = geo.nearest(FootballField.objects.all(), lat, lon, radius_km)
+        found = [(round(field.distance, 6), field.id) for field in nearest]
+        self.assertEqual(found, expected)
+
+    def test_matches_python_haversine(self):
+        self.assertMatchesHaversine(41.3, 69.2, 40)
+        self.assertMatchesHaversine(41.3, 69.2, 120)
+        self.assertMatchesHaversine(0.0, 179.99, 20)
+        self.assertMatchesHaversine(89.95, -170.0, 50)
+
+    def test_limit_in_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            fields = list(geo.nearest(FootballField.objects.all(), 41.3, 69.2, 200, k=2))
+        self.assertEqual(len(fields), 2)
+        self.assertIn('LIMIT 2', queries[0]['sql'])
+        self.assertIn('ORDER BY', queries[0]['sql'])
+
+    def test_rebuild_after_bulk_writes(self):
+        field = FootballField.objects.get(latitude=42.3)
+        FootballField.objects.filter(pk=field.pk).update(latitude=10.0, longitude=10.0)
+        self.assertEqual(list(geo.nearest(FootballField.objects.all(), 10.0, 10.0, 5)), [])
+
+        out = StringIO()
+        call_command('rebuild_geohash', stdout=out)
+        self.assertIn('Updated the geohash of 1 fields.', out.getvalue())
+        self.assertEqual([f.pk for f in geo.nearest(FootballField.objects.all(), 10.0, 10.0, 5)], [field.pk])
+        self.assertEqual(FieldSearch.objects.get(pk=field.pk).geohash, geo.encode(10.0, 10.0))
+        self.assertEqual(geo.rebuild_geohashes(FootballField.objects.all(), chunk_size=2), [])
+
+    def test_radius_beyond_the_globe(self):
+        self.assertMatchesHaversine(41.3, 69.2, 1e9)
+
+    @override_settings(STADIUM_THROTTLE_RATES={}, STADIUM_MAX_NEAREST=5)
+    def test_invalid_area_parameters(self):
+        urls = ['/api/stadium/book/filter/', '/api/async/stadium/book/filter/', '/api/stadium/search/',
+                '/api/stadium/calendar/']
+        for url in urls:
+            for area in ({'radius_km': 'inf'}, {'radius_km': 'nan'}, {'radius_km': '-inf'}, {'radius_km': '0'},
+                         {'k': '0'}, {'k': '6'}, {'k': str(2 ** 64)}, {'lat': 'nan'}, {'lat': '91'}, {'lon': '-inf'}):
+                params = {'lat': 41.3, 'lon': 69.2, 'date_from': '2030-01-01', **area}
+                self.assertEqual(self.client.get(url, params).status_code, 400, (url, area))
+            params = {'lat': 41.3, 'lon': 69.2, 'radius_km': '1e300', 'k': 5, 'date_from': '2030-01-01'}
+            self.assertEqual(self.client.get(url, params).status_code, 200, url)
+
+
+class CalendarTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='secret', role='client')
+        cls.field, cls.other = [
+            FootballField.objects.create(
+                name='field', address='address', contact='contact', hourly_rate='10.00', latitude=41.3, longitude=69.2,
+            )
+            for _ in range(2)
+        ]
+        for start, end in [(time(9), time(10)), (time(9, 30), time(11)), (time(11), time(12, 15)), (time(20), time(23))]:
+            Booking.objects.create(
+                user=cls.user, field=cls.field, booking_date=date(2030, 1, 1), start_time=start, end_time=end,
+            )
+
+    def test_merged_free_intervals(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/stadium/calendar/', {
+                'fields': f'{self.field.pk},{self.other.pk}', 'date_from': '2030-01-01', 'date_to': '2030-01-02',
+                'open': '08:00', 'close': '22:00',
+            })
+        self.assertEqual(response.status_code, 200, response.content)
+        days = {row['field']: row['days'] for row in response.json()['fields']}
+        self.assertEqual(days[self.field.pk], {
+            '2030-01-01': [['08:00', '09:00'], ['12:15', '20:00']],
+            '2030-01-02': [['08:00', '22:00']],
+        })
+        self.assertEqual(days[self.other.pk]['2030-01-01'], [['08:00', '22:00']])
+
+    def test_geo_area(self):
+        response = self.client.get('/api/stadium/calendar/', {'lat': 41.3, 'lon': 69.2, 'date_from': '2030-01-01'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.json()['fields']), 2)
+        self.assertEqual(response.json()['fields'][0]['days']['2030-01-01'][-1], ['23:00', '24:00'])
+
+    def test_requires_fields_or_area(self):
+        self.assertEqual(self.client.get('/api/stadium/calendar/', {'date_from': '2030-01-01'}).status_code, 400)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='secret', role='client')
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def token_queries(self, url='/api/stadium/book/list/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [q for q in queries if 'authtoken_token' in q['sql']]
+
+    def test_warm_cache_skips_token_query(self):
+        self.assertEqual(len(self.token_queries()), 1)
+        self.assertEqual(self.token_queries(), [])
+
+    def test_logout_revokes(self):
+        self.token_queries()
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/api/stadium/book/list/').status_code, 401)
+
+    def test_user_change_evicts(self):
+        self.token_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/stadium/book/list/').status_code, 401)
+
+    def test_login_keeps_token(self):
+        response = self.client.post('/api/auth/login/', {'username': 'client', 'password': 'secret'})
+        self.assertEqual(response.data['token'], self.token.key)
+
+
+class ImagePipelineTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, STADIUM_IMAGE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_cache().clear()
+        self.user = User.objects.create_user(username='owner', password='secret', role='stadium_owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, size):
+        data = BytesIO()
+        PILImage.new('RGB', size, 'green').save(data, 'PNG')
+        return SimpleUploadedFile(name, data.getvalue(), content_type='image/png')
+
+    def test_create_stores_images_and_builds_variants(self):
+        body = {
+            'name': 'field', 'address': 'address', 'contact': 'contact', 'hourly_rate': '10.00',
+            'latitude': 41.3, 'longitude': 69.2, 'images': [self.upload('a.png', (2000, 1000)), self.upload('b.png', (100, 50))],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/stadium/create/', body, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Image.objects.count(), 2)
+
+        big = Image.objects.get(name='a.png')
+        self.assertEqual(set(big.variants), {'thumb', 'medium'})
+        with default_storage.open(big.variants['thumb']) as f:
+            self.assertEqual(PILImage.open(f).size, (320, 160))
+        with default_storage.open(Image.objects.get(name='b.png').variants['medium']) as f:
+            self.assertEqual(PILImage.open(f).size, (100, 50))  # never upscaled
+
+        image = self.client.get(f"/api/stadium/detail/{response.json()['id']}").json()['images'][0]
+        self.assertRegex(image['thumbnail'], r'_thumb\.[0-9a-f]{12}\.webp$')
+        self.assertEqual(image['thumbnail'], image['variants']['thumb'])
+
+    def test_unreadable_image_keeps_original(self):
+        field = FootballField.objects.create(
+            owner=self.user, name='field', address='address', contact='contact',
+            hourly_rate='10.00', latitude=0, longitude=0,
+        )
+        upload = SimpleUploadedFile('broken.png', b'not an image', content_type='image/png')
+        with self.assertLogs('stadium.images', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            image, = images.save_uploads(field, [upload])
+        image.refresh_from_db()
+        self.assertEqual(image.variants, {})
+        data = self.client.get(f'/api/stadium/detail/{field.pk}').json()['images'][0]
+        self.assertEqual(data['thumbnail'], data['path'])
+
+
+class MediaServingTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.name = default_storage.save('media/images/a.txt', ContentFile(b'0123456789'))
+
+    def test_names_are_content_hashed(self):
+        self.assertRegex(self.name, r'^media/images/a\.[0-9a-f]{12}\.txt$')
+        self.assertEqual(default_storage.save('media/images/a.txt', ContentFile(b'0123456789')), self.name)
+        self.assertNotEqual(default_storage.save('media/images/a.txt', ContentFile(b'other')), self.name)
+
+    def test_client_chosen_hash_is_not_trusted(self):
+        # A name claiming the hash of a.txt must not dedupe onto it.
+        other = default_storage.save(self.name, ContentFile(b'forged'))
+        self.assertNotEqual(other, self.name)
+        self.assertEqual(other, f"media/images/a.{media.content_hash(ContentFile(b'forged'))}.txt")
+        with default_storage.open(self.name) as f:
+            self.assertEqual(f.read(), b'0123456789')
+        # Nor can content be stored under a hash that isn't its own.
+        name = default_storage.save('media/images/b.000000000000.txt', ContentFile(b'0123456789'))
+        self.assertEqual(name, self.name.replace('/a.', '/b.'))
+
+    def test_hashed_file_is_immutable_and_conditional(self):
+        response = self.client.get(f'/media/{self.name}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], f'"{media.HASHED_NAME.search(self.name).group(1)}"')
+        self.assertEqual(self.client.get(f'/media/{self.name}', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        legacy = default_storage.path('media/images/legacy.txt')
+        with open(legacy, 'wb') as f:
+            f.write(b'old')
+        response = self.client.get('/media/media/images/legacy.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get('/media/media/images/legacy.txt', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get('/media/../core/settings.py').status_code, 404)
+
+    def test_range_requests(self):
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertFalse(response.has_header('Cache-Control'))
+        self.assertIn('immutable', self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=2-5')['Cache-Control'])
+        # A stale If-Range gets the whole file.
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_offload(self):
+        with self.settings(STADIUM_MEDIA_OFFLOAD='x-accel'):
+            response = self.client.get(f'/media/{self.name}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+        with self.settings(STADIUM_MEDIA_OFFLOAD='x-sendfile'):
+            response = self.client.get(f'/media/{self.name}')
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.name))
+
+
+class OwnerStatsTests(TestCase):
+
+    url = '/api/stadium/owner/stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password='secret', role='stadium_owner')
+        cls.client_user = User.objects.create_user(username='client', password='secret', role='client')
+        cls.field = FootballField.objects.create(
+            owner=cls.owner, name='field', address='address', contact='contact',
+            hourly_rate='30.00', latitude=0, longitude=0,
+        )
+        cls.other = FootballField.objects.create(
+            owner=cls.client_user, name='other', address='address', contact='contact',
+            hourly_rate='10.00', latitude=0, longitude=0,
+        )
+
+    def book(self, field, day, start, end):
+        return Booking.objects.create(user=self.client_user, field=field, booking_date=day, start_time=start, end_time=end)
+
+    def stats(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        return client.get(self.url, params)
+
+    def test_rollups_follow_booking_writes(self):
+        first = self.book(self.field, date(2030, 1, 7), time(10), time(11, 30))
+        self.book(self.field, date(2030, 1, 7), time(18), time(19))
+        self.book(self.other, date(2030, 1, 7), time(10), time(11))
+        stats = FieldDailyStats.objects.get(field=self.field, booking_date=date(2030, 1, 7))
+        self.assertEqual((stats.bookings, stats.booked_minutes, str(stats.revenue)), (2, 150, '75.00'))
+
+        first.booking_date = date(2030, 1, 8)
+        first.save()
+        first.delete()
+        self.assertEqual(
+            list(FieldDailyStats.objects.filter(field=self.field).values_list('booking_date', 'bookings')),
+            [(date(2030, 1, 7), 1)],
+        )
+
+        FieldDailyStats.objects.all().delete()
+        rollups.rebuild()
+        self.assertEqual(FieldDailyStats.objects.count(), 2)
+
+    def test_owner_stats_read_only_rollups(self):
+        self.book(self.field, date(2030, 1, 7), time(10), time(12))  # Monday
+        self.book(self.field, date(2030, 1, 13), time(10), time(11))  # Sunday, same week
+        self.book(self.field, date(2030, 1, 14), time(10), time(11))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.stats(date_from='2030-01-07', date_to='2030-01-20', group='week', open='08:00', close='20:00')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse([q['sql'] for q in queries if 'stadium_booking' in q['sql']])
+        field, = response.data['fields']  # only the caller's fields
+        self.assertEqual(field['field'], self.field.pk)
+        self.assertEqual([(p['start'], p['bookings'], p['revenue']) for p in field['periods']],
+                         [(date(2030, 1, 7), 2, '90.00'), (date(2030, 1, 14), 1, '30.00')])
+        self.assertEqual(field['total'], {'bookings': 3, 'booked_minutes': 240, 'revenue': '120.00',
+                                          'occupancy': round(240 / (14 * 12 * 60), 4)})
+
+    def test_clients_are_forbidden(self):
+        client = APIClient()
+        client.force_authenticate(self.client_user)
+        self.assertEqual(client.get(self.url, {'date_from': '2030-01-07'}).status_code, 403)
+
+
+class FastPathTests(TestCase):
+    """The fast list path sends exactly the bytes DRF's serializers and JSONRenderer would."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', password='secret', role='stadium_owner')
+        fields = [
+            FootballField.objects.create(
+                owner=cls.user, name='Stadion \u2028 «Ünal» 🏟', address='line\none "quoted"', contact='\\',
+                hourly_rate='25.5', latitude=41.311081, longitude=69.240562,
+            ),
+            FootballField.objects.create(
+                owner=None, name='tiny', address='a', contact='c', hourly_rate='0.10', latitude=0.00001, longitude=-1e-7,
+            ),
+        ]
+        Image.objects.create(football_field=fields[0], name='a.png', path='media/images/a.png',
+                             variants={'thumb': 'media/images/variants/1_a_thumb.webp'})
+        Image.objects.create(football_field=fields[0], name='b.png', path=None)
+        Booking.objects.create(user=cls.user, field=fields[0], booking_date=date(2030, 1, 1),
+                               start_time=time(10, 0, 30), end_time=time(11, 15, 0, 250))
+
+    def assertSameBytes(self, serializer_data, fast_data):
+        expected = JSONRenderer().render(serializer_data)
+        self.assertEqual(FastJSONRenderer().render(fast_data), expected)
+        with mock.patch.object(fastpath, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(fast_data), expected)
+
+    def test_fields_identical(self):
+        request = RequestFactory().get('/api/stadium/list')
+        queryset = FootballField.objects.order_by('id')
+        self.assertSameBytes(
+            FootballFieldSerializer(queryset, many=True, context={'request': request}).data,
+            fastpath.field_data(fastpath.FIELD_ROWS.values(queryset), request),
+        )
+        # Without the field holding tiny floats, orjson's output is used as is.
+        queryset = queryset.exclude(name='tiny')
+        self.assertSameBytes(
+            FootballFieldSerializer(queryset, many=True, context={'request': request}).data,
+            fastpath.field_data(fastpath.FIELD_ROWS.values(queryset), request),
+        )
+
+    def test_bookings_identical(self):
+        queryset = Booking.objects.order_by('id')
+        self.assertSameBytes(BookingSerializer(queryset, many=True).data,
+                             fastpath.booking_data(fastpath.BOOKING_ROWS.values(queryset)))
+
+    def test_list_endpoint(self):
+        get_cache().clear()
+        response = self.client.get('/api/stadium/list')
+        fields = FootballField.objects.order_by('-id')
+        expected = FootballFieldSerializer(fields, many=True, context={'request': response.wsgi_request}).data
+        self.assertEqual(response.content, JSONRenderer().render({'next': None, 'previous': None, 'results': expected}))
+
+
+@override_settings(
+    STADIUM_THROTTLE_RATES={'availability': {'anon': (1, 2), 'user': (1, 3)}},
+    STADIUM_CONCURRENCY_LIMITS={'availability': 1},
+)
+class ThrottlingTests(TestCase):
+    url = '/api/stadium/book/filter/?booking_date=2030-01-01&start_time=10:00&end_time=11:00'
+
+    def setUp(self):
+        throttling.get_bucket_store().clear()
+
+    def test_refill(self):
+        state, wait = throttling.refill(None, 2, 1, now=100.0)
+        self.assertEqual(wait, 0)
+        state, wait = throttling.refill(state, 2, 1, now=100.0)
+        self.assertEqual(wait, 0.5)
+        self.assertEqual(throttling.refill(state, 2, 1, now=100.5)[1], 0)
+
+    def test_anonymous_clients_are_limited_per_ip(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.1').status_code, 200)
+        response = self.client.get(self.url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        # Other scopes have their own (here: no) budget.
+        self.assertEqual(self.client.get('/api/stadium/list', REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+    def test_token_clients_are_limited_per_user(self):
+        user = User.objects.create_user(username='client', password='secret', role='client')
+        token = Token.objects.create(user=user)
+        statuses = [
+            self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {token.key}', REMOTE_ADDR=f'10.0.1.{i}').status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    def test_load_shedding(self):
+        throttling.ThrottleMiddleware.in_flight['availability'] += 1
+        self.addCleanup(throttling.ThrottleMiddleware.in_flight.subtract, ['availability'])
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.client.get('/api/stadium/list').status_code, 200)
+
+
+class AdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='secret', role='admin')
+        cls.field = FootballField.objects.create(
+            owner=cls.admin, name='field', address='address', contact='contact',
+            hourly_rate='25.00', latitude=41.3, longitude=69.2,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def book(self, count):
+        Booking.objects.bulk_create([
+            Booking(user=self.admin, field=self.field, booking_date=date(2030, 1, 1 + i % 28), start_time=time(10), end_time=time(11))
+            for i in range(count)
+        ])
+
+    def test_booking_changelist_queries_do_not_grow_with_rows(self):
+        self.book(2)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get('/admin/stadium/booking/').status_code, 200)
+        self.book(40)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/admin/stadium/booking/')
+        self.assertContains(response, 'booking_date__day=28')  # calendar_date_hierarchy, one month of bookings
+        self.assertEqual(len(large), len(small))
+        for query in large.captured_queries:
+            if 'COUNT(' in query['sql']:
+                self.assertIn('LIMIT', query['sql'])
+        self.assertEqual(str(Booking.objects.order_by('pk').first()), 'field - 2030-01-01 (10:00:00-11:00:00)')
+
+    def test_estimated_count(self):
+        self.book(5)
+        paginator = EstimatedCountPaginator(Booking.objects.all(), 2)
+        paginator.count_limit = 3
+        self.assertEqual(paginator.count, Booking.objects.latest('pk').pk)
+        paginator = EstimatedCountPaginator(Booking.objects.filter(booking_date__gte=date(2030, 1, 2)), 2)
+        paginator.count_limit = 3
+        self.assertEqual(paginator.count, 4)
+        paginator = EstimatedCountPaginator(Booking.objects.filter(booking_date=date(2030, 1, 2)), 2)
+        self.assertEqual(paginator.count, 1)
+
+
+class FieldSearchTests(TestCase):
+
+    url = '/api/stadium/search/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fields = {
+            name: FootballField.objects.create(
+                name=name, address=address, contact='contact', hourly_rate=rate, latitude=lat, longitude=lon,
+            )
+            for name, address, rate, lat, lon in [
+                ('Café Olímpico', 'Chilonzor 5', '25.50', 41.30, 69.20),
+                ('Olimp Arena', 'Yunusobod 12', '40.00', 41.35, 69.28),
+                ('Olimpia', 'Samarkand road', '30.00', 39.65, 66.96),
+                ('Central', 'Chilonzor 9', '15.00', 41.31, 69.21),
+            ]
+        }
+
+    def ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()['results']]
+
+    def pk(self, *names):
+        return [self.fields[name].pk for name in names]
+
+    def test_read_model_follows_writes(self):
+        field = self.fields['Café Olímpico']
+        self.assertEqual(FieldSearch.objects.get(pk=field.pk).price_cents, 2550)
+        self.assertEqual(self.ids(q='cafe olimp'), self.pk('Café Olímpico'))
+
+        field.name = 'Bunyodkor'
+        field.save()
+        self.assertEqual(self.ids(q='cafe'), [])
+        self.assertEqual(self.ids(q='bunyod'), [field.pk])
+
+        image = Image.objects.create(football_field=field, name='a.png', path='media/images/a.png')
+        self.assertEqual(FieldSearch.objects.get(pk=field.pk).thumbnail, images.storage_url('media/images/a.png'))
+        image.variants = {'thumb': 'media/images/variants/a_thumb.webp'}
+        image.save()
+        row = self.client.get(self.url, {'q': 'bunyodkor'}).json()['results'][0]
+        self.assertEqual(row['thumbnail'], 'http://testserver' + images.storage_url('media/images/variants/a_thumb.webp'))
+        self.assertEqual(row['hourly_rate'], '25.50')
+        image.delete()
+        self.assertEqual(FieldSearch.objects.get(pk=field.pk).thumbnail, '')
+
+        Image.objects.create(football_field=field, name='a.png', path='media/images/a.png')
+        field.delete()
+        self.assertFalse(FieldSearch.objects.filter(pk=field.pk).exists())
+        self.assertEqual(self.ids(q='bunyodkor'), [])
+
+    def test_rebuild(self):
+        FieldSearch.objects.all().delete()
+        self.assertEqual(self.ids(), [])
+        search.rebuild(chunk_size=3)
+        self.assertEqual(self.ids(q='olimp'), self.pk('Café Olímpico', 'Olimpia', 'Olimp Arena'))
+        self.assertEqual(FieldSearch.objects.count(), 4)
+
+    def test_text_price_and_distance_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {
+                'q': 'olimp', 'min_price': '20', 'max_price': '35', 'lat': 41.3, 'lon': 69.2, 'radius_km': 50,
+            })
+        self.assertEqual(len(queries), 1)
+        row, = response.json()['results']
+        self.assertEqual(row['id'], self.fields['Café Olímpico'].pk)
+        self.assertEqual(row['distance_km'], 0.0)
+
+        self.assertEqual(self.ids(q='chilonzor', ordering='-price'), self.pk('Café Olímpico', 'Central'))
+        self.assertEqual(self.ids(lat=41.3, lon=69.2, radius_km=20), self.pk('Café Olímpico', 'Central', 'Olimp Arena'))
+        self.assertEqual(self.ids(max_price='25.50'), self.pk('Central', 'Café Olímpico'))
+
+    def test_pages_without_count(self):
+        response = self.client.get(self.url, {'limit': 3})
+        data = response.json()
+        self.assertNotIn('count', data)
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(self.client.get(data['next']).json()['results'][0]['id'], self.pk('Olimp Arena')[0])
+
+    def test_invalid_parameters(self):
+        for params in ({'min_price': 'cheap'}, {'min_price': '-1'}, {'min_price': '50', 'max_price': '10'},
+                       {'ordering': 'name'}, {'ordering': 'distance'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+
+class FieldSearchConcurrencyTests(TransactionTestCase):
+    """Search rows are written while other connections hold SQLite's write lock."""
+
+    def create_fields(self, count):
+        return [
+            FootballField.objects.create(
+                name=f'field {i}', address='address', contact='contact', hourly_rate='10.00', latitude=0, longitude=0,
+            )
+            for i in range(count)
+        ]
+
+    def test_concurrent_field_updates(self):
+        fields = self.create_fields(4)
+
+        def rename(i):
+            field = FootballField.objects.get(pk=fields[i].pk)
+            for n in range(10):
+                field.name = f'renamed {i} {n}'
+                field.save()
+
+        self.assertEqual(run_concurrently(rename, len(fields)), [])
+        self.assertEqual(
+            sorted(FieldSearch.objects.values_list('name', flat=True)), [f'renamed {i} 9' for i in range(4)],
+        )
+
+    def test_concurrent_field_deletes(self):
+        fields = self.create_fields(8)
+        for field in fields:
+            Image.objects.create(football_field=field, name='a.png', path='media/images/a.png')
+
+        def delete(i):
+            FootballField.objects.get(pk=fields[i].pk).delete()
+
+        self.assertEqual(run_concurrently(delete, len(fields)), [])
+        self.assertFalse(FieldSearch.objects.exists())
@@ -0,0 +1,215 @@
+"""Token-bucket rate limits.
+
+Every client gets a bucket per scope: anonymous clients by IP, logged-in
+ones by user (their token). A bucket holds up to ``burst`` requests and
+refills at ``rate`` requests per second, so short bursts pass while a
+steady scraper is held to ``rate``. The budgets are set per scope with
+``STADIUM_THROTTLE_RATES``::
+
+    STADIUM_THROTTLE_RATES = {
+        # scope: {'anon': (rate per second, burst), 'user': (rate per second, burst)}
+        'availability': {'anon': (2, 10), 'user': (5, 20)},
+    }
+
+Views choose their scope with ``throttle_scope``. A scope that is not in
+the setting is not limited.
+
+Anonymous requests (no ``Authorization`` header) are charged by
+``ThrottleMiddleware`` before sessions, CSRF and DRF run, so rejecting a
+flood costs a fraction of a DRF 429. Token
+requests are charged by ``TokenBucketThrottle`` once DRF knows the user.
+
+The buckets live in ``STADIUM_THROTTLE_STORE``, configured like
+``STADIUM_CACHE`` (see ``stadium.cache``). ``LocalBucketStore`` is exact
+but per process, so each worker allows the full budget.
+``CacheBucketStore`` shares the buckets through a ``CACHES`` alias, e.g.
+Redis. Its read-modify-write is not atomic, so concurrent requests may
+occasionally both get the last token, like DRF's own throttles.
+
+``ThrottleMiddleware`` also sheds load: once a scope has
+``STADIUM_CONCURRENCY_LIMITS[scope]`` requests in flight in this process,
+further ones get an immediate 503 with ``Retry-After`` instead of queueing
+behind them.
+"""
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework.throttling import BaseThrottle
+
+from .cache import get_cache
+
+
+def refill(state, rate, burst, now):
+    """Take one token from the bucket ``state``.
+
+    ``state`` is ``(tokens, timestamp)``, or None for a new (full) bucket.
+    Returns ``(new_state, wait)``, where ``wait`` is 0 if the request may
+    go ahead, else the seconds until a token is available.
+    """
+    tokens, stamp = state or (burst, now)
+    tokens = min(burst, tokens + max(now - stamp, 0) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBucketStore:
+    """Buckets in this process, least recently used dropped past ``max_entries``.
+
+    A dropped bucket comes back full; keep ``max_entries`` well above the
+    number of clients seen in ``burst / rate`` seconds.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        with self._lock:
+            state, wait = refill(self._buckets.get(key), rate, burst, time.monotonic())
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """Buckets in a ``CACHES`` alias shared by all workers."""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def take(self, key, rate, burst):
+        cache = caches[self.alias]
+        state, wait = refill(cache.get(key), rate, burst, time.time())
+        # Once refilled to the brim the bucket is as good as new.
+        cache.set(key, state, math.ceil(burst / rate))
+        return wait
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+def get_bucket_store():
+    return get_cache('STADIUM_THROTTLE_STORE')
+
+
+def _ident(request):
+    return BaseThrottle().get_ident(request)
+
+
+def throttle_wait(request, scope, user=None):
+    """Seconds ``request`` has to wait under ``scope``'s budget; 0 to go ahead."""
+    budgets = settings.STADIUM_THROTTLE_RATES.get(scope)
+    if not budgets:
+        return 0
+    if user is not None and user.is_authenticated:
+        kind, ident = 'user', user.pk
+    else:
+        kind, ident = 'anon', _ident(request)
+    if kind not in budgets:
+        return 0
+    rate, burst = budgets[kind]
+    return get_bucket_store().take(f'throttle:{scope}:{kind}:{ident}', rate, burst)
+
+
+def retry_after(wait):
+    return str(max(1, math.ceil(wait)))
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle applying the view's ``throttle_scope`` budget."""
+
+    def allow_request(self, request, view):
+        if getattr(request, 'anon_throttled', False) and not request.user.is_authenticated:
+            return True  # already charged by ThrottleMiddleware
+        self._wait = throttle_wait(request, getattr(view, 'throttle_scope', None), request.user)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class ThrottleMiddleware:
+    """Per-IP buckets of anonymous requests and per-scope concurrency limits.
+
+    Goes right after the metrics middleware, so rejected requests are
+    counted but cost no session, CSRF or DRF work.
+    """
+    sync_capable = True
+    async_capable = True
+    # Class level: the limits are per process, however many handlers there are.
+    in_flight = Counter()
+    _lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        scope, rejected = self.enter(request)
+        if rejected is not None:
+            return rejected
+        try:
+            return self.get_response(request)
+        finally:
+            self.leave(scope)
+
+    async def __acall__(self, request):
+        scope, rejected = self.enter(request)
+        if rejected is not None:
+            return rejected
+        try:
+            return await self.get_response(request)
+        finally:
+            self.leave(scope)
+
+    @staticmethod
+    def scope(request):
+        try:
+            view = resolve(request.path_info).func
+        except Resolver404:
+            return None
+        return getattr(getattr(view, 'view_class', view), 'throttle_scope', None)
+
+    def enter(self, request):
+        """``(scope, None)`` once admitted, or ``(scope, response)`` rejecting ``request``."""
+        scope = self.scope(request)
+        if 'HTTP_AUTHORIZATION' not in request.META:
+            wait = throttle_wait(request, scope)
+            request.anon_throttled = True
+            if wait:
+                return scope, self.reject(429, 'Request was throttled. Expected available in %s seconds.', wait)
+        scope = scope or 'default'
+        limit = settings.STADIUM_CONCURRENCY_LIMITS.get(scope)
+        with self._lock:
+            if limit is not None and self.in_flight[scope] >= limit:
+                return scope, self.reject(503, 'Server is busy, try again in %s seconds.', 1)
+            self.in_flight[scope] += 1
+        return scope, None
+
+    def leave(self, scope):
+        with self._lock:
+            self.in_flight[scope or 'default'] -= 1
+
+    @staticmethod
+    def reject(status, message, wait):
+        response = JsonResponse({'detail': message % retry_after(wait)}, status=status)
+        response['Retry-After'] = retry_after(wait)
+        return response
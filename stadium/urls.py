@@ -1,25 +1,39 @@
 from django.urls import path, include
+from . import async_views
 from .views import UserRegistrationView, UserLoginView, UserLogoutView, FootballFieldListAPIView,\
                     FootballFieldCreateAPIView, FootballFieldDeleteAPIView, FootballFieldDetailAPIView, FootballFieldUpdateAPIView,\
-                    BookingCreateAPIView, BookingDeleteAPIView, BookingDetailAPIView, BookingListAPIView, BookingUpdateAPIView, AvailableFootballFieldsAPIView
+                    BookingCreateAPIView, BookingBulkCreateAPIView, BookingDeleteAPIView, BookingDetailAPIView, BookingListAPIView, BookingUpdateAPIView, AvailableFootballFieldsAPIView,\
+                    BookingExportAPIView, CacheStatsAPIView, FieldCalendarAPIView, FieldSearchAPIView, OwnerStatsAPIView
 
 
 
 urlpatterns = [
     path("api/auth/register/", UserRegistrationView.as_view(), name='registration'),
     path('api/auth/login/', UserLoginView.as_view(), name='login'),
-    path('api/auth/logout/', UserLoginView.as_view(), name='logout'),
+    path('api/auth/logout/', UserLogoutView.as_view(), name='logout'),
     path('api/stadium/list', FootballFieldListAPIView.as_view(), name='get-stadium'),
     path('api/stadium/detail/<int:pk>', FootballFieldDetailAPIView.as_view(), name='detail-stadium'),
     path('api/stadium/update/<int:pk>', FootballFieldUpdateAPIView.as_view(), name='update-stadium'),
     path('api/stadium/delete/<int:pk>', FootballFieldDeleteAPIView.as_view(), name='delete-stadium'),
     path('api/stadium/create/', FootballFieldCreateAPIView.as_view(), name='create-stadium'),
+    path('api/stadium/search/', FieldSearchAPIView.as_view(), name='search-stadium'),
+    path('api/stadium/cache/stats', CacheStatsAPIView.as_view(), name='cache-stats'),
     path('api/stadium/book/create', BookingCreateAPIView.as_view(), name='create-booking'),
+    path('api/stadium/book/bulk-create', BookingBulkCreateAPIView.as_view(), name='bulk-create-booking'),
     path('api/stadium/book/update/<int:pk>', BookingUpdateAPIView.as_view(), name='update-booking'),
-    path('api/stadium/book/detail/<int:pk>', BookingDetailAPIView.as_view(), name='delete-booking'),
+    path('api/stadium/book/detail/<int:pk>', BookingDetailAPIView.as_view(), name='detail-booking'),
     path('api/stadium/book/list/', BookingListAPIView.as_view(), name='list-booking'),
+    path('api/stadium/book/export/', BookingExportAPIView.as_view(), name='export-booking'),
     path('api/stadium/book/delete/<int:pk>', BookingDeleteAPIView.as_view(), name='delete-booking'),
     path('api/stadium/book/filter/', AvailableFootballFieldsAPIView.as_view(), name='filter'),
+    path('api/stadium/calendar/', FieldCalendarAPIView.as_view(), name='calendar'),
+    path('api/stadium/owner/stats/', OwnerStatsAPIView.as_view(), name='owner-stats'),
+
+    # Async (ASGI) versions of the read-heavy endpoints.
+    path('api/async/stadium/list', async_views.field_list, name='async-get-stadium'),
+    path('api/async/stadium/detail/<int:pk>', async_views.field_detail, name='async-detail-stadium'),
+    path('api/async/stadium/book/filter/', async_views.available_fields, name='async-filter'),
+    path('api/async/stadium/book/detail/<int:pk>', async_views.booking_detail, name='async-detail-booking'),
    
  
 ]
\ No newline at end of file
@@ -1,24 +1,32 @@
+from django.conf import settings
 from django.shortcuts import render
+from django.http import StreamingHttpResponse
 from .models import User
 from django.db.models import Q
 from .serializers import UserSerializer
 from django.contrib.auth import authenticate, login
 from rest_framework import status, generics, permissions
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
-from .models import FootballField, Booking
-from .serializers import FootballFieldSerializer, BookingSerializer
+from .models import FootballField, Booking, FieldDailyStats
+from .serializers import FootballFieldSerializer, BookingSerializer, BulkBookingSerializer, FieldSearchSerializer
 from django.utils.decorators import method_decorator 
-import math
-from .permissions import IsFieldOwnerOrAdmin
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.exceptions import ValidationError
+from .permissions import IsFieldOwnerOrAdmin, IsStadiumOwnerOrAdmin
+from . import availability, cache, export, fastpath, geo, rollups, search
+from .cache import CachedResponseMixin
+from .fastpath import FastJSONRenderer
+from .booking import save_booking, save_bookings
+from .pagination import BookingPagination, FieldFilterPagination, FootballFieldPagination, UncountedLimitOffsetPagination
+from .authentication import CachedTokenAuthentication
 from drf_yasg import openapi
-from datetime import datetime
+import math
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 from rest_framework.exceptions import ParseError
 
 class UserRegistrationView(APIView):
@@ -47,10 +55,7 @@ class UserLoginView(ObtainAuthToken):
         user = authenticate(request=request, username=username, password=password)
         if user is not None:
             login(request, user)
-            token, created = Token.objects.get_or_create(user=user)
-            if created:
-                token.delete()
-                token = Token.objects.create(user=user)
+            token, _ = Token.objects.get_or_create(user=user)
             return Response({'token': token.key, 'username': user.username, 'role': user.role})
         else:
             return Response({'message': "invalide username or password"}, status=401)
@@ -62,29 +67,43 @@ class UserLogoutView(APIView):
         tags=["Authentication"],
     )
     def post(self, request):
-        token_key = request.auth.key
-        token = Token.objects.get(key=token_key)
-        token.delete()
+        # Deleting the token also evicts it from the authentication cache.
+        request.auth.delete()
 
         return Response({'detail' : "Logged out succesfully"})
 
 
-class FootballFieldListAPIView(generics.ListAPIView):
-    queryset = FootballField.objects.all().order_by('-id')
+class FootballFieldListAPIView(CachedResponseMixin, generics.ListAPIView):
+    queryset = FootballField.objects.prefetch_related('image_set').order_by('-id')
     serializer_class = FootballFieldSerializer
-    authentication_classes = [TokenAuthentication]
+    pagination_class = FootballFieldPagination
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'list'
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_cache_key(self, request):
+        return f'catalogue:{cache.catalogue_version()}:{request.build_absolute_uri()}'
 
     @method_decorator(swagger_auto_schema(tags=["stadium"]))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(fastpath.FIELD_ROWS.values(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(fastpath.field_data(page, request))
 
-class FootballFieldDetailAPIView(generics.RetrieveAPIView):
-    queryset = FootballField.objects.all()
+
+class FootballFieldDetailAPIView(CachedResponseMixin, generics.RetrieveAPIView):
+    queryset = FootballField.objects.prefetch_related('image_set')
     serializer_class = FootballFieldSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'list'
+
+    def get_cache_key(self, request):
+        pk = self.kwargs['pk']
+        return f'field:{pk}:{cache.field_version(pk)}:{request.build_absolute_uri()}'
 
     @method_decorator(swagger_auto_schema(tags=["stadium"]))
     def get(self, request, *args, **kwargs):
@@ -96,7 +115,7 @@ class FootballFieldDetailAPIView(generics.RetrieveAPIView):
 
 class FootballFieldCreateAPIView(generics.CreateAPIView):
     serializer_class = FootballFieldSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
     @method_decorator(swagger_auto_schema(tags=["stadium"],   security=[{'Token': []}] ))
@@ -110,7 +129,7 @@ class FootballFieldCreateAPIView(generics.CreateAPIView):
 class FootballFieldUpdateAPIView(generics.UpdateAPIView):
     queryset = FootballField.objects.all()
     serializer_class = FootballFieldSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     # @method_decorator(swagger_auto_schema(tags=["stadium"]))
@@ -127,7 +146,7 @@ class FootballFieldUpdateAPIView(generics.UpdateAPIView):
 class FootballFieldDeleteAPIView(generics.DestroyAPIView):
     queryset = FootballField.objects.all()
     serializer_class = FootballFieldSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated] 
     
     @method_decorator(swagger_auto_schema(tags=["stadium"]))
@@ -135,52 +154,90 @@ class FootballFieldDeleteAPIView(generics.DestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
+DEFAULT_RADIUS_KM = 50
+# Half the Earth's circumference: a circle this wide covers every point.
+MAX_RADIUS_KM = math.pi * geo.EARTH_RADIUS_KM
+
+
+def parse_field_filter(params):
+    """Validate the query parameters of the available-fields filter.
+
+    Returns a dict with ``booking_date``, ``start_time`` and ``end_time`` (all
+    None unless the three are given) and ``lat``, ``lon``, ``radius_km``, ``k``
+    (``lat`` is None unless both coordinates are given). ``radius_km`` is
+    clamped to ``MAX_RADIUS_KM``; ``k`` may not exceed ``STADIUM_MAX_NEAREST``.
+    """
+    def validate_time(time_str):
+        if not time_str:
+            return None
+        try:
+            return datetime.strptime(time_str.strip(), "%H:%M").time()
+        except ValueError:
+            raise ParseError(f"Invalid time format: '{time_str}'. Must be in 'HH:MM' format.")
+
+    result = dict(booking_date=None, start_time=None, end_time=None, lat=None, lon=None, radius_km=None, k=None)
+
+    booking_date = params.get('booking_date')
+    start_time = validate_time(params.get('start_time'))
+    end_time = validate_time(params.get('end_time'))
+    if booking_date and start_time and end_time:
+        try:
+            booking_date = datetime.strptime(booking_date.strip(), "%Y-%m-%d").date()
+        except ValueError:
+            raise ParseError(f"Invalid date format: '{booking_date}'. Must be in 'YYYY-MM-DD' format.")
+        result.update(booking_date=booking_date, start_time=start_time, end_time=end_time)
+
+    user_lat = params.get('lat')
+    user_lon = params.get('lon')
+    if user_lat and user_lon:
+        try:
+            user_lat = float(user_lat)
+            user_lon = float(user_lon)
+        except ValueError:
+            raise ParseError("'lat' and 'lon' must be numbers.")
+        if not (-90 <= user_lat <= 90 and -180 <= user_lon <= 180):
+            raise ParseError("'lat' must be within [-90, 90] and 'lon' within [-180, 180].")
+        radius_km = params.get('radius_km', DEFAULT_RADIUS_KM)
+        k = params.get('k')
+        try:
+            radius_km = float(radius_km)
+            k = int(k) if k else None
+        except ValueError:
+            raise ParseError("'radius_km' must be a number and 'k' an integer.")
+        if not math.isfinite(radius_km) or radius_km <= 0 or (k is not None and k <= 0):
+            raise ParseError("'radius_km' and 'k' must be positive and finite.")
+        max_nearest = getattr(settings, 'STADIUM_MAX_NEAREST', 1000)
+        if k is not None and k > max_nearest:
+            raise ParseError(f"'k' must be at most {max_nearest}.")
+        result.update(lat=user_lat, lon=user_lon, radius_km=min(radius_km, MAX_RADIUS_KM), k=k)
+    return result
+
+
 class AvailableFootballFieldsAPIView(generics.ListAPIView):
     serializer_class = FootballFieldSerializer
+    pagination_class = FieldFilterPagination
     permission_classes = [permissions.AllowAny]
+    throttle_scope = 'availability'
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        rows = fastpath.FIELD_ROWS.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(fastpath.field_data(rows, request))
+        return self.get_paginated_response(fastpath.field_data(page, request))
     
     def get_queryset(self):
-        booking_date = self.request.query_params.get('booking_date')
-        start_time = self.request.query_params.get('start_time')
-        end_time = self.request.query_params.get('end_time')
-        user_lat = self.request.query_params.get('lat')
-        user_lon = self.request.query_params.get('lon')
-
-       
-        def validate_time(time_str):
-            if not time_str:
-                return None
-            try:
-                return datetime.strptime(time_str.strip(), "%H:%M").time()
-            except ValueError:
-                raise ParseError(f"Invalid time format: '{time_str}'. Must be in 'HH:MM' format.")
-
-        start_time = validate_time(start_time)
-        end_time = validate_time(end_time)
+        params = parse_field_filter(self.request.query_params)
+        fields = FootballField.objects.prefetch_related('image_set')
         
-        fields = FootballField.objects.all()
-        
-        if booking_date and start_time and end_time:
-            from .models import Booking
-            booked_fields = Booking.objects.filter(
-                booking_date=booking_date
-            ).filter(
-                Q(start_time__lt=end_time) & Q(end_time__gt=start_time)
-            ).values_list('field_id', flat=True)
+        if params['booking_date']:
+            booked_fields = availability.busy_fields(params['booking_date'], params['start_time'], params['end_time'])
             fields = fields.exclude(id__in=booked_fields)
         
-        if user_lat and user_lon:
-            try:
-                user_lat = float(user_lat)
-                user_lon = float(user_lon)
-                for field in fields:
-                    field.distance = math.sqrt(
-                        (field.latitude - user_lat) ** 2 + (field.longitude - user_lon) ** 2
-                    )
-                fields = sorted(fields, key=lambda f: f.distance)
-            except ValueError:
-                pass
-        
+        if params['lat'] is not None:
+            fields = geo.nearest(fields, params['lat'], params['lon'], params['radius_km'], params['k'])
+
         return fields
     
     @swagger_auto_schema(
@@ -190,26 +247,340 @@ class AvailableFootballFieldsAPIView(generics.ListAPIView):
             openapi.Parameter('end_time', openapi.IN_QUERY, description="End Time (HH:MM)", type=openapi.TYPE_STRING, ),
             openapi.Parameter('lat', openapi.IN_QUERY, description="User Latitude", type=openapi.TYPE_NUMBER),
             openapi.Parameter('lon', openapi.IN_QUERY, description="User Longitude", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('radius_km', openapi.IN_QUERY, description="Search radius around lat/lon in km (default 50)", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('k', openapi.IN_QUERY, description="Return at most k nearest fields (max STADIUM_MAX_NEAREST, default 1000)", type=openapi.TYPE_INTEGER),
         ],
         tags=["stadium"]
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+def _parse_price(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        value = Decimal(value.strip())
+    except InvalidOperation:
+        raise ParseError(f"'{name}' must be a number.")
+    if not value.is_finite() or value < 0:
+        raise ParseError(f"'{name}' must not be negative.")
+    # Anything above the largest possible rate filters the same.
+    return search.price_cents(min(value, Decimal(10 ** 6)))
+
+
+class FieldSearchAPIView(generics.ListAPIView):
+    """Fields matching text, hourly rate range and distance, from the ``FieldSearch`` read model."""
+    serializer_class = FieldSearchSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = UncountedLimitOffsetPagination
+    throttle_scope = 'list'
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_queryset(self):
+        params = self.request.query_params
+        area = parse_field_filter(params)
+        min_cents, max_cents = _parse_price(params, 'min_price'), _parse_price(params, 'max_price')
+        if min_cents is not None and max_cents is not None and min_cents > max_cents:
+            raise ParseError("'min_price' must not be above 'max_price'.")
+        ordering = params.get('ordering')
+        if ordering and ordering not in search.ORDERINGS:
+            raise ParseError(f"'ordering' must be one of {', '.join(search.ORDERINGS)}.")
+        if ordering == 'distance' and area['lat'] is None:
+            raise ParseError("Ordering by 'distance' needs 'lat' and 'lon'.")
+        return search.search(
+            params.get('q'), min_cents, max_cents, area['lat'], area['lon'], area['radius_km'], ordering,
+        )
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(fastpath.search_data(page, request))
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Words the name or address must contain (prefixes match)", type=openapi.TYPE_STRING),
+            openapi.Parameter('min_price', openapi.IN_QUERY, description="Minimum hourly rate", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('max_price', openapi.IN_QUERY, description="Maximum hourly rate", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('lat', openapi.IN_QUERY, description="User Latitude", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('lon', openapi.IN_QUERY, description="User Longitude", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('radius_km', openapi.IN_QUERY, description="Search radius around lat/lon in km (default 50)", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('ordering', openapi.IN_QUERY, description="price, -price or distance (default: distance with lat/lon, else price)", type=openapi.TYPE_STRING),
+        ],
+        tags=["stadium"]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+MAX_CALENDAR_FIELDS = 200
+MAX_CALENDAR_DAYS = 31
+
+
+def _format_seconds(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}" if seconds else f"{hours:02d}:{minutes:02d}"
+
+
+def _parse_clock(value, name):
+    """'HH:MM' as seconds since midnight; '24:00' is accepted as end of day."""
+    if value == '24:00':
+        return availability.DAY_SECONDS
+    try:
+        parsed = datetime.strptime(value.strip(), "%H:%M").time()
+    except ValueError:
+        raise ParseError(f"Invalid time format for '{name}': '{value}'. Must be in 'HH:MM' format.")
+    return parsed.hour * 3600 + parsed.minute * 60
+
+
+def _parse_date_range(params, max_days):
+    """``date_from`` (required) and ``date_to`` (default: the same day) spanning at most ``max_days``."""
+    try:
+        date_from = datetime.strptime(params['date_from'].strip(), "%Y-%m-%d").date()
+        date_to = params.get('date_to')
+        date_to = datetime.strptime(date_to.strip(), "%Y-%m-%d").date() if date_to else date_from
+    except KeyError:
+        raise ParseError("'date_from' is required.")
+    except ValueError:
+        raise ParseError("Dates must be in 'YYYY-MM-DD' format.")
+    if not 0 <= (date_to - date_from).days < max_days:
+        raise ParseError(f"'date_to' must be on or after 'date_from' and at most {max_days} days later.")
+    return date_from, date_to
+
+
+class FieldCalendarAPIView(APIView):
+    """Free intervals per field per day, for a week grid in one request."""
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'availability'
+
+    def get_field_ids(self, params):
+        fields = FootballField.objects.all()
+        ids = params.get('fields')
+        if ids:
+            try:
+                ids = {int(pk) for pk in ids.split(',')}
+            except ValueError:
+                raise ParseError("'fields' must be a comma separated list of ids.")
+            if len(ids) > MAX_CALENDAR_FIELDS:
+                raise ParseError(f"At most {MAX_CALENDAR_FIELDS} fields per request.")
+            fields = fields.filter(id__in=ids).order_by('id')
+
+        area = parse_field_filter(params)
+        if area['lat'] is not None:
+            fields = geo.nearest(fields, area['lat'], area['lon'], area['radius_km'], area['k'])
+        elif not ids:
+            raise ParseError("Provide 'fields' or 'lat' and 'lon'.")
+        # The nearest MAX_CALENDAR_FIELDS of an area.
+        return list(fields.values_list('id', flat=True)[:MAX_CALENDAR_FIELDS])
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('date_from', openapi.IN_QUERY, description="First day (YYYY-MM-DD)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, required=True),
+            openapi.Parameter('date_to', openapi.IN_QUERY, description=f"Last day (YYYY-MM-DD), at most {MAX_CALENDAR_DAYS} days in total", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('fields', openapi.IN_QUERY, description=f"Comma separated field ids (max {MAX_CALENDAR_FIELDS})", type=openapi.TYPE_STRING),
+            openapi.Parameter('lat', openapi.IN_QUERY, description="Latitude, instead of or on top of 'fields'", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('lon', openapi.IN_QUERY, description="Longitude", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('radius_km', openapi.IN_QUERY, description="Search radius around lat/lon in km (default 50)", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('k', openapi.IN_QUERY, description="Only the k nearest fields", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('open', openapi.IN_QUERY, description="Start of the day grid (HH:MM, default 00:00)", type=openapi.TYPE_STRING),
+            openapi.Parameter('close', openapi.IN_QUERY, description="End of the day grid (HH:MM, default 24:00)", type=openapi.TYPE_STRING),
+        ],
+        tags=["stadium"]
+    )
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        date_from, date_to = _parse_date_range(params, MAX_CALENDAR_DAYS)
+        day_start = _parse_clock(params.get('open', '00:00'), 'open')
+        day_end = _parse_clock(params.get('close', '24:00'), 'close')
+        field_ids = self.get_field_ids(params)
+
+        calendar = availability.free_intervals(field_ids, date_from, date_to, day_start, day_end)
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'fields': [
+                {
+                    'field': field_id,
+                    'days': {
+                        day.isoformat(): [[_format_seconds(start), _format_seconds(end)] for start, end in free]
+                        for day, free in calendar[field_id].items()
+                    },
+                }
+                for field_id in field_ids
+            ],
+        })
+
+MAX_STATS_DAYS = 366
+STATS_PERIODS = {
+    'day': lambda day: day,
+    'week': lambda day: day - timedelta(days=day.weekday()),
+}
+
+
+class OwnerStatsAPIView(APIView):
+    """Bookings, booked time, revenue and occupancy of the caller's fields per day or week.
+
+    Reads only the ``FieldDailyStats`` rollups (see ``stadium.rollups``).
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsStadiumOwnerOrAdmin]
+
+    def get_fields(self, request):
+        fields = FootballField.objects.order_by('id')
+        owner = request.query_params.get('owner')
+        if owner and (request.user.is_staff or request.user.role == 'admin'):
+            fields = fields.filter(owner_id=owner)
+        else:
+            fields = fields.filter(owner_id=request.user.pk)
+        ids = request.query_params.get('fields')
+        if ids:
+            try:
+                fields = fields.filter(id__in={int(pk) for pk in ids.split(',')})
+            except ValueError:
+                raise ParseError("'fields' must be a comma separated list of ids.")
+        return list(fields.values_list('id', 'name'))
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('date_from', openapi.IN_QUERY, description="First day (YYYY-MM-DD)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE, required=True),
+            openapi.Parameter('date_to', openapi.IN_QUERY, description=f"Last day (YYYY-MM-DD), at most {MAX_STATS_DAYS} days in total", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('group', openapi.IN_QUERY, description="'day' (default) or 'week' (periods start on Monday)", type=openapi.TYPE_STRING),
+            openapi.Parameter('fields', openapi.IN_QUERY, description="Comma separated ids of your fields (default: all)", type=openapi.TYPE_STRING),
+            openapi.Parameter('owner', openapi.IN_QUERY, description="Admins only: stats of this owner's fields", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('open', openapi.IN_QUERY, description="Opening time used for occupancy (HH:MM, default 00:00)", type=openapi.TYPE_STRING),
+            openapi.Parameter('close', openapi.IN_QUERY, description="Closing time used for occupancy (HH:MM, default 24:00)", type=openapi.TYPE_STRING),
+        ],
+        tags=["stadium"],
+        security=[{'Token': []}],
+    )
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        date_from, date_to = _parse_date_range(params, MAX_STATS_DAYS)
+        group = params.get('group', 'day')
+        if group not in STATS_PERIODS:
+            raise ParseError("'group' must be 'day' or 'week'.")
+        period_start = STATS_PERIODS[group]
+        open_minutes = (_parse_clock(params.get('close', '24:00'), 'close') - _parse_clock(params.get('open', '00:00'), 'open')) // 60
+        if open_minutes <= 0:
+            raise ParseError("'close' must be after 'open'.")
+
+        fields = self.get_fields(request)
+        rows = FieldDailyStats.objects.filter(
+            field_id__in=[field_id for field_id, _ in fields], booking_date__gte=date_from, booking_date__lte=date_to,
+        ).values_list('field_id', 'booking_date', 'bookings', 'booked_minutes', 'revenue')
+        totals = rollups.summarize(rows, period_start)
+
+        # Every period of the range, with how many of its days fall inside it.
+        periods = {}
+        day = date_from
+        while day <= date_to:
+            periods[period_start(day)] = periods.get(period_start(day), 0) + 1
+            day += timedelta(days=1)
+
+        def entry(stats, days):
+            return {
+                'bookings': stats['bookings'],
+                'booked_minutes': stats['booked_minutes'],
+                'revenue': f"{stats['revenue']:.2f}",
+                'occupancy': round(stats['booked_minutes'] / (open_minutes * days), 4),
+            }
+
+        result = []
+        for field_id, name in fields:
+            field_total = rollups.empty_stats()
+            field_periods = []
+            for start, days in periods.items():
+                stats = totals.get((field_id, start)) or rollups.empty_stats()
+                for key in field_total:
+                    field_total[key] += stats[key]
+                field_periods.append({'start': start, **entry(stats, days)})
+            result.append({
+                'field': field_id,
+                'name': name,
+                'total': entry(field_total, (date_to - date_from).days + 1),
+                'periods': field_periods,
+            })
+        return Response({'date_from': date_from, 'date_to': date_to, 'group': group, 'fields': result})
+
 class BookingListAPIView(generics.ListAPIView):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
-    authentication_classes = [TokenAuthentication]
+    pagination_class = BookingPagination
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'list'
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     @method_decorator(swagger_auto_schema(tags=["booking"]))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(fastpath.BOOKING_ROWS.values(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(fastpath.booking_data(page))
+
+class CacheStatsAPIView(APIView):
+    """Hit/miss/eviction counters of the response cache, for monitoring."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(tags=["stadium"])
+    def get(self, request):
+        return Response(cache.get_cache().stats())
+
+
+class BookingExportAPIView(APIView):
+    """Stream bookings as NDJSON or CSV without building the whole body in memory.
+
+    Admins export every booking; other users only their own bookings and the
+    bookings on fields they own.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        params = self.request.query_params
+        user = self.request.user
+        queryset = Booking.objects.all()
+        if not (user.is_staff or user.role == 'admin'):
+            queryset = queryset.filter(Q(user=user) | Q(field__owner=user))
+        try:
+            if params.get('field'):
+                queryset = queryset.filter(field_id=int(params['field']))
+            if params.get('owner'):
+                queryset = queryset.filter(field__owner_id=int(params['owner']))
+            if params.get('date_from'):
+                queryset = queryset.filter(booking_date__gte=datetime.strptime(params['date_from'], "%Y-%m-%d").date())
+            if params.get('date_to'):
+                queryset = queryset.filter(booking_date__lte=datetime.strptime(params['date_to'], "%Y-%m-%d").date())
+        except ValueError:
+            raise ParseError("'field' and 'owner' must be ids, 'date_from' and 'date_to' in 'YYYY-MM-DD' format.")
+        return queryset
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('output', openapi.IN_QUERY, description="ndjson (default) or csv", type=openapi.TYPE_STRING, enum=list(export.FORMATS)),
+            openapi.Parameter('field', openapi.IN_QUERY, description="Field id", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('owner', openapi.IN_QUERY, description="Field owner id", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('date_from', openapi.IN_QUERY, description="First booking date (YYYY-MM-DD)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('date_to', openapi.IN_QUERY, description="Last booking date (YYYY-MM-DD)", type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+        ],
+        operation_description="Admins export every booking; other users their own bookings and those on fields they own.",
+        tags=["booking"]
+    )
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in export.FORMATS:
+            raise ParseError(f"Unknown output '{output}'. Use one of: {', '.join(export.FORMATS)}.")
+        content_type, content = export.stream(self.get_queryset(), output)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="bookings.{output}"'
+        return response
+
 class BookingDetailAPIView(generics.RetrieveAPIView):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     @method_decorator(swagger_auto_schema(tags=["booking"]))
@@ -219,8 +590,9 @@ class BookingDetailAPIView(generics.RetrieveAPIView):
 
 class BookingCreateAPIView(generics.CreateAPIView):
     serializer_class = BookingSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'booking'
 
 
     @method_decorator(swagger_auto_schema(tags=["booking"]))
@@ -229,28 +601,45 @@ class BookingCreateAPIView(generics.CreateAPIView):
 
     
     def perform_create(self, serializer):
-        field = serializer.validated_data['field']
-        booking_date = serializer.validated_data['booking_date']
-        start_time = serializer.validated_data['start_time']
-        end_time = serializer.validated_data['end_time']
-
-        overlapping_bookings = Booking.objects.filter(
-            field=field,
-            booking_date=booking_date,
-        ).filter(
-            start_time__lt=end_time,  
-            end_time__gt=start_time,  
-        )
+        save_booking(serializer, user=self.request.user)
 
-        if overlapping_bookings.exists():
-            raise ValidationError("This stadium is already booked for the selected time.")
+class BookingBulkCreateAPIView(generics.GenericAPIView):
+    """Create many bookings in one request, e.g. a weekly slot for a season.
 
-        serializer.save(user=self.request.user)
+    Conflicting items are rejected individually; the rest are created.
+    """
+    serializer_class = BulkBookingSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'booking'
+
+    @swagger_auto_schema(tags=["booking"], request_body=BulkBookingSerializer)
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.items
+        results = []
+        for index, (item, (booking, error)) in enumerate(zip(items, save_bookings(items, user=request.user))):
+            if error is None:
+                results.append({'index': index, 'status': 'accepted', 'booking': BookingSerializer(booking).data})
+            else:
+                results.append({
+                    'index': index,
+                    'status': 'rejected',
+                    'booking_date': item['booking_date'],
+                    'error': error,
+                })
+        accepted = sum(result['status'] == 'accepted' for result in results)
+        return Response({
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results,
+        }, status=status.HTTP_201_CREATED if accepted else status.HTTP_409_CONFLICT)
 
 class BookingDeleteAPIView(generics.DestroyAPIView):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsFieldOwnerOrAdmin]
     
     @method_decorator(swagger_auto_schema(tags=["booking"]))
@@ -260,13 +649,16 @@ class BookingDeleteAPIView(generics.DestroyAPIView):
 class BookingUpdateAPIView(generics.UpdateAPIView):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     @method_decorator(swagger_auto_schema(tags=["booking"]))
     def update(self, request, *args, **kwargs):
         return super().update(request, *args, **kwargs)
 
+    def perform_update(self, serializer):
+        save_booking(serializer)
+
 
 
 